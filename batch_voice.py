@@ -0,0 +1,157 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.audio_stream import load_audio_file
+from core.normalize import normalize_query
+from song_finder import SongFinder
+
+AUDIO_EXTENSIONS = (".wav", ".flac")
+CSV_COLUMNS = ["file", "transcript", "rank", "score", "title", "artist", "error"]
+
+
+def find_clips(directory):
+    """Audio clips under directory, in a stable order"""
+    paths = glob.glob(os.path.join(directory, "**", "*"), recursive=True)
+    return sorted(path for path in paths if path.lower().endswith(AUDIO_EXTENSIONS))
+
+
+def run_batch(song_finder, paths, top_k=5, batch_size=8, sample_rate=16000):
+    """
+    Decode, transcribe and search clips batch_size at a time, yielding one record per clip
+    Records are {"file", "seconds", "transcript", "results": [{rank, score, title, artist}], "error"}
+    """
+    timings = {"clips": 0, "audio_seconds": 0.0, "decode": 0.0, "transcribe": 0.0, "search": 0.0}
+    for start in range(0, len(paths), batch_size):
+        records, clips = [], []
+        started = time.perf_counter()
+        for path in paths[start:start + batch_size]:
+            record = {"file": path, "seconds": 0.0, "transcript": "", "results": [], "error": ""}
+            records.append(record)
+            try:
+                clip = load_audio_file(path, sample_rate)
+            except Exception as e:
+                print(f"Error decoding {path}: {e}")
+                record["error"] = str(e)
+                continue
+            record["seconds"] = len(clip) / sample_rate
+            clips.append((record, clip))
+        decoded = time.perf_counter()
+
+        transcripts = []
+        if clips:
+            try:
+                transcripts = song_finder.transcribe_batch([clip for _, clip in clips], batch_size)
+            except Exception as e:
+                print(f"Error transcribing batch starting at {paths[start]}: {e}")
+                for record, _ in clips:
+                    record["error"] = str(e)
+        transcribed = time.perf_counter()
+
+        for (record, _), transcript in zip(clips, transcripts):
+            record["transcript"] = transcript
+            if transcript:
+                record["results"] = [
+                    {"rank": rank, "score": score, "title": song.get("Title", ""), "artist": song.get("Artist", "")}
+                    for rank, (score, song) in enumerate(song_finder.search_ranked(transcript, top_k), 1)
+                ]
+        searched = time.perf_counter()
+
+        timings["clips"] += len(records)
+        timings["audio_seconds"] += sum(record["seconds"] for record in records)
+        timings["decode"] += decoded - started
+        timings["transcribe"] += transcribed - decoded
+        timings["search"] += searched - transcribed
+        for record in records:
+            print(f"{record['file']}: {record['transcript'] or record['error'] or '(nothing understood)'}")
+            yield record
+
+    if timings["clips"]:
+        busy = timings["decode"] + timings["transcribe"] + timings["search"]
+        print(f"{timings['clips']} clips, {timings['audio_seconds']:.1f}s of audio in {busy:.1f}s "
+              f"(decode {timings['decode']:.1f}s, transcribe {timings['transcribe']:.1f}s, "
+              f"search {timings['search']:.2f}s)")
+
+
+def load_truth(truth_path):
+    """Expected title per clip file name, from a CSV with file and title columns"""
+    with open(truth_path, newline='', encoding='utf-8') as f:
+        return {os.path.basename(row["file"]): normalize_query(row["title"]) for row in csv.DictReader(f)}
+
+
+def hit_rate(records, truth):
+    """Share of labelled clips whose expected title is the top result, and in the results at all"""
+    labelled = top = anywhere = 0
+    for record in records:
+        expected = truth.get(os.path.basename(record["file"]))
+        if expected is None:
+            continue
+        labelled += 1
+        titles = [normalize_query(result["title"]) for result in record["results"]]
+        top += bool(titles) and titles[0] == expected
+        anywhere += expected in titles
+    return {"clips": labelled, "top1": top / labelled if labelled else 0.0,
+            "top_k": anywhere / labelled if labelled else 0.0}
+
+
+def write_csv(records, output_path):
+    """One row per (clip, result), clips without results get a single row"""
+    with open(output_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        for record in records:
+            base = {"file": record["file"], "transcript": record["transcript"], "error": record["error"]}
+            for result in record["results"] or [{}]:
+                writer.writerow({**base, **result})
+
+
+def write_json(records, output_path):
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(list(records), f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transcribe a directory of sung clips and search for each")
+    parser.add_argument("directory", help="folder of .wav/.flac clips, searched recursively")
+    parser.add_argument("-o", "--output", default="voice_results.csv",
+                        help="results file, .json for JSON and CSV otherwise")
+    parser.add_argument("-k", "--top-k", type=int, default=5, help="results kept per clip")
+    parser.add_argument("--batch-size", type=int, default=8, help="clips decoded together in one forward pass")
+    parser.add_argument("--model", default="base", help="Whisper model size")
+    parser.add_argument("--backend", choices=["whisper", "faster-whisper"], default="whisper",
+                        help="transcription engine, faster-whisper runs int8 CTranslate2 models on CPU")
+    parser.add_argument("--no-prompt", action="store_true",
+                        help="decode without the initial_prompt of lexicon artists and titles")
+    parser.add_argument("--truth", metavar="CSV",
+                        help="file,title CSV of the song each clip is from, to report the hit rate")
+    args = parser.parse_args()
+
+    paths = find_clips(args.directory)
+    if not paths:
+        print(f"No {'/'.join(AUDIO_EXTENSIONS)} files found in {args.directory}")
+        sys.exit(1)
+
+    song_finder = SongFinder(whisper_model_size=args.model, transcription_backend=args.backend,
+                             prompt_from_lexicon=not args.no_prompt)
+    records = list(run_batch(song_finder, paths, args.top_k, args.batch_size))
+    if args.output.lower().endswith(".json"):
+        write_json(records, args.output)
+    else:
+        write_csv(records, args.output)
+    print(f"Wrote results for {len(paths)} clips to {args.output}")
+
+    # Which search stage answered the transcripts, phonetic means Whisper misheard the words
+    prefix = "search_ranked.answered_by."
+    stages = {name[len(prefix):]: count for name, count in song_finder.instrumentation.counters.items()
+              if name.startswith(prefix)}
+    print("Answered by: " + ", ".join(f"{stage} {count}" for stage, count in sorted(stages.items())))
+    if args.truth:
+        rates = hit_rate(records, load_truth(args.truth))
+        print(f"Hit rate over {rates['clips']} labelled clips: top-1 {rates['top1']:.1%}, "
+              f"top-{args.top_k} {rates['top_k']:.1%}")
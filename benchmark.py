@@ -0,0 +1,319 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.normalize import TOKEN_RE, normalize_query
+
+BUNDLED_LEXICONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "core", "lexicons")
+RESULT_PREFIX = "BENCHMARK_RESULT "
+QUERY_KINDS = ("exact_hit", "ngram_hit", "phonetic_hit", "fuzzy_hit", "miss")
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process, None where resource is unavailable"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(int(round(fraction * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def latency_summary(seconds, hits):
+    values = sorted(seconds)
+    return {
+        "count": len(values),
+        "hits": hits,
+        "p50_ms": percentile(values, 0.50) * 1000,
+        "p99_ms": percentile(values, 0.99) * 1000,
+        "mean_ms": sum(values) / len(values) * 1000
+    }
+
+
+def generate_corpus(target_dir, song_count, seed=0, songs_per_artist=40):
+    """
+    Write song_count synthetic songs as one JSON lexicon per artist
+    Words are drawn from the bundled lexicons' vocabulary with their real
+    frequencies, and lyrics repeat a chorus like real songs do
+    """
+    rng = random.Random(seed)
+    counts = Counter()
+    for file_name in sorted(os.listdir(BUNDLED_LEXICONS)):
+        if file_name.endswith(".json"):
+            with open(os.path.join(BUNDLED_LEXICONS, file_name), encoding='utf-8') as f:
+                for song in json.load(f):
+                    counts.update(TOKEN_RE.findall((song.get("Lyric") or "").lower()))
+    words = sorted(counts)
+    weights = [counts[word] for word in words]
+
+    def phrase(low, high):
+        return " ".join(rng.choices(words, weights, k=rng.randint(low, high)))
+
+    os.makedirs(target_dir, exist_ok=True)
+    artist_count = max(1, song_count // songs_per_artist)
+    for artist_idx in range(artist_count):
+        artist = f"{phrase(1, 2).title()} {artist_idx}"
+        songs = []
+        for song_idx in range(artist_idx, song_count, artist_count):
+            chorus = [phrase(5, 9) for _ in range(rng.randint(2, 4))]
+            lines = []
+            for _ in range(rng.randint(2, 4)):
+                lines.extend(phrase(5, 10) for _ in range(rng.randint(3, 6)))
+                lines.extend(chorus)
+            songs.append({
+                "": str(song_idx),
+                "Artist": artist,
+                "Title": phrase(1, 4).title(),
+                "Album": phrase(1, 3).title(),
+                "Year": str(rng.randint(1990, 2025)),
+                "Lyric": "  ".join(lines)
+            })
+        with open(os.path.join(target_dir, f"artist_{artist_idx:05d}.json"), 'w', encoding='utf-8') as f:
+            json.dump(songs, f, ensure_ascii=False)
+    return target_dir
+
+
+def make_queries(song_finder, per_kind, seed=0):
+    """
+    Queries meant to be answered by each search stage, and misses
+    exact_hit: lyric words as they appear, ngram_hit: five lyric words with the
+    last one replaced, phonetic_hit: a title with its vowels swapped, fuzzy_hit:
+    a title with one letter dropped, miss: gibberish
+    """
+    rng = random.Random(seed)
+    texts = [(song_idx, texts) for song_idx, texts in enumerate(song_finder.inverted_index.texts) if texts]
+    queries = {kind: [] for kind in QUERY_KINDS}
+    while len(queries["exact_hit"]) < per_kind or len(queries["ngram_hit"]) < per_kind:
+        song_idx, (title, artist, lyric) = rng.choice(texts)
+        # Lazily loaded lyrics are not kept by the index
+        words = (lyric if lyric is not None else song_finder._unstored_text(song_idx, "Lyric")).split()
+        if len(words) < 6:
+            continue
+        start = rng.randrange(len(words) - 5)
+        if len(queries["exact_hit"]) < per_kind:
+            queries["exact_hit"].append(" ".join(words[start:start + rng.randint(2, 4)]))
+        if len(queries["ngram_hit"]) < per_kind:
+            queries["ngram_hit"].append(" ".join(words[start:start + 4] + ["zqxv"]))
+    swapped_vowels = str.maketrans("aeiou", "eioua")
+    while len(queries["phonetic_hit"]) < per_kind:
+        title = rng.choice(texts)[1][0]
+        if len(title) >= 5 and title.isascii():
+            queries["phonetic_hit"].append(title.translate(swapped_vowels))
+    while len(queries["fuzzy_hit"]) < per_kind:
+        title = rng.choice(texts)[1][0]
+        if len(title) >= 5:
+            cut = rng.randrange(1, len(title) - 1)
+            queries["fuzzy_hit"].append(title[:cut] + title[cut + 1:])
+    consonants = "bcdfghjklmnpqrstvwxz"
+    for _ in range(per_kind):
+        queries["miss"].append(" ".join(
+            "".join(rng.choice(consonants) for _ in range(rng.randint(6, 10))) for _ in range(rng.randint(1, 2))))
+    return queries
+
+
+def time_calls(fn, queries):
+    """Latency of fn(query) for each query and how many calls returned something"""
+    seconds, hits = [], 0
+    for query in queries:
+        started = time.perf_counter()
+        result = fn(query)
+        seconds.append(time.perf_counter() - started)
+        hits += bool(result)
+    return latency_summary(seconds, hits)
+
+
+def measure_build(lexicon_dir, options):
+    """Index build from the lexicon files, then writing the compiled cache"""
+    from core.lexicon_cache import LexiconCache
+    from song_finder import SongFinder
+
+    started = time.perf_counter()
+    song_finder = SongFinder(enable_voice=False, use_cache=False, lexicon_dir=lexicon_dir, **options)
+    build_seconds = time.perf_counter() - started
+
+    # The cache this configuration loads from, written as SongFinder writes it
+    cache = song_finder.lexicon_cache = LexiconCache(song_finder.lexicon_manager.lexicon_dir, song_finder.cache_path)
+    song_finder._cache_dirty = True
+    started = time.perf_counter()
+    song_finder.save_search_state()
+    return {
+        "songs": len(song_finder.song_data["songs"]),
+        "build_seconds": build_seconds,
+        "cache_write_seconds": time.perf_counter() - started,
+        "cache_bytes": os.path.getsize(cache.cache_path),
+        "build_peak_rss_mb": peak_rss_mb()
+    }
+
+
+def measure_queries(lexicon_dir, options, per_kind, seed):
+    """Startup from the compiled cache, then uncached latency of every stage per query kind"""
+    started = time.perf_counter()
+    from song_finder import SongFinder
+    song_finder = SongFinder(enable_voice=False, lexicon_dir=lexicon_dir, **options)
+    result = {"startup_seconds": time.perf_counter() - started, "startup_peak_rss_mb": peak_rss_mb()}
+
+    stages = {
+        "exact": song_finder.exact_matches,
+        "ngram": song_finder._ngram_scores,
+        "phonetic": song_finder.phonetic_index.search,
+        "fuzzy": song_finder._fuzzy_matches,
+        "search_songs": song_finder._search_songs,
+        "search_ranked": lambda query: song_finder._search_ranked(query, 10),
+        # Type-ahead sees the query half typed
+        "suggest": lambda query: song_finder.prefix_index.suggest(query[:len(query) // 2 + 1])
+    }
+    queries = make_queries(song_finder, per_kind, seed)
+    # Lazily built lookup tables (sorted vocabulary, n-gram matrix) are not query latency
+    for fn in stages.values():
+        fn("warm up")
+    result["queries"] = {}
+    for kind in QUERY_KINDS:
+        normalized = [normalize_query(query) for query in queries[kind]]
+        result["queries"][kind] = {stage: time_calls(fn, normalized) for stage, fn in stages.items()}
+    result["query_peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def run_phase(phase, lexicon_dir, args):
+    """Run one measurement in a fresh interpreter so startup and peak RSS are its own"""
+    command = [sys.executable, os.path.abspath(__file__), "--phase", phase, "--lexicon-dir", lexicon_dir,
+               "--queries", str(args.queries), "--seed", str(args.seed),
+               "--engine", args.engine, "--build-workers", str(args.build_workers)]
+    if args.lazy_lyrics:
+        command.append("--lazy-lyrics")
+    completed = subprocess.run(command, capture_output=True, text=True)
+    for line in completed.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    raise RuntimeError(f"{phase} phase failed for {lexicon_dir}:\n{completed.stdout[-2000:]}{completed.stderr[-2000:]}")
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_report(report, baseline=None):
+    """Human summary of a report, with the ratio to a baseline report when given"""
+    baseline_corpora = {corpus["name"]: corpus for corpus in (baseline or {}).get("corpora", [])}
+
+    def cell(value, old):
+        if value is None:
+            return "-"
+        text = f"{value:.3f}"
+        if old:
+            text += f" ({value / old:.2f}x)"
+        return text
+
+    for corpus in report["corpora"]:
+        old = baseline_corpora.get(corpus["name"], {})
+        print(f"\n{corpus['name']}: {corpus['songs']} songs")
+        for key in ("build_seconds", "cache_write_seconds", "startup_seconds",
+                    "build_peak_rss_mb", "query_peak_rss_mb"):
+            print(f"  {key:22} {cell(corpus.get(key), old.get(key))}")
+        print(f"  {'p50/p99 ms':22} " + "  ".join(f"{stage:>22}" for stage in corpus["queries"][QUERY_KINDS[0]]))
+        for kind in QUERY_KINDS:
+            cells = []
+            for stage, stats in corpus["queries"][kind].items():
+                old_stats = old.get("queries", {}).get(kind, {}).get(stage, {})
+                text = f"{stats['p50_ms']:.2f}/{stats['p99_ms']:.2f}"
+                if old_stats:
+                    text += f" ({stats['p50_ms'] / old_stats['p50_ms']:.2f}x)"
+                cells.append(f"{text:>22}")
+            print(f"  {kind:22} " + "  ".join(cells))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark index build, startup, memory and search latency")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[10000],
+                        help="synthetic corpus sizes to run besides the bundled lexicons, e.g. 10000 100000")
+    parser.add_argument("--no-bundled", action="store_true", help="skip the bundled lexicons")
+    parser.add_argument("--queries", type=int, default=200, help="queries per kind")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--engine", choices=("python", "numpy"), default="python", help="n-gram scoring engine")
+    parser.add_argument("--build-workers", type=int, default=1)
+    parser.add_argument("--lazy-lyrics", action="store_true")
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="machine-readable results")
+    parser.add_argument("--compare", metavar="BASELINE", help="earlier results file to compare against")
+    parser.add_argument("--work-dir", help="where synthetic corpora are written, a temporary folder by default")
+    parser.add_argument("--phase", choices=("build", "queries"), help=argparse.SUPPRESS)
+    parser.add_argument("--lexicon-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    finder_options = {"ngram_engine": args.engine, "lazy_lyrics": args.lazy_lyrics,
+                      "build_workers": args.build_workers or None}
+    if args.phase == "build":
+        print(RESULT_PREFIX + json.dumps(measure_build(args.lexicon_dir, finder_options)))
+        sys.exit(0)
+    if args.phase == "queries":
+        print(RESULT_PREFIX + json.dumps(measure_queries(args.lexicon_dir, finder_options, args.queries, args.seed)))
+        sys.exit(0)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="song-finder-bench-")
+    corpora = []
+    if not args.no_bundled:
+        # A copy, so the bundled lexicons' own cache is left alone
+        corpora.append(("bundled", shutil.copytree(BUNDLED_LEXICONS, os.path.join(work_dir, "bundled"),
+                                                   ignore=shutil.ignore_patterns(".cache"), dirs_exist_ok=True)))
+    for size in args.sizes:
+        corpus_dir = os.path.join(work_dir, f"synthetic-{size}")
+        if not os.path.isdir(corpus_dir):
+            print(f"Generating {size} synthetic songs in {corpus_dir}")
+            generate_corpus(corpus_dir, size, args.seed)
+        corpora.append((f"synthetic-{size}", corpus_dir))
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "options": {key: value for key, value in vars(args).items()
+                        if key not in ("phase", "lexicon_dir", "compare", "output")}
+        },
+        "corpora": []
+    }
+    try:
+        for name, lexicon_dir in corpora:
+            print(f"Benchmarking {name}...")
+            shutil.rmtree(os.path.join(lexicon_dir, ".cache"), ignore_errors=True)
+            corpus = {"name": name}
+            corpus.update(run_phase("build", lexicon_dir, args))
+            corpus.update(run_phase("queries", lexicon_dir, args))
+            report["corpora"].append(corpus)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    print(f"\nWrote {args.output}")
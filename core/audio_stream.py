@@ -0,0 +1,258 @@
+import queue
+import time
+import wave
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    def __init__(self, capacity):
+        """Fixed-size float32 buffer that keeps the most recent samples"""
+        self.buffer = np.zeros(capacity, dtype=np.float32)
+        self.capacity = capacity
+        self.write_pos = 0
+        self.size = 0
+        self.total_written = 0
+
+    def write(self, samples):
+        samples = np.asarray(samples, dtype=np.float32)
+        self.total_written += len(samples)
+        if len(samples) >= self.capacity:
+            self.buffer[:] = samples[-self.capacity:]
+            self.write_pos = 0
+            self.size = self.capacity
+            return
+
+        end = self.write_pos + len(samples)
+        if end <= self.capacity:
+            self.buffer[self.write_pos:end] = samples
+        else:
+            split = self.capacity - self.write_pos
+            self.buffer[self.write_pos:] = samples[:split]
+            self.buffer[:end - self.capacity] = samples[split:]
+        self.write_pos = end % self.capacity
+        self.size = min(self.size + len(samples), self.capacity)
+
+    def latest(self, count=None):
+        """Copy of the newest count samples (all buffered samples by default), oldest first"""
+        count = self.size if count is None else min(count, self.size)
+        start = (self.write_pos - count) % self.capacity
+        if start + count <= self.capacity:
+            return self.buffer[start:start + count].copy()
+        return np.concatenate((self.buffer[start:], self.buffer[:self.write_pos]))
+
+    def since(self, sample_index):
+        """Samples written from absolute sample_index on, as far as they are still buffered"""
+        return self.latest(self.total_written - sample_index)
+
+
+class EnergyEndpointer:
+    def __init__(self, sample_rate=16000, min_threshold=0.01, noise_ratio=3.0,
+                 silence_seconds=0.8, min_speech_seconds=0.25, no_speech_seconds=5.0):
+        """
+        RMS energy voice-activity detector
+        Speech starts when a chunk rises above the adaptive threshold and the
+        utterance ends after silence_seconds of quiet following it
+        """
+        self.sample_rate = sample_rate
+        self.min_threshold = min_threshold
+        self.noise_ratio = noise_ratio
+        self.silence_samples = int(silence_seconds * sample_rate)
+        self.min_speech_samples = int(min_speech_seconds * sample_rate)
+        self.no_speech_samples = int(no_speech_seconds * sample_rate)
+        self.reset()
+
+    def reset(self):
+        self.noise_floor = None
+        self.samples_seen = 0
+        self.speech_start = None
+        self.speech_samples = 0
+        self.silence_run = 0
+        self.finished = False
+        self.reason = None
+
+    @property
+    def threshold(self):
+        if self.noise_floor is None:
+            return self.min_threshold
+        return max(self.min_threshold, self.noise_floor * self.noise_ratio)
+
+    def process(self, chunk):
+        """Feed one chunk of float32 samples, returns True once the utterance is over"""
+        if self.finished:
+            return True
+        rms = float(np.sqrt(np.mean(np.square(chunk, dtype=np.float32)))) if len(chunk) else 0.0
+        is_speech = rms >= self.threshold
+
+        if is_speech:
+            if self.speech_start is None:
+                self.speech_start = self.samples_seen
+            self.speech_samples += len(chunk)
+            self.silence_run = 0
+        else:
+            # Track background noise only while nobody is singing
+            if self.noise_floor is None:
+                self.noise_floor = rms
+            elif self.speech_start is None:
+                self.noise_floor = 0.9 * self.noise_floor + 0.1 * rms
+            if self.speech_start is not None:
+                self.silence_run += len(chunk)
+        self.samples_seen += len(chunk)
+
+        if self.speech_start is None:
+            if self.samples_seen >= self.no_speech_samples:
+                self.finished, self.reason = True, "no_speech"
+        elif self.silence_run >= self.silence_samples:
+            if self.speech_samples >= self.min_speech_samples:
+                self.finished, self.reason = True, "endpoint"
+            else:
+                # Too short to be singing, treat it as a click and keep listening
+                self.speech_start = None
+                self.speech_samples = 0
+                self.silence_run = 0
+        return self.finished
+
+
+class MicrophoneSource:
+    def __init__(self, audio, sample_rate=16000, chunk_size=1024, channels=1, format=None,
+                 poll_seconds=0.1, stall_seconds=2.0):
+        """
+        PyAudio input stream whose callback feeds a queue, iterated as float32 chunks
+        Iteration wakes every poll_seconds, so close() from another thread stops it,
+        and ends on its own when no chunk arrived for stall_seconds
+        """
+        self.chunks = queue.Queue()
+        self.poll_seconds = poll_seconds
+        self.stall_seconds = stall_seconds
+        self.stream = audio.open(
+            format=format,
+            channels=channels,
+            rate=sample_rate,
+            input=True,
+            frames_per_buffer=chunk_size,
+            stream_callback=self._callback
+        )
+        self.closed = False
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        self.chunks.put(in_data)
+        # 0 is pyaudio.paContinue
+        return (None, 0)
+
+    def __iter__(self):
+        last_chunk = time.monotonic()
+        while not self.closed:
+            try:
+                data = self.chunks.get(timeout=self.poll_seconds)
+            except queue.Empty:
+                if time.monotonic() - last_chunk >= self.stall_seconds:
+                    print("Microphone stopped sending audio")
+                    return
+                continue
+            last_chunk = time.monotonic()
+            yield np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.stream.stop_stream()
+            self.stream.close()
+
+
+def resample(samples, rate, target_rate):
+    """Linear resampling of mono float32 audio"""
+    if rate == target_rate or not len(samples):
+        return samples
+    duration = len(samples) / rate
+    target = np.arange(int(duration * target_rate)) / target_rate
+    return np.interp(target, np.arange(len(samples)) / rate, samples).astype(np.float32)
+
+
+def load_audio_file(path, sample_rate=16000):
+    """
+    Decode a WAV or FLAC clip to mono float32 at sample_rate, like record_audio() returns
+    16-bit WAV needs nothing extra, other files use soundfile when it is installed
+    and otherwise whisper's ffmpeg loader
+    """
+    if path.lower().endswith(".wav"):
+        try:
+            return WavFileSource(path, sample_rate).read_all()
+        except (ValueError, wave.Error):
+            pass
+    try:
+        import soundfile
+    except ImportError:
+        import whisper
+        if sample_rate != whisper.audio.SAMPLE_RATE:
+            raise ValueError(f"whisper decodes audio at {whisper.audio.SAMPLE_RATE} Hz only")
+        return whisper.load_audio(path)
+    samples, rate = soundfile.read(path, dtype='float32', always_2d=True)
+    return resample(samples.mean(axis=1), rate, sample_rate)
+
+
+class WavFileSource:
+    def __init__(self, path, sample_rate=16000, chunk_size=1024, realtime=False):
+        """
+        Stand-in for the microphone that plays a 16-bit PCM WAV file as chunks
+        realtime=True paces the chunks like a live recording
+        """
+        self.path = path
+        self.sample_rate = sample_rate
+        self.chunk_size = chunk_size
+        self.realtime = realtime
+        self.closed = False
+
+    def read_all(self):
+        """Whole file as mono float32 at sample_rate"""
+        with wave.open(self.path, 'rb') as wav:
+            if wav.getsampwidth() != 2:
+                raise ValueError(f"{self.path}: only 16-bit PCM WAV files are supported")
+            channels = wav.getnchannels()
+            rate = wav.getframerate()
+            frames = wav.readframes(wav.getnframes())
+
+        samples = np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768.0
+        if channels > 1:
+            samples = samples.reshape(-1, channels).mean(axis=1)
+        return resample(samples, rate, self.sample_rate)
+
+    def __iter__(self):
+        samples = self.read_all()
+        chunk_seconds = self.chunk_size / self.sample_rate
+        for start in range(0, len(samples), self.chunk_size):
+            if self.closed:
+                break
+            if self.realtime:
+                time.sleep(chunk_seconds)
+            yield samples[start:start + self.chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+def capture_utterance(source, sample_rate=16000, max_seconds=10, endpointer=None,
+                      pre_roll_seconds=0.3, on_chunk=None):
+    """
+    Stream chunks from source until the endpointer hears the end of the utterance
+    Returns float32 audio trimmed to the speech plus a little pre-roll, or None
+    if nobody sang. on_chunk(ring, endpointer) is called after every chunk.
+    """
+    endpointer = endpointer or EnergyEndpointer(sample_rate)
+    max_samples = int(max_seconds * sample_rate)
+    ring = AudioRingBuffer(max_samples)
+
+    for chunk in source:
+        ring.write(chunk)
+        endpointer.process(chunk)
+        if on_chunk is not None:
+            on_chunk(ring, endpointer)
+        if endpointer.finished:
+            break
+        if ring.total_written >= max_samples:
+            endpointer.reason = "max_length"
+            break
+
+    if endpointer.speech_start is None:
+        return None
+    start = max(endpointer.speech_start - int(pre_roll_seconds * sample_rate), 0)
+    return ring.since(start)
@@ -0,0 +1,121 @@
+import zlib
+from array import array
+from difflib import SequenceMatcher
+
+# Marks a bin no shingle fell into
+EMPTY_BIN = 0xFFFFFFFF
+
+
+def shingles(tokens, shingle_words=3):
+    size = min(shingle_words, len(tokens))
+    return [" ".join(tokens[start:start + size]) for start in range(len(tokens) - size + 1)]
+
+
+def lyric_signature(tokens, bins=64, shingle_words=3):
+    """
+    One-permutation MinHash of a lyric's shingle_words word shingles
+    Each shingle is hashed once with crc32, the hash picks a bin and each bin
+    keeps its smallest hash. crc32 is stable across processes, unlike hash(),
+    so signatures from parallel build workers agree. None for empty lyrics.
+    """
+    if not tokens:
+        return None
+    signature = [EMPTY_BIN] * bins
+    for shingle in shingles(tokens, shingle_words):
+        value = zlib.crc32(shingle.encode('utf-8'))
+        bin_idx = value % bins
+        if value < signature[bin_idx]:
+            signature[bin_idx] = value
+    return tuple(signature)
+
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of two signatures, bins empty in both are skipped"""
+    agree = used = 0
+    for a, b in zip(first, second):
+        if a == EMPTY_BIN and b == EMPTY_BIN:
+            continue
+        used += 1
+        agree += a == b
+    return agree / used if used else 0.0
+
+
+class DuplicateDetector:
+    def __init__(self, threshold=0.5, bins=64, bands=16, shingle_words=3):
+        """
+        Groups songs whose lyrics are near-duplicates, e.g. remixes and live versions
+        Signatures are split into bands, songs sharing any whole band are
+        candidates and a candidate at threshold estimated similarity or more
+        is a match. Only the first song of each group is bucketed.
+        """
+        if bins % bands:
+            raise ValueError("bins must be a multiple of bands")
+        self.threshold = threshold
+        self.bins = bins
+        self.rows = bins // bands
+        self.shingle_words = shingle_words
+        self.buckets = {}
+
+    def _band_keys(self, signature):
+        rows = self.rows
+        for start in range(0, self.bins, rows):
+            band = signature[start:start + rows]
+            if any(value != EMPTY_BIN for value in band):
+                yield start, band
+
+    def match(self, tokens, item):
+        """
+        The item of the earlier song whose lyrics tokens duplicate, if any,
+        otherwise item is remembered as the first of a new group and None returned
+        """
+        signature = lyric_signature(tokens, self.bins, self.shingle_words)
+        if signature is None:
+            return None
+        seen = set()
+        for band_key in self._band_keys(signature):
+            for candidate_signature, candidate in self.buckets.get(band_key, ()):
+                if id(candidate) in seen:
+                    continue
+                seen.add(id(candidate))
+                if similarity(signature, candidate_signature) >= self.threshold:
+                    return candidate
+        for band_key in self._band_keys(signature):
+            self.buckets.setdefault(band_key, []).append((signature, item))
+        return None
+
+
+def lyric_delta(original, lyric):
+    """
+    lyric as edits of original: (steps, inserted), or None when that saves nothing
+    Both are split on single spaces. Each step is a (start, end, count) triple in
+    steps: copy original words start:end, then take the next count words of
+    inserted, which holds every inserted word joined by spaces.
+    """
+    original_words = original.split(" ")
+    words = lyric.split(" ")
+    matcher = SequenceMatcher(None, original_words, words, autojunk=False)
+    steps = array('I')
+    inserted = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            steps.extend((i1, i2, 0))
+        elif j2 > j1:
+            steps.extend((0, 0, j2 - j1))
+            inserted.extend(words[j1:j2])
+    inserted = " ".join(inserted)
+    if len(inserted) + steps.itemsize * len(steps) >= len(lyric):
+        return None
+    return steps, inserted
+
+
+def apply_lyric_delta(original, delta):
+    """The lyric lyric_delta(original, lyric) was made from"""
+    steps, inserted = delta
+    original_words = original.split(" ")
+    inserted_words = iter(inserted.split(" "))
+    words = []
+    for step in range(0, len(steps), 3):
+        start, end, count = steps[step:step + 3]
+        words.extend(original_words[start:end])
+        words.extend(next(inserted_words) for _ in range(count))
+    return " ".join(words)
@@ -0,0 +1,141 @@
+import heapq
+from array import array
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+from core.normalize import normalize_query, normalize_song
+
+
+class FuzzyIndex:
+    def __init__(self, songs=None, lyric_words=10, gram_size=3, normalized=None):
+        """
+        Character n-gram index over titles, artists and opening lyric words
+        Replaces rebuilding the difflib vocabulary on every fuzzy search
+        """
+        self.lyric_words = lyric_words
+        self.gram_size = gram_size
+        self.terms = []
+        self.term_ids = {}
+        self.term_songs = []
+        # Term ids per song, what remove_song() unlinks
+        self.song_term_ids = []
+        self.term_gram_counts = []
+        self.gram_postings = defaultdict(list)
+        self.song_count = 0
+        if songs:
+            for song_idx, song in enumerate(songs):
+                self.add_song(song, normalized[song_idx] if normalized else None)
+
+    def _grams(self, text):
+        padded = f"^{text}$"
+        return {padded[i:i + self.gram_size] for i in range(len(padded) - self.gram_size + 1)}
+
+    def song_terms(self, song, normalized=None):
+        """Normalized terms a song contributes to fuzzy matching"""
+        normalized = normalized or normalize_song(song)
+        terms = [
+            normalized["Title"].text,
+            normalized["Artist"].text,
+            *normalized["Lyric"].text.split()[:self.lyric_words]
+        ]
+        return [term for term in terms if term]
+
+    def add_song(self, song, normalized=None):
+        """Index the fuzzy terms of one song and return its index"""
+        song_idx = self.song_count
+        self.song_count += 1
+        term_ids = array('I')
+        self.song_term_ids.append(term_ids)
+        for term in dict.fromkeys(self.song_terms(song, normalized)):
+            term_id = self.term_ids.get(term)
+            if term_id is not None:
+                self.term_songs[term_id].append(song_idx)
+                term_ids.append(term_id)
+                continue
+            term_id = len(self.terms)
+            term_ids.append(term_id)
+            self.term_ids[term] = term_id
+            self.terms.append(term)
+            self.term_songs.append([song_idx])
+            grams = self._grams(term)
+            self.term_gram_counts.append(len(grams))
+            for gram in grams:
+                self.gram_postings[gram].append(term_id)
+        return song_idx
+
+    def merge(self, other):
+        """Append every song of another FuzzyIndex, after ours"""
+        offset = self.song_count
+        first_new = len(self.terms)
+        term_map = []
+        for term_id, term in enumerate(other.terms):
+            song_ids = [song_idx + offset for song_idx in other.term_songs[term_id]]
+            existing = self.term_ids.get(term)
+            if existing is not None:
+                self.term_songs[existing].extend(song_ids)
+                term_map.append(existing)
+                continue
+            new_id = len(self.terms)
+            self.term_ids[term] = new_id
+            self.terms.append(term)
+            self.term_songs.append(song_ids)
+            self.term_gram_counts.append(other.term_gram_counts[term_id])
+            term_map.append(new_id)
+        for gram, term_ids in other.gram_postings.items():
+            # Terms we already had are in our postings
+            mapped = [term_map[term_id] for term_id in term_ids if term_map[term_id] >= first_new]
+            if mapped:
+                self.gram_postings[gram].extend(mapped)
+        self.song_term_ids.extend(array('I', (term_map[term_id] for term_id in term_ids))
+                                  for term_ids in other.song_term_ids)
+        self.song_count += other.song_count
+
+    def remove_song(self, song_idx):
+        """
+        Unlink a song from the terms it added
+        Found through song_term_ids, so a lazily loaded lyric never has to be read back.
+        A term no song uses any more stays in the n-gram postings but is skipped,
+        and is reused if a later song brings it back
+        """
+        for term_id in self.song_term_ids[song_idx]:
+            self.term_songs[term_id].remove(song_idx)
+        self.song_term_ids[song_idx] = array('I')
+
+    def lookup(self, query, n=10, cutoff=0.3, candidates=50):
+        """
+        Top n (score, term, song_idx) matches for query, best first
+        Terms sharing the most n-grams with the query are shortlisted,
+        then ranked by difflib ratio with ties broken like get_close_matches
+        """
+        query = normalize_query(query)
+        query_grams = self._grams(query)
+        overlaps = defaultdict(int)
+        term_songs = self.term_songs
+        for gram in query_grams:
+            for term_id in self.gram_postings.get(gram, ()):
+                if term_songs[term_id]:
+                    overlaps[term_id] += 1
+        if not overlaps:
+            return []
+
+        # Dice coefficient over n-gram sets picks the shortlist
+        query_size = len(query_grams)
+        shortlist = heapq.nlargest(
+            candidates, overlaps.items(),
+            key=lambda item: (2.0 * item[1] / (query_size + self.term_gram_counts[item[0]]), -item[0])
+        )
+
+        matcher = SequenceMatcher()
+        matcher.set_seq2(query)
+        scored = []
+        for term_id, _ in shortlist:
+            term = self.terms[term_id]
+            matcher.set_seq1(term)
+            if matcher.real_quick_ratio() < cutoff or matcher.quick_ratio() < cutoff:
+                continue
+            score = matcher.ratio()
+            if score >= cutoff:
+                # A shared term points at the last song that used it
+                scored.append((score, term, term_songs[term_id][-1]))
+
+        return heapq.nlargest(n, scored)
@@ -0,0 +1,204 @@
+import argparse
+import io
+import json
+import threading
+import time
+from array import array
+from collections import Counter, deque
+from contextlib import contextmanager
+
+
+class LatencyHistogram:
+    def __init__(self, capacity=2048):
+        """Ring buffer of the most recent capacity samples, plus lifetime count and total"""
+        self.samples = array('d', [0.0]) * capacity
+        self.capacity = capacity
+        self.position = 0
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.samples[self.position] = seconds
+        self.position = (self.position + 1) % self.capacity
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def summary(self):
+        """Percentiles over the window, count/mean/max over the lifetime, in milliseconds"""
+        window = sorted(self.samples[:min(self.count, self.capacity)])
+        if not window:
+            return {"count": 0}
+
+        def percentile(fraction):
+            return window[min(int(fraction * len(window)), len(window) - 1)] * 1000
+
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000,
+            "p50_ms": percentile(0.50),
+            "p90_ms": percentile(0.90),
+            "p99_ms": percentile(0.99),
+            "max_ms": self.max * 1000,
+            "window": len(window)
+        }
+
+
+class Instrumentation:
+    def __init__(self, histogram_size=2048, recent_size=200):
+        """
+        Timings, counters and recent per-query records for searches and transcription
+        Histograms are ring-buffered so memory stays flat however long the process runs.
+        With profiling enabled, profiled() calls also run under cProfile or pyinstrument.
+        """
+        self.histogram_size = histogram_size
+        self.histograms = {}
+        self.counters = Counter()
+        self.recent = deque(maxlen=recent_size)
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._profile_lock = threading.Lock()
+        self.profiler = None
+        self.profiler_kind = None
+
+    def record(self, name, seconds):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram(self.histogram_size)
+            histogram.record(seconds)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def record_event(self, event):
+        """Keep a dict describing one query or transcription among the recent ones"""
+        event.setdefault("time", time.time())
+        with self._lock:
+            self.recent.append(event)
+
+    @contextmanager
+    def timer(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def enable_profiling(self, kind="cprofile"):
+        """Profile every profiled() call from now on, kind is "cprofile" or "pyinstrument" """
+        with self._profile_lock:
+            if kind == "pyinstrument":
+                from pyinstrument import Profiler
+                self.profiler = Profiler()
+            elif kind == "cprofile":
+                import cProfile
+                self.profiler = cProfile.Profile()
+            else:
+                raise ValueError(f"Unknown profiler {kind!r}")
+            self.profiler_kind = kind
+
+    def disable_profiling(self):
+        """Stop profiling and return the profiler with everything it collected"""
+        with self._profile_lock:
+            profiler, self.profiler = self.profiler, None
+            return profiler
+
+    def profiled(self, fn, *args, **kwargs):
+        """fn(*args, **kwargs), under the profiler when profiling is enabled"""
+        if self.profiler is None:
+            return fn(*args, **kwargs)
+        # A profiler follows one thread at a time, so profiled calls take turns
+        with self._profile_lock:
+            profiler = self.profiler
+            if profiler is None:
+                return fn(*args, **kwargs)
+            if self.profiler_kind == "pyinstrument":
+                profiler.start()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    profiler.stop()
+            return profiler.runcall(fn, *args, **kwargs)
+
+    def profile_report(self, limit=30):
+        """Text report of the running profiler, hottest functions first"""
+        with self._profile_lock:
+            if self.profiler is None:
+                return "Profiling is not enabled"
+            if self.profiler_kind == "pyinstrument":
+                return self.profiler.output_text()
+            import pstats
+            stream = io.StringIO()
+            pstats.Stats(self.profiler, stream=stream).sort_stats("cumulative").print_stats(limit)
+            return stream.getvalue()
+
+    def dump_profile(self, path):
+        """Write cProfile data for pstats/snakeviz, or pyinstrument's HTML report"""
+        with self._profile_lock:
+            if self.profiler is None:
+                return
+            if self.profiler_kind == "pyinstrument":
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(self.profiler.output_html())
+            else:
+                self.profiler.dump_stats(path)
+        print(f"Wrote profile to {path}")
+
+    def stats(self, recent=20):
+        with self._lock:
+            return {
+                "uptime_seconds": time.time() - self.started,
+                "timings": {name: histogram.summary() for name, histogram in sorted(self.histograms.items())},
+                "counters": dict(sorted(self.counters.items())),
+                "recent": list(self.recent)[-recent:] if recent else [],
+                "profiling": self.profiler_kind if self.profiler is not None else None
+            }
+
+    def dump(self, path, recent=200):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.stats(recent), f, ensure_ascii=False, indent=2)
+        print(f"Wrote search stats to {path}")
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.recent.clear()
+            self.started = time.time()
+
+
+def format_stats(stats):
+    """Readable table of an Instrumentation.stats() dump"""
+    lines = [f"uptime {stats.get('uptime_seconds', 0):.0f}s"]
+    lines.append(f"{'timing':32} {'count':>8} {'mean':>9} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}  (ms)")
+    for name, summary in stats.get("timings", {}).items():
+        if not summary.get("count"):
+            continue
+        lines.append(f"{name:32} {summary['count']:>8} " + " ".join(
+            f"{summary[key]:>9.2f}" for key in ("mean_ms", "p50_ms", "p90_ms", "p99_ms", "max_ms")))
+    if stats.get("counters"):
+        lines.append("")
+        lines.extend(f"{name:32} {value:>8}" for name, value in stats["counters"].items())
+    for event in stats.get("recent", [])[-10:]:
+        lines.append(json.dumps(event, ensure_ascii=False))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show search instrumentation from a stats dump or a running server")
+    parser.add_argument("source", help="JSON file written by Instrumentation.dump, or a server URL like "
+                                       "http://127.0.0.1:8765")
+    args = parser.parse_args()
+
+    if args.source.startswith(("http://", "https://")):
+        from urllib.request import urlopen
+        with urlopen(args.source.rstrip("/") + "/stats") as response:
+            stats = json.load(response)
+        stats = stats.get("instrumentation", stats)
+    else:
+        with open(args.source, encoding='utf-8') as f:
+            stats = json.load(f)
+    print(format_stats(stats))
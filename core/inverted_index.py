@@ -0,0 +1,374 @@
+import re
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+from core.normalize import SEARCH_FIELDS, TOKEN_RE, NormalizedField, normalize_query, normalize_song, tokenize
+
+
+class Postings:
+    """
+    One token's postings, read like a {song_idx: positions} dict
+    Everything sits in a single array('I'): the song count n, the n song ids in
+    increasing order, the n end offsets of their positions, then the positions.
+    """
+    __slots__ = ("data",)
+
+    def __init__(self):
+        self.data = array('I', (0,))
+
+    def __len__(self):
+        return self.data[0]
+
+    def __eq__(self, other):
+        return isinstance(other, Postings) and self.data == other.data
+
+    __hash__ = None
+
+    def __iter__(self):
+        return iter(self.data[1:self.data[0] + 1])
+
+    keys = __iter__
+
+    def _find(self, song_idx):
+        """Slot of song_idx among the ids, 0 when it is not there"""
+        data = self.data
+        count = data[0]
+        slot = bisect_left(data, song_idx, 1, count + 1)
+        return slot if slot <= count and data[slot] == song_idx else 0
+
+    def __contains__(self, song_idx):
+        return self._find(song_idx) > 0
+
+    def get(self, song_idx, default=None):
+        slot = self._find(song_idx)
+        if not slot:
+            return default
+        data = self.data
+        count = data[0]
+        base = 2 * count + 1
+        start = data[count + slot - 1] if slot > 1 else 0
+        return data[base + start:base + data[count + slot]]
+
+    def __getitem__(self, song_idx):
+        positions = self.get(song_idx)
+        if positions is None:
+            raise KeyError(song_idx)
+        return positions
+
+    def items(self):
+        data = self.data
+        count = data[0]
+        base = start = 2 * count + 1
+        for slot in range(1, count + 1):
+            end = base + data[count + slot]
+            yield data[slot], data[start:end]
+            start = end
+
+    def values(self):
+        for _, positions in self.items():
+            yield positions
+
+    def add(self, song_idx, positions):
+        """Append a song, song_idx must be larger than every id held"""
+        data = self.data
+        count = data[0]
+        end = data[2 * count] if count else 0
+        data.insert(count + 1, song_idx)
+        data.insert(2 * count + 2, end + len(positions))
+        data.extend(positions)
+        data[0] = count + 1
+
+    def remove(self, song_idx):
+        slot = self._find(song_idx)
+        if not slot:
+            return
+        data = self.data
+        count = data[0]
+        base = 2 * count + 1
+        start = data[count + slot - 1] if slot > 1 else 0
+        end = data[count + slot]
+        del data[base + start:base + end]
+        for later in range(count + slot + 1, 2 * count + 1):
+            data[later] -= end - start
+        del data[count + slot]
+        del data[slot]
+        data[0] = count - 1
+
+
+class InvertedIndex:
+    def __init__(self, songs=None, fields=SEARCH_FIELDS, normalized=None, store_lyrics=True):
+        """
+        Token-level inverted index with positional postings over normalized fields
+        postings: token -> Postings, read as {song_idx: positions}
+        normalized optionally holds the songs' normalize_song() output
+        texts keeps each song's normalized fields to verify substring matches,
+        with store_lyrics=False the Lyric is left out (None) and search() reads it
+        back through its load_text argument instead
+        """
+        self.fields = fields
+        self.store_lyrics = store_lyrics
+        self.postings = {}
+        self.texts = []
+        self.field_lengths = []
+        # Live songs and their summed field lengths, kept current for BM25 averages
+        self.live_count = 0
+        self.field_totals = [0] * len(fields)
+        self._sorted_vocab = None
+        self._sorted_reversed_vocab = None
+        self._vocab_blob = None
+        self._vocab_offsets = None
+        if songs:
+            for song_idx, song in enumerate(songs):
+                self.add_song(song, normalized[song_idx] if normalized else None)
+
+    def add_song(self, song, normalized=None):
+        """Index one song and return its index"""
+        song_idx = len(self.texts)
+        normalized = normalized or normalize_song(song, self.fields)
+        self.texts.append(tuple(normalized[field].text if self.store_lyrics or field != "Lyric" else None
+                                for field in self.fields))
+
+        position = 0
+        lengths = []
+        song_positions = {}
+        for field_idx, field in enumerate(self.fields):
+            tokens = normalized[field].tokens
+            for token in tokens:
+                song_positions.setdefault(token, []).append(position)
+                position += 1
+            # Leave a gap so phrases never run across two fields
+            position += 1
+            lengths.append(len(tokens))
+            self.field_totals[field_idx] += len(tokens)
+        self.field_lengths.append(tuple(lengths))
+        self.live_count += 1
+
+        new_tokens = False
+        for token, positions in song_positions.items():
+            postings = self.postings.get(token)
+            if postings is None:
+                postings = self.postings[token] = Postings()
+                new_tokens = True
+            postings.add(song_idx, positions)
+
+        if new_tokens:
+            self._sorted_vocab = None
+        return song_idx
+
+    def merge(self, other):
+        """Append every song of another InvertedIndex over the same fields, after ours"""
+        offset = len(self.texts)
+        new_tokens = False
+        for token, postings in other.postings.items():
+            target = self.postings.get(token)
+            if target is None:
+                # Tokens arriving from another process are no longer interned
+                target = self.postings[sys.intern(token)] = Postings()
+                new_tokens = True
+            for song_idx, positions in postings.items():
+                target.add(song_idx + offset, positions)
+        self.texts.extend(other.texts)
+        self.field_lengths.extend(other.field_lengths)
+        for field_idx, total in enumerate(other.field_totals):
+            self.field_totals[field_idx] += total
+        self.live_count += other.live_count
+        if new_tokens:
+            self._sorted_vocab = None
+
+    def normalized_songs(self, song_ids):
+        """
+        normalize_song() output of indexed songs, rebuilt from the stored texts
+        A Lyric that is not stored is put back together from the positional
+        postings, its text is then the tokens joined by spaces
+        """
+        song_ids = [song_idx for song_idx in song_ids if self.texts[song_idx]]
+        tokens_at = {song_idx: {} for song_idx in song_ids}
+        if not self.store_lyrics and song_ids:
+            wanted = set(song_ids)
+            for token, postings in self.postings.items():
+                for song_idx in wanted.intersection(postings):
+                    for position in postings[song_idx]:
+                        tokens_at[song_idx][position] = token
+
+        normalized_songs = {}
+        for song_idx in song_ids:
+            normalized = normalized_songs[song_idx] = {}
+            start = 0
+            for field, text, length in zip(self.fields, self.texts[song_idx], self.field_lengths[song_idx]):
+                if text is None:
+                    tokens = [tokens_at[song_idx][position] for position in range(start, start + length)]
+                    normalized[field] = NormalizedField(" ".join(tokens), tokens)
+                else:
+                    normalized[field] = NormalizedField(text, tokenize(text))
+                start += length + 1
+        return normalized_songs
+
+    def remove_song(self, song_idx, normalized=None):
+        """
+        Drop a song's postings, its index stays reserved so later songs keep theirs
+        Only the postings of the song's own tokens are touched, taken from
+        normalized or else from normalized_songs()
+        """
+        if not self.texts[song_idx]:
+            return
+        normalized = normalized or self.normalized_songs((song_idx,))[song_idx]
+        removed_tokens = False
+        for field in self.fields:
+            for token in set(normalized[field].tokens):
+                postings = self.postings.get(token)
+                if postings is None:
+                    continue
+                postings.remove(song_idx)
+                if not postings:
+                    del self.postings[token]
+                    removed_tokens = True
+
+        for field_idx, length in enumerate(self.field_lengths[song_idx]):
+            self.field_totals[field_idx] -= length
+        self.texts[song_idx] = ()
+        self.field_lengths[song_idx] = (0,) * len(self.fields)
+        self.live_count -= 1
+
+        if removed_tokens:
+            self._sorted_vocab = None
+
+    def __len__(self):
+        return len(self.texts)
+
+    def field_of(self, song_idx, position):
+        """Which field (index into self.fields) a token position falls in"""
+        start = 0
+        for field_idx, length in enumerate(self.field_lengths[song_idx]):
+            start += length + 1
+            if position < start:
+                return field_idx
+        return len(self.fields) - 1
+
+    def _vocab(self):
+        if self._sorted_vocab is None:
+            self._sorted_vocab = sorted(self.postings)
+            self._sorted_reversed_vocab = sorted(token[::-1] for token in self.postings)
+            # One newline-joined string lets infix lookups run as a single C-level scan
+            self._vocab_blob = "\n".join(self._sorted_vocab)
+            self._vocab_offsets = []
+            offset = 0
+            for token in self._sorted_vocab:
+                self._vocab_offsets.append(offset)
+                offset += len(token) + 1
+        return self._sorted_vocab, self._sorted_reversed_vocab
+
+    @staticmethod
+    def _prefix_range(sorted_terms, prefix):
+        start = bisect_left(sorted_terms, prefix)
+        end = start
+        while end < len(sorted_terms) and sorted_terms[end].startswith(prefix):
+            end += 1
+        return sorted_terms[start:end]
+
+    def prefix_tokens(self, prefix):
+        """Vocabulary tokens starting with prefix, in sorted order"""
+        vocab, _ = self._vocab()
+        return self._prefix_range(vocab, prefix)
+
+    def _matching_tokens(self, fragment, kind):
+        """Vocabulary tokens a query fragment can stand for inside a longer string"""
+        if kind == "exact":
+            return [fragment] if fragment in self.postings else []
+        vocab, reversed_vocab = self._vocab()
+        if kind == "prefix":
+            return self._prefix_range(vocab, fragment)
+        if kind == "suffix":
+            return [token[::-1] for token in self._prefix_range(reversed_vocab, fragment[::-1])]
+        tokens = []
+        last_idx = -1
+        for match in re.finditer(re.escape(fragment), self._vocab_blob):
+            token_idx = bisect_right(self._vocab_offsets, match.start()) - 1
+            if token_idx != last_idx:
+                tokens.append(vocab[token_idx])
+                last_idx = token_idx
+        return tokens
+
+    def _songs_containing(self, tokens):
+        """Union of the songs in the postings of several tokens"""
+        songs = set()
+        for token in tokens:
+            songs.update(self.postings[token])
+            if len(songs) == len(self.texts):
+                break
+        return songs
+
+    def phrase_songs(self, phrase_tokens):
+        """Songs where phrase_tokens appear as consecutive tokens"""
+        postings = [self.postings.get(token) for token in phrase_tokens]
+        if not all(postings):
+            return set()
+
+        # Keep start positions whose following tokens sit right next to them
+        matches = {song_idx: set(positions) for song_idx, positions in postings[0].items()}
+        for offset in range(1, len(postings)):
+            following = postings[offset]
+            next_matches = {}
+            for song_idx, starts in matches.items():
+                positions = following.get(song_idx)
+                if positions is None:
+                    continue
+                positions = set(positions)
+                kept = {start for start in starts if start + offset in positions}
+                if kept:
+                    next_matches[song_idx] = kept
+            if not next_matches:
+                return set()
+            matches = next_matches
+        return set(matches)
+
+    def candidates(self, query):
+        """
+        Songs that may contain query as a substring, or None when the query
+        has no word characters and the index cannot narrow it down
+        """
+        query_tokens = TOKEN_RE.findall(query)
+        if not query_tokens:
+            return None
+
+        if len(query_tokens) == 1:
+            return sorted(self._songs_containing(self._matching_tokens(query_tokens[0], "infix")))
+
+        # Inner tokens are whole words in any match, the outer two may be cut off
+        inner_tokens = query_tokens[1:-1]
+        if inner_tokens:
+            return sorted(self.phrase_songs(inner_tokens))
+
+        first = self._songs_containing(self._matching_tokens(query_tokens[0], "suffix"))
+        if not first:
+            return []
+        last = self._songs_containing(self._matching_tokens(query_tokens[-1], "prefix"))
+        return sorted(first & last)
+
+    def search(self, query, limit=None, stats=None, load_text=None):
+        """
+        Song indices whose Title, Artist or Lyric contains query, in corpus order
+        With a limit, candidates stop being verified once it is reached.
+        A stats dict gets the number of candidates the index could not rule out.
+        load_text(song_idx, field) returns the normalized text of a field that
+        is not stored, a candidate is checked against it last
+        """
+        query = normalize_query(query)
+        candidates = self.candidates(query)
+        if candidates is None:
+            candidates = range(len(self.texts))
+        if stats is not None:
+            stats["candidates"] = len(candidates)
+        fields = self.fields
+        matches = []
+        for song_idx in candidates:
+            texts = self.texts[song_idx]
+            if not texts:
+                continue
+            if any(text is not None and query in text for text in texts) or (
+                    load_text is not None and
+                    any(text is None and query in load_text(song_idx, field) for field, text in zip(fields, texts))):
+                matches.append(song_idx)
+                if limit is not None and len(matches) >= limit:
+                    break
+        return matches
@@ -1,12 +1,15 @@
-import json
-import glob
 import os
+from core.duplicates import DuplicateDetector
+from core.lexicon_cache import LexiconCache, lexicon_files
+from core.lexicon_stream import LyricRef, iter_lexicon_file
+from core.normalize import normalize_song
+from core.song_record import SongRecord
 
 class LexiconManager:
-    def __init__(self):
-        # Get absolute path to the lexicons directory
+    def __init__(self, lexicon_dir=None):
+        # Get absolute path to the lexicons directory, the bundled one unless given
         current_dir = os.path.dirname(os.path.abspath(__file__))
-        self.lexicon_dir = os.path.join(current_dir, 'lexicons')
+        self.lexicon_dir = os.path.abspath(lexicon_dir or os.path.join(current_dir, 'lexicons'))
         
         if not os.path.exists(self.lexicon_dir):
             os.makedirs(self.lexicon_dir)
@@ -14,30 +17,122 @@ class LexiconManager:
         else:
             print(f"Found lexicons directory at: {self.lexicon_dir}")
         
-    def load_all_lexicons(self):
-        combined_data = {"songs": []}
+        # Called with the fresh data after every load, e.g. to drop cached results
+        self.reload_listeners = []
+
+    def add_reload_listener(self, listener):
+        self.reload_listeners.append(listener)
+
+    def notify_reload(self, song_data):
+        for listener in self.reload_listeners:
+            listener(song_data)
+
+    def lexicon_files(self):
+        return lexicon_files(self.lexicon_dir)
+
+    @staticmethod
+    def file_state(file_path):
+        """Size, mtime and hash of a lexicon file, as stored in the cache manifest"""
+        stat = os.stat(file_path)
+        return {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha1": LexiconCache.file_hash(file_path)
+        }
+
+    @staticmethod
+    def iter_songs(file_path, lazy_lyrics=False):
+        """
+        Stream (SongRecord, normalized) pairs out of one lexicon file
+        With lazy_lyrics each record leaves its Lyric on disk.
+        Near-duplicate lyrics within the file make a song a version of the first
+        one. Versions are indexed with their own full lyric, only the stored
+        lyric is shared with the first one, see SongRecord.add_version().
+        A file that fails to parse midway keeps the songs read before the error.
+        """
+        print(f"Loading: {file_path}")
+        detector = DuplicateDetector()
+        try:
+            for song, offset, length in iter_lexicon_file(file_path):
+                normalized = normalize_song(song)
+                record = SongRecord(song, LyricRef(file_path, offset, length) if lazy_lyrics else None)
+                original = detector.match(normalized["Lyric"].tokens, record)
+                if original is not None:
+                    original.add_version(record)
+                yield record, normalized
+        except Exception as e:
+            print(f"Error loading {file_path}: {e}")
+
+    def load_all_lexicons(self, lazy_lyrics=False, on_song=None):
+        """
+        Load every lexicon file into {"songs": [...], "normalized": [...]}
+        normalized[i] holds the normalized text and tokens of songs[i]'s
+        search fields, computed once here so no search stage redoes it.
+        sources maps each file name to the indices of its songs and
+        file_states records the files as they were read, for scan_changes().
+        With lazy_lyrics, records have no Lyric and normalized holds None:
+        on_song(song_idx, song, normalized) sees each song while it streams by
+        so indexes can be built without keeping every lyric in memory
+        """
+        combined_data = {"songs": [], "normalized": [], "sources": {}, "file_states": {}}
         
         # Look for any .json files in lexicons directory
-        json_files = glob.glob(os.path.join(self.lexicon_dir, '*.json'))
+        json_files = self.lexicon_files()
         
         if not json_files:
             print(f"No JSON files found in {self.lexicon_dir}")
             return combined_data
         
         for file_path in json_files:
-            print(f"Loading: {file_path}")
+            name = os.path.basename(file_path)
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    artist_data = json.load(f)
-                    # Add artist to each song
-                    for song in artist_data:
-                        # song["Artist"] = song["Artist"]
-                        combined_data["songs"].append(song)
-            except Exception as e:
-                print(f"Error loading {file_path}: {e}")
+                combined_data["file_states"][name] = self.file_state(file_path)
+            except OSError as e:
+                print(f"Error reading {file_path}: {e}")
+                continue
+            song_ids = combined_data["sources"][name] = []
+            for song, normalized in self.iter_songs(file_path, lazy_lyrics):
+                song_idx = len(combined_data["songs"])
+                song_ids.append(song_idx)
+                combined_data["songs"].append(song)
+                combined_data["normalized"].append(None if lazy_lyrics else normalized)
+                if on_song is not None:
+                    on_song(song_idx, song, normalized)
         
         print(f"Total songs loaded: {len(combined_data['songs'])}")
+        self.notify_reload(combined_data)
         return combined_data
+
+    def scan_changes(self, file_states):
+        """
+        Compare file_states from an earlier load with the lexicon directory
+        Returns {"added", "changed", "removed"} lists of file names and the
+        current "states". Only files whose size or mtime moved are hashed,
+        so a touch without an edit is not a change.
+        """
+        changes = {"added": [], "changed": [], "removed": [], "states": {}}
+        for file_path in self.lexicon_files():
+            name = os.path.basename(file_path)
+            try:
+                stat = os.stat(file_path)
+                known = file_states.get(name)
+                if known is not None and (stat.st_size, stat.st_mtime_ns) == (known["size"], known["mtime_ns"]):
+                    changes["states"][name] = known
+                    continue
+                state = self.file_state(file_path)
+            except OSError as e:
+                # Removed or replaced while scanning, the next scan sees it settled
+                print(f"Error reading {file_path}: {e}")
+                if name in file_states:
+                    changes["states"][name] = file_states[name]
+                continue
+            changes["states"][name] = state
+            if known is None:
+                changes["added"].append(name)
+            elif state["sha1"] != known["sha1"]:
+                changes["changed"].append(name)
+        changes["removed"] = sorted(set(file_states) - set(changes["states"]))
+        return changes
     
 def build_artist_song_map(*artist_lexicons):
     """Build a mapping of all songs with their artists"""
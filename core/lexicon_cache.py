@@ -0,0 +1,204 @@
+import gc
+import glob
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+import threading
+from collections.abc import Mapping
+
+CACHE_MAGIC = b"SPKLEX"
+# Bump whenever the layout of a cached index changes
+CACHE_VERSION = 17
+HEADER = struct.Struct("<6sHI")
+# Ends the file: offset and length of the JSON table of pickled sections
+TRAILER = struct.Struct("<QI")
+# JSON arrays of songs, or one song object per line
+LEXICON_PATTERNS = ('*.json', '*.jsonl')
+
+
+def lexicon_files(lexicon_dir):
+    files = set()
+    for pattern in LEXICON_PATTERNS:
+        files.update(glob.glob(os.path.join(lexicon_dir, pattern)))
+    return sorted(files)
+
+
+def _unpickle(data):
+    # Indexes hold many small containers, skip GC passes while they unpickle
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return pickle.loads(data)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+class LazyState(Mapping):
+    def __init__(self, cache_file, mm, sections):
+        """
+        Cached state whose sections are unpickled from the mapped file on first access
+        sections maps each state key to the (offset, length) of its pickle. The
+        file is unmapped once every section has been read.
+        """
+        self.cache_file = cache_file
+        self.mm = mm
+        self.sections = sections
+        self.loaded = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key):
+        value = self.loaded.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            if key not in self.loaded:
+                offset, length = self.sections[key]
+                with memoryview(self.mm) as view:
+                    self.loaded[key] = _unpickle(view[offset:offset + length])
+                if len(self.loaded) == len(self.sections):
+                    self.close()
+            return self.loaded[key]
+
+    def __iter__(self):
+        return iter(self.sections)
+
+    def __len__(self):
+        return len(self.sections)
+
+    def close(self):
+        if self.mm is not None:
+            self.mm.close()
+            self.cache_file.close()
+            self.mm = None
+
+
+class LexiconCache:
+    def __init__(self, lexicon_dir, cache_path=None):
+        """
+        Compiled cache of the lexicons and every search index built from them
+        Layout: magic, version, manifest length, JSON manifest, one pickle per
+        state key, the JSON table of those pickles and TRAILER. Loading reads the
+        header, manifest and table only, each section unpickles on first use,
+        so startup costs the sections the first search needs, not the whole file.
+        """
+        self.lexicon_dir = lexicon_dir
+        self.cache_path = cache_path or os.path.join(lexicon_dir, ".cache", "lexicons.bin")
+
+    def source_files(self):
+        return lexicon_files(self.lexicon_dir)
+
+    @staticmethod
+    def file_hash(file_path):
+        digest = hashlib.sha1()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def build_manifest(self):
+        """Describe the current lexicon files by name, size, mtime and hash"""
+        manifest = []
+        for file_path in self.source_files():
+            stat = os.stat(file_path)
+            manifest.append({
+                "name": os.path.basename(file_path),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha1": self.file_hash(file_path)
+            })
+        return manifest
+
+    @staticmethod
+    def manifest_of(file_states):
+        """Manifest of files as LexiconManager recorded them when it read them"""
+        return [{"name": name, **state} for name, state in sorted(file_states.items())]
+
+    def is_current(self, manifest):
+        """Check a stored manifest against the files on disk"""
+        files = self.source_files()
+        if [entry["name"] for entry in manifest] != [os.path.basename(f) for f in files]:
+            return False
+        for entry, file_path in zip(manifest, files):
+            stat = os.stat(file_path)
+            if stat.st_size != entry["size"]:
+                return False
+            # Only hash files whose mtime moved, a touch alone keeps the cache
+            if stat.st_mtime_ns != entry["mtime_ns"] and self.file_hash(file_path) != entry["sha1"]:
+                return False
+        return True
+
+    def load(self):
+        """Return the cached state as a LazyState, or None if it is missing or stale"""
+        if not os.path.exists(self.cache_path):
+            return None
+        f = mm = None
+        try:
+            f = open(self.cache_path, 'rb')
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, manifest_size = HEADER.unpack_from(mm, 0)
+            if magic != CACHE_MAGIC or version != CACHE_VERSION:
+                print(f"Ignoring lexicon cache with version {version}")
+                return None
+            manifest = json.loads(mm[HEADER.size:HEADER.size + manifest_size].decode('utf-8'))
+            if not self.is_current(manifest):
+                print("Lexicon files changed, cache is stale")
+                return None
+            table_offset, table_size = TRAILER.unpack_from(mm, len(mm) - TRAILER.size)
+            sections = json.loads(mm[table_offset:table_offset + table_size].decode('utf-8'))
+            state = LazyState(f, mm, {key: tuple(section) for key, section in sections.items()})
+            f = mm = None
+        except Exception as e:
+            print(f"Error loading lexicon cache {self.cache_path}: {e}")
+            return None
+        finally:
+            if mm is not None:
+                mm.close()
+            if f is not None:
+                f.close()
+
+        print(f"Loaded compiled lexicons from: {self.cache_path}")
+        return state
+
+    def save(self, state, manifest=None):
+        """
+        Compile state into the cache file, replacing it atomically
+        Pass the manifest of the files state was built from when they may
+        have changed since, otherwise the files on disk are described
+        """
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            if manifest is None:
+                manifest = self.build_manifest()
+            manifest = json.dumps(manifest).encode('utf-8')
+            # A file of our own, processes compiling at once never write into each other's
+            fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(self.cache_path) + ".",
+                                            suffix=".tmp", dir=os.path.dirname(self.cache_path))
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(HEADER.pack(CACHE_MAGIC, CACHE_VERSION, len(manifest)))
+                    f.write(manifest)
+                    sections = {}
+                    for key, value in state.items():
+                        offset = f.tell()
+                        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                        sections[key] = (offset, f.tell() - offset)
+                    table = json.dumps(sections).encode('utf-8')
+                    table_offset = f.tell()
+                    f.write(table)
+                    f.write(TRAILER.pack(table_offset, len(table)))
+                os.replace(tmp_path, self.cache_path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+            print(f"Compiled lexicons to: {self.cache_path}")
+        except Exception as e:
+            print(f"Error writing lexicon cache {self.cache_path}: {e}")
+
+    def clear(self):
+        if os.path.exists(self.cache_path):
+            os.remove(self.cache_path)
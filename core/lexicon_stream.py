@@ -0,0 +1,80 @@
+import codecs
+import json
+from collections import namedtuple
+
+# Byte span of one song object in its lexicon file
+LyricRef = namedtuple("LyricRef", ["path", "offset", "length"])
+
+JSON_SEPARATORS = " \t\r\n,"
+
+
+def iter_json_array(file_path, chunk_size=1 << 16):
+    """
+    Yield (song, offset, length) for each object of a JSON array file
+    Reads chunk_size bytes at a time, so memory holds one chunk and one song
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    buffer_offset = 0  # byte offset of buffer[0] in the file
+    position = 0
+    eof = False
+    with open(file_path, 'rb') as f:
+        while True:
+            while position < len(buffer) and buffer[position] in JSON_SEPARATORS:
+                position += 1
+            if position < len(buffer) and buffer[position] in "[]":
+                position += 1
+                continue
+            if position == len(buffer) and eof:
+                return
+            try:
+                if position == len(buffer):
+                    raise json.JSONDecodeError("Need more data", buffer, position)
+                song, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # The next object runs past the buffer, drop what was parsed and read on
+                buffer_offset += len(buffer[:position].encode('utf-8'))
+                buffer = buffer[position:]
+                position = 0
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer += utf8.decode(chunk, final=eof)
+                continue
+            offset = buffer_offset + len(buffer[:position].encode('utf-8'))
+            length = len(buffer[position:end].encode('utf-8'))
+            yield song, offset, length
+            buffer_offset = offset + length
+            buffer = buffer[end:]
+            position = 0
+
+
+def iter_json_lines(file_path):
+    """Yield (song, offset, length) for each line of a JSON-lines file"""
+    offset = 0
+    with open(file_path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line), offset, len(line)
+            offset += len(line)
+
+
+def iter_lexicon_file(file_path):
+    """(song, offset, length) of every song in a .json or .jsonl lexicon"""
+    if file_path.endswith(".jsonl"):
+        return iter_json_lines(file_path)
+    return iter_json_array(file_path)
+
+
+def read_lyric(lyric_ref):
+    """The Lyric of the song stored at lyric_ref, None if the file changed under it"""
+    try:
+        with open(lyric_ref.path, 'rb') as f:
+            f.seek(lyric_ref.offset)
+            song = json.loads(f.read(lyric_ref.length))
+        return song.get("Lyric")
+    except Exception as e:
+        print(f"Error reading lyrics from {lyric_ref.path}: {e}")
+        return None
@@ -0,0 +1,72 @@
+import numpy as np
+
+
+class NgramMatrix:
+    def __init__(self, ngram_index, song_count):
+        """
+        CSR matrix (n-grams x songs) view of a CompactNgramIndex
+        Rows follow the index's sorted keys and every stored song counts once,
+        so a query's row sums reproduce SongFinder._ngram_scores exactly
+        """
+        ngram_index.freeze()
+        self.index = ngram_index
+        self.song_count = song_count
+        self.keys = np.frombuffer(ngram_index.keys, dtype=np.uint64)
+        self.indptr = np.frombuffer(ngram_index.offsets, dtype=np.uint64).astype(np.int64) // 2
+        postings = np.frombuffer(ngram_index.data, dtype=np.uint32)
+        self.indices = postings[0::2].astype(np.int64)
+        self.term_frequencies = postings[1::2]
+
+    def _query_rows(self, query):
+        keys, size = self.index.query_keys(query)
+        rows = np.searchsorted(self.keys, np.asarray(keys, dtype=np.uint64))
+        return rows, max(size, 1)
+
+    def score_counts(self, queries):
+        """
+        Shared n-gram counts of every (query, song) pair with any, and each query's n-gram total
+        Returned as query_ids, song_ids and counts sorted by query then song, so
+        memory follows the postings the queries touch, not queries x songs
+        """
+        owners, rows = [], []
+        sizes = np.ones(len(queries))
+        for query_idx, query in enumerate(queries):
+            query_rows, size = self._query_rows(query)
+            sizes[query_idx] = size
+            owners.append(np.full(len(query_rows), query_idx, dtype=np.int64))
+            rows.append(query_rows)
+        owners = np.concatenate(owners) if owners else np.zeros(0, dtype=np.int64)
+        rows = np.concatenate(rows).astype(np.int64) if rows else np.zeros(0, dtype=np.int64)
+
+        # Gather every posting of every (query, n-gram) pair in one pass
+        starts = self.indptr[rows]
+        lengths = self.indptr[rows + 1] - starts
+        run_starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        offsets = np.arange(lengths.sum()) - run_starts + np.repeat(starts, lengths)
+        cells = np.repeat(owners, lengths) * self.song_count + self.indices[offsets]
+
+        cells, counts = np.unique(cells, return_counts=True)
+        return cells // self.song_count, cells % self.song_count, counts, sizes
+
+    def search_batch(self, queries, threshold=0.6, batch_size=256):
+        """
+        For each query, (similarity, song_idx) pairs above threshold,
+        best first with ties in corpus order, like SongFinder._ngram_scores
+        """
+        results = []
+        for start in range(0, len(queries), batch_size):
+            batch = queries[start:start + batch_size]
+            query_ids, song_ids, counts, sizes = self.score_counts(batch)
+            scores = counts / sizes[query_ids]
+            hits = scores >= threshold
+            query_ids, song_ids, scores = query_ids[hits], song_ids[hits], scores[hits]
+            bounds = np.searchsorted(query_ids, np.arange(len(batch) + 1))
+            for query_idx in range(len(batch)):
+                lo, hi = bounds[query_idx], bounds[query_idx + 1]
+                # Songs are already in corpus order within a query, the stable sort keeps ties that way
+                order = np.argsort(-scores[lo:hi], kind='stable')
+                results.append(list(zip(scores[lo:hi][order].tolist(), song_ids[lo:hi][order].tolist())))
+        return results
+
+    def search(self, query, threshold=0.6):
+        return self.search_batch([query], threshold)[0]
@@ -0,0 +1,276 @@
+import sys
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from core.normalize import SEARCH_FIELDS, TOKEN_RE, normalize_query, normalize_song
+
+# Word ids are packed into one integer per n-gram, WORD_BITS bits per word
+WORD_BITS = 21
+MAX_WORDS = 1 << WORD_BITS
+
+
+class CompactNgramIndex:
+    def __init__(self, songs=None, n=3, fields=SEARCH_FIELDS, normalized=None):
+        """
+        Word n-gram index over the full Title, Artist and Lyric of each song
+        Words get integer ids and an n-gram is the packed integer of its word
+        ids, so keys are exact and collision free. Postings are interleaved
+        (song_idx, term frequency) pairs, one pair per song containing the
+        n-gram, stored CSR style: sorted keys, offsets and one flat data array.
+        Songs added after freeze() wait in a small pending dict until the next one.
+        Removed songs are dropped from pending at once and filtered out of the
+        frozen arrays until freeze() compacts them away.
+        """
+        if n * WORD_BITS > 64:
+            raise ValueError(f"n-grams longer than {64 // WORD_BITS} words do not fit one key")
+        self.n = n
+        self.fields = fields
+        self.word_ids = {}
+        self.song_count = 0
+        self.keys = array('Q')
+        self.offsets = array('Q', [0])
+        self.data = array('I')
+        self.pending = {}
+        self.deleted = set()
+        if songs:
+            for song_idx, song in enumerate(songs):
+                self.add_song(song, normalized[song_idx] if normalized else None)
+            self.freeze()
+
+    def _word_id(self, word):
+        word_id = self.word_ids.get(word)
+        if word_id is None:
+            word_id = len(self.word_ids)
+            if word_id >= MAX_WORDS:
+                raise OverflowError("Too many distinct words for the n-gram key layout")
+            self.word_ids[word] = word_id
+        return word_id
+
+    def _keys(self, word_ids):
+        """Packed key of every n-gram in a list of word ids"""
+        keys = word_ids[:len(word_ids) - self.n + 1]
+        for shift in range(1, self.n):
+            keys = [(key << WORD_BITS) | word_id for key, word_id in zip(keys, word_ids[shift:])]
+        return keys
+
+    def _song_counts(self, song, normalized=None):
+        """Term frequency of every n-gram key in a song"""
+        normalized = normalized or normalize_song(song, self.fields)
+        counts = Counter()
+        for field in self.fields:
+            words = normalized[field].tokens
+            counts.update(self._keys([self._word_id(word) for word in words]))
+        return counts
+
+    def add_song(self, song, normalized=None):
+        """Index every n-gram of one song and return its index"""
+        song_idx = self.song_count
+        self.song_count += 1
+
+        counts = self._song_counts(song, normalized)
+        pending = self.pending
+        for key, tf in counts.items():
+            postings = pending.get(key)
+            if postings is None:
+                pending[key] = array('I', (song_idx, tf))
+            else:
+                postings.append(song_idx)
+                postings.append(tf)
+        return song_idx
+
+    def merge(self, other):
+        """
+        Append every song of another CompactNgramIndex with the same n, after ours
+        Its word ids are mapped onto ours and its keys repacked
+        """
+        if other.n != self.n:
+            raise ValueError(f"Cannot merge a {other.n}-gram index into a {self.n}-gram index")
+        other.freeze()
+        self.freeze()
+        word_map = [0] * len(other.word_ids)
+        for word, word_id in other.word_ids.items():
+            word_map[word_id] = self._word_id(sys.intern(word))
+
+        mask = MAX_WORDS - 1
+        shifts = range((self.n - 1) * WORD_BITS, -1, -WORD_BITS)
+        new_keys = []
+        for key in other.keys:
+            new_key = 0
+            for shift in shifts:
+                new_key = (new_key << WORD_BITS) | word_map[(key >> shift) & mask]
+            new_keys.append(new_key)
+
+        data = other.data
+        if self.song_count:
+            data = array('I', data)
+            data[0::2] = array('I', [song_idx + self.song_count for song_idx in data[0::2]])
+        offsets = other.offsets
+        rows = sorted(range(len(new_keys)), key=new_keys.__getitem__)
+        self._merge_rows((new_keys[row], data[offsets[row]:offsets[row + 1]]) for row in rows)
+        self.song_count += other.song_count
+
+    def remove_song(self, song_idx, song, normalized=None):
+        """Remove a song's postings, its index is never reused"""
+        for key in self._song_counts(song, normalized):
+            postings = self.pending.get(key)
+            if postings is None:
+                continue
+            live = self._live_postings(postings, {song_idx})
+            if live:
+                self.pending[key] = live
+            else:
+                del self.pending[key]
+        self.deleted.add(song_idx)
+
+    @staticmethod
+    def _live_postings(postings, deleted):
+        """postings without the (song_idx, tf) pairs of deleted songs"""
+        if not deleted:
+            return postings
+        live = array('I')
+        for position in range(0, len(postings), 2):
+            if postings[position] not in deleted:
+                live.append(postings[position])
+                live.append(postings[position + 1])
+        return live
+
+    def freeze(self):
+        """Merge pending postings into the flat arrays and compact removed songs away"""
+        if not self.pending and not self.deleted:
+            return
+        self._merge_rows((key, self.pending[key]) for key in sorted(self.pending))
+        self.pending = {}
+
+    def _merge_rows(self, rows):
+        """
+        Rebuild the flat arrays with (key, postings) rows given in key order,
+        each row's postings going after the frozen ones of its key
+        """
+        keys, offsets, data = array('Q'), array('Q', [0]), array('I')
+        # Walk the new keys alongside the frozen ones, copying untouched runs in bulk
+        position = 0
+        for key, postings in rows:
+            end = bisect_left(self.keys, key, position)
+            self._copy_frozen(position, end, keys, offsets, data)
+            if end < len(self.keys) and self.keys[end] == key:
+                data.extend(self._live_postings(self.data[self.offsets[end]:self.offsets[end + 1]], self.deleted))
+                end += 1
+            keys.append(key)
+            data.extend(postings)
+            offsets.append(len(data))
+            position = end
+        self._copy_frozen(position, len(self.keys), keys, offsets, data)
+        self.keys, self.offsets, self.data = keys, offsets, data
+        self.deleted = set()
+
+    def _copy_frozen(self, start, end, keys, offsets, data):
+        """Append frozen rows start:end to new arrays, without removed songs"""
+        if start >= end:
+            return
+        if self.deleted:
+            for position in range(start, end):
+                postings = self._live_postings(self.data[self.offsets[position]:self.offsets[position + 1]],
+                                               self.deleted)
+                if postings:
+                    keys.append(self.keys[position])
+                    data.extend(postings)
+                    offsets.append(len(data))
+            return
+        shift = len(data) - self.offsets[start]
+        keys.extend(self.keys[start:end])
+        data.extend(self.data[self.offsets[start]:self.offsets[end]])
+        offsets.extend(offset + shift for offset in self.offsets[start + 1:end + 1])
+
+    def flush(self, max_pending=100000):
+        """
+        freeze() once pending holds more than max_pending n-grams, or more than
+        are frozen, which bounds memory while streaming songs in at an amortised merge cost
+        """
+        if len(self.pending) > max(max_pending, len(self.keys)):
+            self.freeze()
+
+    def _frozen_position(self, key):
+        position = bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            return position
+        return None
+
+    def _frozen_postings(self, key):
+        position = self._frozen_position(key)
+        if position is None:
+            return array('I')
+        return self.data[self.offsets[position]:self.offsets[position + 1]]
+
+    def get(self, key):
+        """Interleaved (song_idx, tf) postings of key"""
+        postings = self._frozen_postings(key)
+        if self.deleted:
+            postings = self._live_postings(postings, self.deleted)
+        pending = self.pending.get(key)
+        if pending is not None:
+            postings = postings + pending
+        return postings
+
+    def __contains__(self, key):
+        return key in self.pending or self._frozen_position(key) is not None
+
+    def compact(self):
+        """freeze() if enough songs were removed for the filtering to cost more than a rebuild"""
+        if len(self.deleted) * 20 > self.song_count:
+            self.freeze()
+
+    def __len__(self):
+        return len(self.keys) + sum(1 for key in self.pending if self._frozen_position(key) is None)
+
+    def query_keys(self, query):
+        """
+        Keys of the query's n-grams that occur in the index, and the number
+        of distinct n-grams in the query
+        """
+        words = TOKEN_RE.findall(normalize_query(query))
+        ngrams = {tuple(words[i:i + self.n]) for i in range(len(words) - self.n + 1)}
+        keys = []
+        for ngram in ngrams:
+            word_ids = [self.word_ids.get(word) for word in ngram]
+            if None not in word_ids:
+                key = self._keys(word_ids)[0]
+                if key in self:
+                    keys.append(key)
+        return keys, len(ngrams)
+
+    def songs(self, key):
+        """Song indices posted for key"""
+        return self.get(key)[0::2]
+
+    def match_counts(self, keys):
+        """song_idx -> how many of keys the song contains"""
+        counts = Counter()
+        for key in keys:
+            counts.update(self.songs(key))
+        return counts
+
+    def items(self):
+        """(key, postings) for every n-gram"""
+        self.freeze()
+        for position, key in enumerate(self.keys):
+            yield key, self.data[self.offsets[position]:self.offsets[position + 1]]
+
+    def memory_usage(self):
+        """Approximate resident bytes of the index structures"""
+        total = sum(sys.getsizeof(part) for part in (self.keys, self.offsets, self.data, self.pending))
+        total += sum(sys.getsizeof(postings) for postings in self.pending.values())
+        total += sys.getsizeof(self.word_ids)
+        # Word id ints above 256 are separate objects
+        total += sum(sys.getsizeof(word) + sys.getsizeof(MAX_WORDS) for word in self.word_ids)
+        return total
+
+    def stats(self):
+        return {
+            "songs": self.song_count,
+            "deleted": len(self.deleted),
+            "words": len(self.word_ids),
+            "ngrams": len(self),
+            "postings": (len(self.data) + sum(map(len, self.pending.values()))) // 2,
+            "bytes": self.memory_usage()
+        }
@@ -0,0 +1,48 @@
+import re
+import string
+import sys
+import unicodedata
+from collections import namedtuple
+
+TOKEN_RE = re.compile(r'\w+')
+SEARCH_FIELDS = ("Title", "Artist", "Lyric")
+
+# Zero-width characters that NFKC keeps but that split words invisibly
+ZERO_WIDTH = dict.fromkeys(map(ord, "\u200b\u200c\u200d\u200e\u200f\u2060\ufeff"))
+APOSTROPHES = dict.fromkeys(map(ord, "\u2018\u2019\u201b\u02bc`\u00b4\u2032"), "'")
+
+# Trimmed from both ends of a query, they never decide a match on their own
+EDGE_PUNCTUATION = string.punctuation + string.whitespace
+
+NormalizedField = namedtuple("NormalizedField", ["text", "tokens"])
+
+
+def normalize_text(text):
+    """
+    NFKC, zero-width characters removed, apostrophe variants unified,
+    casefolded and whitespace runs collapsed to one space
+    """
+    text = unicodedata.normalize("NFKC", text).translate(ZERO_WIDTH).translate(APOSTROPHES)
+    return " ".join(text.casefold().split())
+
+
+def tokenize(normalized_text):
+    """Word tokens of normalized text, interned so repeated words share one string"""
+    return [sys.intern(token) for token in TOKEN_RE.findall(normalized_text)]
+
+
+def normalize_song(song, fields=SEARCH_FIELDS):
+    """Normalized text and tokens of each search field of a song"""
+    normalized = {}
+    for field in fields:
+        text = normalize_text(song.get(field, "") or "")
+        normalized[field] = NormalizedField(text, tokenize(text))
+    return normalized
+
+
+def normalize_query(query):
+    """
+    Canonical form of a search query, used for searching and as the cache key
+    Normalized exactly like the indexed fields, with punctuation trimmed from both ends
+    """
+    return normalize_text(query).strip(EDGE_PUNCTUATION)
@@ -0,0 +1,84 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from core.fuzzy_index import FuzzyIndex
+from core.inverted_index import InvertedIndex
+from core.lexicon import LexiconManager
+from core.ngram_postings import CompactNgramIndex
+from core.phonetic_index import PhoneticIndex
+from core.prefix_index import PrefixIndex
+
+
+def build_shard(file_path, lazy_lyrics=False, n=3):
+    """
+    Parse, normalize and index one lexicon file, in a worker process
+    Song indices in the partial indexes start at 0 for the file's first song
+    """
+    shard = {
+        "name": os.path.basename(file_path),
+        "file_state": LexiconManager.file_state(file_path),
+        "songs": [],
+        "normalized": [],
+        "inverted_index": InvertedIndex(store_lyrics=not lazy_lyrics),
+        "ngram_index": CompactNgramIndex(n=n),
+        "fuzzy_index": FuzzyIndex(),
+        "prefix_index": PrefixIndex(),
+        "phonetic_index": PhoneticIndex()
+    }
+    for song, normalized in LexiconManager.iter_songs(file_path, lazy_lyrics):
+        shard["songs"].append(song)
+        shard["normalized"].append(None if lazy_lyrics else normalized)
+        shard["inverted_index"].add_song(song, normalized)
+        shard["ngram_index"].add_song(song, normalized)
+        shard["fuzzy_index"].add_song(song, normalized)
+        shard["prefix_index"].add_song(song, normalized)
+        shard["phonetic_index"].add_song(song, normalized)
+    shard["ngram_index"].freeze()
+    return shard
+
+
+def build_search_state(lexicon_manager, workers=None, lazy_lyrics=False, n=3):
+    """
+    Build SongFinder's search state with one lexicon file per task on a process pool
+    The partial indexes are merged in file order, so the result matches a serial build
+    """
+    song_data = {"songs": [], "normalized": [], "sources": {}, "file_states": {}}
+    state = {
+        "song_data": song_data,
+        "ngram_index": CompactNgramIndex(n=n),
+        "inverted_index": InvertedIndex(store_lyrics=not lazy_lyrics),
+        "fuzzy_index": FuzzyIndex(),
+        "prefix_index": PrefixIndex(),
+        "phonetic_index": PhoneticIndex()
+    }
+    files = lexicon_manager.lexicon_files()
+    if not files:
+        print(f"No JSON files found in {lexicon_manager.lexicon_dir}")
+        return state
+
+    workers = min(workers or os.cpu_count() or 1, len(files))
+    print(f"Building indexes for {len(files)} lexicon files on {workers} processes")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(build_shard, file_path, lazy_lyrics, n) for file_path in files]
+        for file_path, future in zip(files, futures):
+            try:
+                shard = future.result()
+            except Exception as e:
+                print(f"Error loading {file_path}: {e}")
+                continue
+            offset = len(song_data["songs"])
+            song_data["file_states"][shard["name"]] = shard["file_state"]
+            song_data["sources"][shard["name"]] = list(range(offset, offset + len(shard["songs"])))
+            song_data["songs"].extend(shard["songs"])
+            song_data["normalized"].extend(shard["normalized"])
+            state["inverted_index"].merge(shard["inverted_index"])
+            state["ngram_index"].merge(shard["ngram_index"])
+            state["fuzzy_index"].merge(shard["fuzzy_index"])
+            state["prefix_index"].merge(shard["prefix_index"])
+            state["phonetic_index"].merge(shard["phonetic_index"])
+    state["ngram_index"].freeze()
+    state["prefix_index"].freeze()
+
+    print(f"Total songs loaded: {len(song_data['songs'])}")
+    lexicon_manager.notify_reload(song_data)
+    return state
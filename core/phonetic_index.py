@@ -0,0 +1,236 @@
+import math
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+
+from core.normalize import normalize_query, normalize_song, tokenize
+
+VOWELS = frozenset("aeiou")
+# Silent first letter of these word openings
+SILENT_STARTS = ("kn", "gn", "pn", "wr", "ps")
+# Voiced and unvoiced pairs share a code, singing blurs them
+CONSONANT_CODES = {
+    "b": "P", "p": "P", "d": "T", "t": "T", "g": "K", "k": "K", "q": "K",
+    "f": "F", "v": "F", "s": "S", "z": "S", "j": "J", "l": "L", "m": "M",
+    "n": "N", "r": "R"
+}
+
+
+def phonetic_code(word):
+    """
+    Metaphone-style consonant skeleton of an English word, "" for other scripts
+    Vowels are dropped everywhere so a code does not depend on word boundaries:
+    "dynamite" and "die no might" both come out as TNMT
+    """
+    word = "".join(char for char in word.lower() if "a" <= char <= "z")
+    if not word:
+        return ""
+    if word.startswith(SILENT_STARTS):
+        word = word[1:]
+    elif word.startswith("x"):
+        word = "s" + word[1:]
+    elif word.startswith("wh"):
+        word = "w" + word[2:]
+
+    code = []
+    last = len(word) - 1
+    for i, char in enumerate(word):
+        prev = word[i - 1] if i else ""
+        following = word[i + 1] if i < last else ""
+        if char == prev and char != "c":
+            continue
+        if char in VOWELS:
+            continue
+        if char == "c":
+            # "sch" is hard, "school" sounds like "skool"
+            if following == "h" and prev != "s" or word.startswith("ia", i + 1):
+                code.append("X")
+            elif following in ("i", "e", "y"):
+                code.append("S")
+            else:
+                code.append("K")
+        elif char == "d" and following == "g" and word[i + 2:i + 3] in ("e", "i", "y"):
+            code.append("J")
+        elif char == "g":
+            if following == "h" and (i + 2 > last or word[i + 2] not in VOWELS):
+                continue
+            if following == "n" and i + 1 == last:
+                continue
+            code.append("J" if following in ("e", "i", "y") and prev != "g" else "K")
+        elif char == "h":
+            if following in VOWELS and prev not in ("c", "s", "p", "t", "g"):
+                code.append("H")
+        elif char == "k" and prev == "c":
+            continue
+        elif char == "p" and following == "h":
+            code.append("F")
+        elif char == "s" and (following == "h" or word.startswith(("io", "ia"), i + 1)):
+            code.append("X")
+        elif char == "t":
+            if following == "h":
+                code.append("0")
+            elif word.startswith(("io", "ia"), i + 1):
+                code.append("X")
+            elif not word.startswith("ch", i + 1):
+                code.append("T")
+        elif char == "b" and prev == "m" and i == last:
+            continue
+        elif char in ("w", "y"):
+            if following in VOWELS:
+                code.append(char.upper())
+        elif char == "x":
+            code.append("KS")
+        else:
+            code.append(CONSONANT_CODES.get(char, ""))
+    # Adjacent equal codes are one sound, "big game" and "bigame" match
+    return "".join(part for i, part in enumerate(code) if not i or part != code[i - 1])
+
+
+def phonetic_stream(tokens):
+    """Codes of consecutive words run together, repeats across word boundaries merged"""
+    stream = []
+    for token in tokens:
+        for char in phonetic_code(token):
+            if not stream or stream[-1] != char:
+                stream.append(char)
+    return "".join(stream)
+
+
+class PhoneticIndex:
+    def __init__(self, songs=None, gram_size=4, normalized=None, max_length_ratio=10, min_grams=3):
+        """
+        Sound-alike index over titles, artists and lyrics
+        Each field becomes one phonetic_stream, so a word heard as several words
+        or several heard as one still shares its code, and every gram_size run of
+        codes gets a posting list of the songs containing it, in song order.
+        Titles have postings of their own to rank title matches first.
+        Texts with more than max_length_ratio times the mean number of distinct
+        grams (liner notes, thank-you lists) hold most short code runs by chance
+        and are never matched.
+        Queries of fewer than min_grams grams share them with many songs by
+        chance, they only match titles sounding exactly like them.
+        """
+        self.gram_size = gram_size
+        self.max_length_ratio = max_length_ratio
+        self.min_grams = min_grams
+        self.postings = {}
+        self.title_postings = {}
+        self.song_gram_counts = array('I')
+        self.title_gram_counts = array('I')
+        self.gram_total = 0
+        self.song_count = 0
+        self.live_count = 0
+        if songs:
+            for song_idx, song in enumerate(songs):
+                self.add_song(song, normalized[song_idx] if normalized else None)
+
+    def _grams(self, stream):
+        size = self.gram_size
+        return {stream[i:i + size] for i in range(len(stream) - size + 1)}
+
+    def song_grams(self, song, normalized=None):
+        """(all grams, title grams) of one song"""
+        normalized = normalized or normalize_song(song)
+        title_grams = self._grams(phonetic_stream(normalized["Title"].tokens))
+        grams = title_grams.union(*(self._grams(phonetic_stream(normalized[field].tokens))
+                                    for field in ("Artist", "Lyric")))
+        return grams, title_grams
+
+    def add_song(self, song, normalized=None):
+        """Index the phonetic grams of one song and return its index"""
+        song_idx = self.song_count
+        self.song_count += 1
+        self.live_count += 1
+        grams, title_grams = self.song_grams(song, normalized)
+        self.song_gram_counts.append(len(grams))
+        self.title_gram_counts.append(len(title_grams))
+        self.gram_total += len(grams)
+        for postings, song_grams in ((self.postings, grams), (self.title_postings, title_grams)):
+            for gram in song_grams:
+                song_ids = postings.get(gram)
+                if song_ids is None:
+                    postings[gram] = array('I', (song_idx,))
+                else:
+                    song_ids.append(song_idx)
+        return song_idx
+
+    def remove_song(self, song_idx, song, normalized=None):
+        grams, title_grams = self.song_grams(song, normalized)
+        for postings, song_grams in ((self.postings, grams), (self.title_postings, title_grams)):
+            for gram in song_grams:
+                song_ids = postings.get(gram)
+                if not song_ids:
+                    continue
+                position = bisect_left(song_ids, song_idx)
+                if position < len(song_ids) and song_ids[position] == song_idx:
+                    del song_ids[position]
+                if not song_ids:
+                    del postings[gram]
+        self.gram_total -= self.song_gram_counts[song_idx]
+        self.song_gram_counts[song_idx] = 0
+        self.title_gram_counts[song_idx] = 0
+        self.live_count -= 1
+
+    def merge(self, other):
+        """Append every song of another PhoneticIndex, after ours"""
+        offset = self.song_count
+        for postings, other_postings in ((self.postings, other.postings),
+                                         (self.title_postings, other.title_postings)):
+            for gram, song_ids in other_postings.items():
+                postings.setdefault(gram, array('I')).extend(song_idx + offset for song_idx in song_ids)
+        self.song_gram_counts.extend(other.song_gram_counts)
+        self.title_gram_counts.extend(other.title_gram_counts)
+        self.gram_total += other.gram_total
+        self.song_count += other.song_count
+        self.live_count += other.live_count
+
+    def search(self, query, threshold=0.75):
+        """
+        (score, song_idx) pairs sounding like query, best first
+        score is the idf-weighted share of the query's grams a song contains,
+        songs whose title holds more of them win ties. A song with k times the
+        mean number of grams holds k times as many by chance and needs a score
+        of threshold ** (1 / k).
+        """
+        grams = self._grams(phonetic_stream(tokenize(normalize_query(query))))
+        if len(grams) < self.min_grams:
+            return self._title_matches(grams)
+        # A gram no song has counts at the rarest weight against every song
+        weights = {}
+        total = 0.0
+        for gram in grams:
+            song_ids = self.postings.get(gram)
+            weight = math.log(1 + self.live_count / (len(song_ids) if song_ids else 1))
+            if song_ids:
+                weights[gram] = weight
+            total += weight
+        if not weights:
+            return []
+
+        scores = defaultdict(float)
+        title_scores = defaultdict(float)
+        for gram, weight in weights.items():
+            for song_idx in self.postings[gram]:
+                scores[song_idx] += weight
+            for song_idx in self.title_postings.get(gram, ()):
+                title_scores[song_idx] += weight
+        mean_grams = self.gram_total / max(self.live_count, 1)
+        max_grams = self.max_length_ratio * mean_grams
+        song_gram_counts = self.song_gram_counts
+        results = [(score / total, title_scores.get(song_idx, 0.0), song_idx)
+                   for song_idx, score in scores.items()
+                   if song_gram_counts[song_idx] <= max_grams and
+                   score >= threshold ** min(1.0, mean_grams / song_gram_counts[song_idx]) * total]
+        results.sort(key=lambda item: (-item[0], -item[1], item[2]))
+        return [(score, song_idx) for score, _, song_idx in results]
+
+    def _title_matches(self, grams):
+        """(1.0, song_idx) pairs of the titles whose grams are exactly grams, in song order"""
+        if not grams:
+            return []
+        song_ids = set.intersection(*(set(self.title_postings.get(gram, ())) for gram in grams))
+        return [(1.0, song_idx) for song_idx in sorted(song_ids)
+                if self.title_gram_counts[song_idx] == len(grams)]
+
+    def stats(self):
+        return {"grams": len(self.postings), "postings": sum(len(song_ids) for song_ids in self.postings.values())}
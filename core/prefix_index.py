@@ -0,0 +1,147 @@
+import heapq
+import os
+from array import array
+from bisect import bisect_left
+from collections import Counter, namedtuple
+
+from core.normalize import EDGE_PUNCTUATION, normalize_song, normalize_text, tokenize
+
+# Sorts after every character, keys[bisect_left(keys, prefix + MAX_CHAR)] ends a prefix range
+MAX_CHAR = "\U0010ffff"
+KINDS = ("title", "artist", "lyric")
+# Weight one song adds to a completion of each kind
+KIND_WEIGHTS = (4, 2, 1)
+
+# What freeze() compiles, replaced whole so readers never see half of one
+Snapshot = namedtuple("Snapshot", ["keys", "weights", "kinds", "top"])
+
+
+class PrefixIndex:
+    def __init__(self, songs=None, k=8, phrase_words=5, phrases_per_song=4, normalized=None):
+        """
+        Type-ahead completions over normalized titles, artists and lyric phrases
+        A completion's weight sums KIND_WEIGHTS over the songs using it. freeze()
+        sorts the completions into one array, every prefix is then a contiguous
+        range of it, and stores the top k of each range larger than k: one entry
+        per branching node of the compressed trie the sorted array implies.
+        A suggestion is two bisects and a dict lookup on the last frozen snapshot,
+        which add_song() and remove_song() never touch, so it needs no lock.
+        Lyric phrases are a song's opening words plus its most repeated phrase_words
+        word runs, which is where choruses end up.
+        """
+        self.k = k
+        self.phrase_words = phrase_words
+        self.phrases_per_song = phrases_per_song
+        # Completion text -> weight per kind, the mutable source freeze() compiles
+        self.entries = {}
+        self.snapshot = Snapshot([], array('I'), array('B'), {})
+        if songs:
+            for song_idx, song in enumerate(songs):
+                self.add_song(song, normalized[song_idx] if normalized else None)
+            self.freeze()
+
+    def song_completions(self, song, normalized=None):
+        """(text, kind index) pairs a song contributes, each text once"""
+        normalized = normalized or normalize_song(song)
+        completions = {}
+        for kind, field in ((1, "Artist"), (0, "Title")):
+            text = " ".join(normalized[field].tokens)
+            if text:
+                completions[text] = kind
+        words = normalized["Lyric"].tokens
+        size = self.phrase_words
+        if words:
+            completions.setdefault(" ".join(words[:size]), 2)
+        runs = Counter(tuple(words[i:i + size]) for i in range(len(words) - size + 1))
+        repeated = [(count, run) for run, count in runs.items() if count > 1]
+        # Counter keeps first-seen order, so ties go to the earlier phrase
+        for count, run in heapq.nlargest(self.phrases_per_song, repeated, key=lambda item: item[0]):
+            completions.setdefault(" ".join(run), 2)
+        return completions.items()
+
+    def add_song(self, song, normalized=None):
+        self._update(song, normalized, 1)
+
+    def remove_song(self, song, normalized=None):
+        self._update(song, normalized, -1)
+
+    def _update(self, song, normalized, sign):
+        entries = self.entries
+        for text, kind in self.song_completions(song, normalized):
+            weights = entries.get(text)
+            if weights is None:
+                weights = entries[text] = [0, 0, 0]
+            weights[kind] += sign * KIND_WEIGHTS[kind]
+            if not any(weights):
+                del entries[text]
+
+    def merge(self, other):
+        """Add every completion of another PrefixIndex to ours"""
+        entries = self.entries
+        for text, other_weights in other.entries.items():
+            weights = entries.get(text)
+            if weights is None:
+                entries[text] = list(other_weights)
+            else:
+                for kind, weight in enumerate(other_weights):
+                    weights[kind] += weight
+
+    def freeze(self):
+        """Sort the completions and precompute the top k of every trie node"""
+        entries = self.entries
+        keys = sorted(entries)
+        weights = array('I', (sum(entries[key]) for key in keys))
+        # A completion is shown as the kind that gives it most of its weight
+        kinds = array('B', (max(range(len(KINDS)), key=entries[key].__getitem__) for key in keys))
+        top = {}
+        if len(keys) > self.k:
+            self._build_node(keys, weights, top, 0, len(keys))
+        self.snapshot = Snapshot(keys, weights, kinds, top)
+
+    def _best(self, weights, key_ids):
+        return heapq.nsmallest(self.k, key_ids, key=lambda key_id: (-weights[key_id], key_id))
+
+    def _build_node(self, keys, weights, top, lo, hi):
+        """Top k of keys[lo:hi], the keys under one node"""
+        # Skip the unary chain down to the next branch, every prefix on it selects this same range
+        depth = len(os.path.commonprefix((keys[lo], keys[hi - 1])))
+        candidates = []
+        start = lo
+        if len(keys[start]) == depth:
+            candidates.append(start)
+            start += 1
+        while start < hi:
+            end = bisect_left(keys, keys[start][:depth + 1] + MAX_CHAR, start, hi)
+            if end - start > self.k:
+                candidates.extend(self._build_node(keys, weights, top, start, end))
+            else:
+                candidates.extend(range(start, end))
+            start = end
+        best = top[(lo, hi)] = tuple(self._best(weights, candidates))
+        return best
+
+    @staticmethod
+    def normalize_prefix(prefix):
+        """A typed prefix in completion form, a trailing separator keeps the last word whole"""
+        words = " ".join(tokenize(normalize_text(prefix)))
+        if words and prefix[-1:] in EDGE_PUNCTUATION:
+            words += " "
+        return words
+
+    def suggest(self, prefix, k=None):
+        """Up to k (text, kind) completions of prefix as of the last freeze(), heaviest first"""
+        k = min(k or self.k, self.k)
+        prefix = self.normalize_prefix(prefix)
+        if not prefix:
+            return []
+        keys, weights, kinds, top = self.snapshot
+        lo = bisect_left(keys, prefix)
+        hi = bisect_left(keys, prefix + MAX_CHAR, lo)
+        if hi - lo > self.k:
+            best = top[(lo, hi)]
+        else:
+            best = self._best(weights, range(lo, hi))
+        return [(keys[key_id], KINDS[kinds[key_id]]) for key_id in best[:k]]
+
+    def stats(self):
+        return {"completions": len(self.snapshot.keys), "nodes": len(self.snapshot.top)}
@@ -0,0 +1,79 @@
+import heapq
+import math
+from collections import defaultdict
+
+from core.normalize import TOKEN_RE, normalize_query
+
+DEFAULT_FIELD_BOOSTS = {"Title": 3.0, "Artist": 2.0, "Lyric": 1.0}
+
+
+class BM25Ranker:
+    def __init__(self, inverted_index, k1=1.2, b=0.75, field_boosts=None, max_expansions=20):
+        """
+        BM25F relevance scoring over an InvertedIndex
+        Term frequencies are counted per field, length-normalised against
+        that field's average and weighted by field_boosts before saturation.
+        An unfinished last query word is expanded to at most max_expansions
+        vocabulary words starting with it, so type-ahead queries still rank.
+        """
+        self.index = inverted_index
+        self.k1 = k1
+        self.b = b
+        boosts = field_boosts or DEFAULT_FIELD_BOOSTS
+        self.boosts = [boosts.get(field, 1.0) for field in inverted_index.fields]
+        self.max_expansions = max_expansions
+        self.refresh()
+
+    def refresh(self):
+        """Recompute corpus statistics after the index changes"""
+        self.song_count = self.index.live_count
+        self.avg_lengths = [max(total / max(self.song_count, 1), 1.0) for total in self.index.field_totals]
+
+    def idf(self, token):
+        df = len(self.index.postings.get(token, ()))
+        return math.log(1.0 + (self.song_count - df + 0.5) / (df + 0.5))
+
+    def query_terms(self, query):
+        """(token, weight) pairs to score, expanding a last word that is not in the vocabulary"""
+        tokens = list(dict.fromkeys(TOKEN_RE.findall(normalize_query(query))))
+        if not tokens:
+            return []
+        terms = [(token, 1.0) for token in tokens if token in self.index.postings]
+        last = tokens[-1]
+        if last not in self.index.postings:
+            expansions = self.index.prefix_tokens(last)
+            if len(expansions) > self.max_expansions:
+                # Keep the most common completions, they are the likeliest intent
+                expansions = heapq.nlargest(self.max_expansions, expansions,
+                                            key=lambda token: len(self.index.postings[token]))
+            terms.extend((token, 1.0 / len(expansions)) for token in expansions)
+        return terms
+
+    def score_all(self, query):
+        """song_idx -> BM25F score for every song matching a query term"""
+        scores = defaultdict(float)
+        for token, weight in self.query_terms(query):
+            idf = self.idf(token) * weight
+            for song_idx, positions in self.index.postings[token].items():
+                field_tf = [0] * len(self.boosts)
+                for position in positions:
+                    field_tf[self.index.field_of(song_idx, position)] += 1
+
+                lengths = self.index.field_lengths[song_idx]
+                tf = 0.0
+                for field_idx, count in enumerate(field_tf):
+                    if count:
+                        norm = 1.0 - self.b + self.b * lengths[field_idx] / self.avg_lengths[field_idx]
+                        tf += self.boosts[field_idx] * count / norm
+                scores[song_idx] += idf * tf / (self.k1 + tf)
+        return scores
+
+    def top_k(self, query, k=10):
+        """Best k (score, song_idx) pairs, ties go to the earlier song"""
+        return top_scores(self.score_all(query), k)
+
+
+def top_scores(scores, k=10):
+    """Best k (score, song_idx) pairs of a song_idx -> score dict, ties go to the earlier song"""
+    best = heapq.nlargest(k, scores.items(), key=lambda item: (item[1], -item[0]))
+    return [(score, song_idx) for song_idx, score in best]
@@ -0,0 +1,170 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from core.normalize import normalize_query, tokenize
+
+SEMANTIC_FORMAT = 1
+
+
+def _spmm(out_index, in_index, data, dense, out_size):
+    """Sparse (given as coordinate triples) times dense, one bincount per output column"""
+    result = np.empty((out_size, dense.shape[1]))
+    for column in range(dense.shape[1]):
+        result[:, column] = np.bincount(out_index, weights=data * dense[in_index, column], minlength=out_size)
+    return result
+
+
+def _replace(path, write):
+    """Call write(f) on a temporary file next to path, then move it over path"""
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+class SemanticIndex:
+    def __init__(self, vocab, idf, term_vectors, song_vectors, key=None):
+        """
+        LSA song vectors: TF-IDF of every song's words, reduced by truncated SVD
+        term_vectors (terms x dims) fold a query into the same space as the
+        song_vectors (songs x dims, rows unit length), so cosine similarity is
+        one matrix-vector product. Both are float32 and may be memory-mapped.
+        With lsh_tables set, random-hyperplane LSH picks candidates first.
+        """
+        self.vocab = vocab
+        self.idf = idf
+        self.term_vectors = term_vectors
+        self.song_vectors = song_vectors
+        self.key = key
+        self.lsh = None
+
+    @classmethod
+    def build(cls, inverted_index, dims=128, min_df=2, power_iterations=2, seed=0, key=None):
+        """Fit LSA on the postings of an InvertedIndex, removed songs get zero vectors"""
+        song_count = len(inverted_index.texts)
+        rows, cols, data, vocab, idf = [], [], [], {}, []
+        live_count = max(inverted_index.live_count, 1)
+        for token, postings in inverted_index.postings.items():
+            if len(postings) < min_df:
+                continue
+            vocab[token] = len(vocab)
+            idf.append(np.log(live_count / len(postings)) + 1.0)
+            rows.append(np.fromiter(postings.keys(), dtype=np.int64, count=len(postings)))
+            cols.append(np.full(len(postings), vocab[token], dtype=np.int64))
+            data.append(np.fromiter((len(positions) for positions in postings.values()),
+                                    dtype=np.float64, count=len(postings)))
+        idf = np.asarray(idf, dtype=np.float32)
+        dims = min(dims, len(vocab) - 1, song_count - 1)
+        if dims < 1:
+            return cls(vocab, idf, np.zeros((len(vocab), 0), np.float32), np.zeros((song_count, 0), np.float32), key)
+
+        rows, cols = np.concatenate(rows), np.concatenate(cols)
+        # Sublinear term frequency times idf, rows scaled to unit length
+        data = (1.0 + np.log(np.concatenate(data))) * idf[cols]
+        norms = np.sqrt(np.bincount(rows, weights=data * data, minlength=song_count))
+        data /= norms[rows]
+
+        # Randomized truncated SVD (Halko, Martinsson & Tropp), the matrix is never densified
+        rng = np.random.default_rng(seed)
+        term_count = len(vocab)
+        basis, _ = np.linalg.qr(_spmm(rows, cols, data, rng.standard_normal((term_count, dims + 10)), song_count))
+        for _ in range(power_iterations):
+            projected, _ = np.linalg.qr(_spmm(cols, rows, data, basis, term_count))
+            basis, _ = np.linalg.qr(_spmm(rows, cols, data, projected, song_count))
+        small = _spmm(cols, rows, data, basis, term_count).T
+        left, singular, right = np.linalg.svd(small, full_matrices=False)
+        term_vectors = right[:dims].T.astype(np.float32)
+        song_vectors = (basis @ left[:, :dims]) * singular[:dims]
+        lengths = np.linalg.norm(song_vectors, axis=1, keepdims=True)
+        song_vectors = np.divide(song_vectors, lengths, out=np.zeros_like(song_vectors), where=lengths > 0)
+        return cls(vocab, idf, term_vectors, song_vectors.astype(np.float32), key)
+
+    def enable_lsh(self, tables=8, bits=12, seed=0):
+        """Bucket songs by random-hyperplane signatures, for catalogs too big to scan per query"""
+        rng = np.random.default_rng(seed)
+        planes = rng.standard_normal((tables * bits, self.song_vectors.shape[1])).astype(np.float32)
+        powers = 1 << np.arange(bits, dtype=np.int64)
+        codes = ((self.song_vectors @ planes.T) > 0).reshape(-1, tables, bits) @ powers
+        buckets = []
+        for table in range(tables):
+            order = np.argsort(codes[:, table], kind='stable')
+            buckets.append((codes[order, table], order))
+        self.lsh = (planes, powers, buckets)
+
+    def _lsh_candidates(self, query_vector):
+        planes, powers, buckets = self.lsh
+        query_codes = ((planes @ query_vector) > 0).reshape(len(buckets), -1) @ powers
+        found = [order[np.searchsorted(codes, code):np.searchsorted(codes, code, side='right')]
+                 for (codes, order), code in zip(buckets, query_codes)]
+        return np.unique(np.concatenate(found))
+
+    def query_vector(self, query):
+        """A query folded into the LSA space, None when no word of it is known"""
+        weights = {}
+        for token in tokenize(normalize_query(query)):
+            term = self.vocab.get(token)
+            if term is not None:
+                weights[term] = weights.get(term, 0) + 1
+        if not weights or not self.term_vectors.shape[1]:
+            return None
+        terms = np.fromiter(weights, dtype=np.int64, count=len(weights))
+        tf = np.fromiter(weights.values(), dtype=np.float32, count=len(weights))
+        vector = ((1.0 + np.log(tf)) * self.idf[terms]) @ self.term_vectors[terms]
+        length = np.linalg.norm(vector)
+        return vector / length if length > 0 else None
+
+    def search(self, query, k=10, min_similarity=0.3):
+        """Top k (cosine, song_idx) pairs, best first"""
+        vector = self.query_vector(query)
+        if vector is None:
+            return []
+        if self.lsh is not None:
+            candidates = self._lsh_candidates(vector)
+            scores = self.song_vectors[candidates] @ vector
+        else:
+            candidates = None
+            scores = self.song_vectors @ vector
+        top = np.flatnonzero(scores >= min_similarity)
+        if len(top) > k:
+            top = top[np.argpartition(-scores[top], k - 1)[:k]]
+        top = top[np.lexsort((top, -scores[top]))]
+        song_ids = top if candidates is None else candidates[top]
+        return list(zip(scores[top].tolist(), song_ids.tolist()))
+
+    def save(self, prefix):
+        """Write the vectors as .npy files for np.load(mmap_mode='r') and the vocabulary as JSON"""
+        try:
+            os.makedirs(os.path.dirname(prefix), exist_ok=True)
+            # Other processes may have the current files mapped, each is replaced whole
+            for suffix, array in (("songs", self.song_vectors), ("terms", self.term_vectors), ("idf", self.idf)):
+                _replace(f"{prefix}.{suffix}.npy", lambda f: np.save(f, array))
+            meta = {"format": SEMANTIC_FORMAT, "key": self.key, "vocab": list(self.vocab)}
+            # The JSON goes last, a crash midway leaves no index that looks current
+            _replace(f"{prefix}.json", lambda f: f.write(json.dumps(meta, ensure_ascii=False).encode('utf-8')))
+            print(f"Saved semantic index to: {prefix}.*")
+        except Exception as e:
+            print(f"Error writing semantic index {prefix}: {e}")
+
+    @classmethod
+    def load(cls, prefix, key=None):
+        """The index saved at prefix, memory-mapped, or None if missing or built for another key"""
+        try:
+            with open(f"{prefix}.json", encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get("format") != SEMANTIC_FORMAT or meta.get("key") != key:
+                return None
+            vocab = {token: term for term, token in enumerate(meta["vocab"])}
+            return cls(vocab, np.load(f"{prefix}.idf.npy"), np.load(f"{prefix}.terms.npy", mmap_mode='r'),
+                       np.load(f"{prefix}.songs.npy", mmap_mode='r'), key)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Error loading semantic index {prefix}: {e}")
+            return None
@@ -0,0 +1,90 @@
+import sys
+from collections.abc import Mapping
+
+from core.duplicates import apply_lyric_delta, lyric_delta
+from core.lexicon_stream import read_lyric
+
+# Lexicon JSON keys and the slots holding them
+FIELD_SLOTS = {"Title": "title", "Artist": "artist", "Album": "album", "Year": "year", "Date": "date",
+               "Lyric": "lyric"}
+# Repeated across a discography, so one shared string each
+INTERNED_FIELDS = ("Artist", "Album", "Year", "Date")
+
+
+class SongRecord(Mapping):
+    """
+    One song, read like the lexicon's JSON dict but stored in slots
+    Artist/Album/Year/Date strings are interned, keys the lexicons carry beyond
+    the known fields go to extra and the unnamed row number key is dropped.
+    A lazily loaded record has no lyric and reads it back through lyric_ref.
+    Versions of one song (remixes, live cuts) point at the first one through
+    version_of, which lists them all in versions. A version's lyric is kept as
+    lyric_delta, its edits of the first one's, when that is smaller.
+    """
+    __slots__ = ("title", "artist", "album", "year", "date", "lyric", "extra", "lyric_ref",
+                 "version_of", "versions", "lyric_delta")
+
+    def __init__(self, song, lyric_ref=None):
+        for key, slot in FIELD_SLOTS.items():
+            value = song.get(key)
+            if key in INTERNED_FIELDS and isinstance(value, str):
+                value = sys.intern(value)
+            setattr(self, slot, value)
+        extra = {key: value for key, value in song.items() if key and key not in FIELD_SLOTS}
+        self.extra = extra or None
+        self.lyric_ref = lyric_ref
+        if lyric_ref is not None:
+            self.lyric = None
+        self.version_of = None
+        self.versions = None
+        self.lyric_delta = None
+
+    def __getitem__(self, key):
+        slot = FIELD_SLOTS.get(key)
+        if slot is not None:
+            value = getattr(self, slot)
+            if value is None and slot == "lyric" and self.lyric_delta is not None:
+                value = self.lyric_text()
+            if value is not None:
+                return value
+        elif self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __iter__(self):
+        for key, slot in FIELD_SLOTS.items():
+            if getattr(self, slot) is not None or (slot == "lyric" and self.lyric_delta is not None):
+                yield key
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"SongRecord({self.title!r}, {self.artist!r})"
+
+    def lyric_text(self):
+        """The lyrics, from disk for a lazily loaded record"""
+        if self.lyric is None:
+            if self.lyric_delta is not None:
+                return apply_lyric_delta(self.version_of.lyric_text(), self.lyric_delta)
+            if self.lyric_ref is not None:
+                return read_lyric(self.lyric_ref)
+        return self.lyric
+
+    def add_version(self, record):
+        """Make record a version of this one, storing its lyric as shared string or delta"""
+        record.version_of = self
+        if self.versions is None:
+            self.versions = []
+        self.versions.append(record)
+        if record.lyric is None or self.lyric is None:
+            return
+        if record.lyric == self.lyric:
+            record.lyric = self.lyric
+            return
+        delta = lyric_delta(self.lyric, record.lyric)
+        if delta is not None:
+            record.lyric_delta = delta
+            record.lyric = None
@@ -0,0 +1,82 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BackgroundTasks:
+    def __init__(self, max_workers=3):
+        """
+        Thread pool for work that must not block the Tk event loop
+        Each task belongs to a channel, a newer task on the same channel makes
+        older ones stale: they are cancelled if still queued and their results
+        are dropped otherwise. Callbacks run on the thread that calls poll().
+        """
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ui-worker")
+        self.completed = queue.Queue()
+        self.generations = {}
+        self.futures = {}
+        self._lock = threading.Lock()
+
+    def submit(self, channel, fn, *args, on_result=None, on_error=None, on_progress=None):
+        """
+        Run fn(*args) in the pool and return the task's generation
+        With on_progress, fn also gets a report(*values) keyword argument
+        whose calls are delivered to on_progress while the task is current
+        """
+        with self._lock:
+            generation = self.generations.get(channel, 0) + 1
+            self.generations[channel] = generation
+            previous = self.futures.get(channel)
+            if previous is not None:
+                previous.cancel()
+
+            kwargs = {}
+            if on_progress is not None:
+                kwargs["report"] = lambda *values: self.completed.put(
+                    (channel, generation, on_progress, values))
+
+            future = self.executor.submit(fn, *args, **kwargs)
+            self.futures[channel] = future
+        future.add_done_callback(
+            lambda f: self._finished(channel, generation, f, on_result, on_error))
+        return generation
+
+    def _finished(self, channel, generation, future, on_result, on_error):
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            if on_error is not None:
+                self.completed.put((channel, generation, on_error, (error,)))
+            else:
+                print(f"Background task '{channel}' failed: {error}")
+        elif on_result is not None:
+            self.completed.put((channel, generation, on_result, (future.result(),)))
+
+    def cancel(self, channel):
+        """Make every task on channel stale"""
+        with self._lock:
+            self.generations[channel] = self.generations.get(channel, 0) + 1
+            previous = self.futures.pop(channel, None)
+            if previous is not None:
+                previous.cancel()
+
+    def is_current(self, channel, generation):
+        return self.generations.get(channel) == generation
+
+    def busy(self, channel):
+        future = self.futures.get(channel)
+        return future is not None and not future.done()
+
+    def poll(self):
+        """Run callbacks of finished tasks, call this from the UI thread"""
+        while True:
+            try:
+                channel, generation, callback, values = self.completed.get_nowait()
+            except queue.Empty:
+                return
+            if self.is_current(channel, generation):
+                callback(*values)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
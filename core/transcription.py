@@ -0,0 +1,127 @@
+import re
+import threading
+from collections import Counter
+
+from core.normalize import ZERO_WIDTH
+
+SAMPLE_RATE = 16000
+# Whisper decodes 30 second windows, shorter clips can share one forward pass
+WINDOW_SAMPLES = 30 * SAMPLE_RATE
+# Bracketed parts of titles and artists, "(Remix)", "(방탄소년단)"
+BRACKETED_RE = re.compile(r"\s*[(\[][^)\]]*[)\]]")
+
+
+class WhisperBackend:
+    name = "whisper"
+    max_batch_samples = WINDOW_SAMPLES
+
+    def __init__(self, model_size="base", compute_type=None):
+        """openai-whisper on PyTorch, fp32 on CPU, compute_type is ignored"""
+        import whisper
+
+        self.model = whisper.load_model(model_size)
+
+    def transcribe(self, audio, greedy=True, initial_prompt=None, condition_on_previous_text=True):
+        """
+        Text of float32 16 kHz audio
+        greedy=False keeps Whisper's temperature fallback, which re-decodes every
+        window that looks repetitive or unsure at rising temperatures
+        """
+        options = {"temperature": 0.0} if greedy else {}
+        result = self.model.transcribe(audio, language="en", initial_prompt=initial_prompt,
+                                       condition_on_previous_text=condition_on_previous_text,
+                                       fp16=self.model.device.type == "cuda", **options)
+        return result["text"].strip()
+
+    def transcribe_batch(self, clips, initial_prompt=None):
+        """Texts of clips up to max_batch_samples long, decoded greedily in one forward pass"""
+        import torch
+        import whisper
+
+        model = self.model
+        options = whisper.DecodingOptions(language="en", temperature=0.0, without_timestamps=True,
+                                          prompt=initial_prompt, fp16=model.device.type == "cuda")
+        mels = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(clip), model.dims.n_mels) for clip in clips
+        ]).to(model.device)
+        with torch.no_grad():
+            results = whisper.decode(model, mels, options)
+        return [result.text.strip() for result in results]
+
+
+class FasterWhisperBackend:
+    name = "faster-whisper"
+    max_batch_samples = WINDOW_SAMPLES
+
+    def __init__(self, model_size="base", compute_type="int8"):
+        """
+        The same Whisper weights converted for CTranslate2 by faster-whisper
+        compute_type="int8" quantizes the weights, several times faster than
+        PyTorch fp32 on CPU at nearly the same accuracy
+        """
+        from faster_whisper import WhisperModel
+
+        self.model = WhisperModel(model_size, device="cpu", compute_type=compute_type or "int8")
+
+    def transcribe(self, audio, greedy=True, initial_prompt=None, condition_on_previous_text=True):
+        """Text of float32 16 kHz audio, greedy=False decodes with a beam of 5 and temperature fallback"""
+        options = {"beam_size": 1, "temperature": 0.0} if greedy else {}
+        segments, _ = self.model.transcribe(audio, language="en", initial_prompt=initial_prompt,
+                                            condition_on_previous_text=condition_on_previous_text, **options)
+        return "".join(segment.text for segment in segments).strip()
+
+    def transcribe_batch(self, clips, initial_prompt=None):
+        """Texts of clips one after another, CTranslate2 already spreads each over the cores"""
+        return [self.transcribe(clip, True, initial_prompt, False) for clip in clips]
+
+
+BACKENDS = {backend.name: backend for backend in (WhisperBackend, FasterWhisperBackend)}
+
+# Loaded models shared by every SongFinder and VoiceRecognizer in the process
+_models = {}
+_models_lock = threading.Lock()
+
+
+def load_backend(name="whisper", model_size="base", compute_type=None):
+    """The process-wide transcription backend for these settings, loaded on first use"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown transcription backend '{name}', expected one of: {', '.join(BACKENDS)}")
+    key = (name, model_size, compute_type)
+    # Held while loading, a second caller waits for the model instead of loading it again
+    with _models_lock:
+        backend = _models.get(key)
+        if backend is None:
+            print(f"Loading {name} model '{model_size}'...")
+            backend = _models[key] = BACKENDS[name](model_size, compute_type)
+        return backend
+
+
+def lexicon_prompt(songs, max_words=120, artist_share=0.25):
+    """
+    Artist names and song titles as an initial_prompt, biasing Whisper toward them
+    These are the lexicon's proper nouns and odd spellings ("thank u, next",
+    "Dynamite") that the search stages match exactly. Titles with the most
+    versions come first, bracketed parts and non-English titles are left out and
+    artists get at most artist_share of the max_words budget.
+    """
+    counts = ({}, {})
+    for song in songs:
+        if song is None:
+            continue
+        for names, value in zip(counts, (song.get("Artist"), song.get("Title"))):
+            text = BRACKETED_RE.sub("", value or "").translate(ZERO_WIDTH).strip()
+            if text and text.isascii():
+                # Case variants are one name, shown as first spelled
+                names.setdefault(text.casefold(), [text, 0])[1] += 1
+
+    parts = []
+    used = 0
+    for names, budget in zip(counts, (int(max_words * artist_share), max_words)):
+        ranked = Counter({text: count for text, count in names.values()})
+        for text, _ in ranked.most_common():
+            words = len(text.split())
+            if used + words > budget:
+                continue
+            parts.append(text)
+            used += words
+    return ", ".join(parts)
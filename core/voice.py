@@ -1,18 +1,22 @@
-import whisper
 import pyaudio
 import wave
 import numpy as np
 import time
 import tempfile
 import os
+from core.audio_stream import MicrophoneSource, capture_utterance
+from core.transcription import load_backend
 
 class VoiceRecognizer:
-    def __init__(self, model_size="base"):
+    def __init__(self, model_size="base", backend="whisper", compute_type=None, greedy=True, initial_prompt=None):
         """ 
         Initialize Whisper voice recognizer
         model_size: "tiny", "base", "small", "medium", "large"
+        backend: "whisper" or "faster-whisper", the model is shared process-wide
         """
-        self.model = whisper.load_model(model_size)
+        self.model = load_backend(backend, model_size, compute_type)
+        self.greedy = greedy
+        self.initial_prompt = initial_prompt
         self.audio = pyaudio.PyAudio()
         self.sample_rate = 16000
         self.chunk_size = 1024
@@ -51,21 +55,44 @@ class VoiceRecognizer:
             print(f"Error recording audio: {e}")
             return None
     
-    def listen_for_search(self):
-        """Capture voice input using Whisper with direct PyAudio recording"""
+    def record_audio_streaming(self, source=None, max_seconds=10):
+        """Record until the singer stops, using energy-based endpointing"""
+        try:
+            if source is None:
+                source = MicrophoneSource(self.audio, self.sample_rate, self.chunk_size,
+                                          self.channels, self.format)
+            print("Listening... (speak now)")
+            audio_data = capture_utterance(source, self.sample_rate, max_seconds)
+            print("Recording finished")
+            return audio_data
+            
+        except Exception as e:
+            print(f"Error recording audio: {e}")
+            return None
+        finally:
+            if source is not None:
+                source.close()
+    
+    def listen_for_search(self, streaming=True, source=None):
+        """
+        Capture voice input using Whisper with direct PyAudio recording
+        streaming=True stops as soon as the singer does, source replaces the mic
+        """
         print("Listening for your song search...")
         
         try:
             # Record audio
-            audio_data = self.record_audio(record_seconds=5)
+            if streaming:
+                audio_data = self.record_audio_streaming(source=source)
+            else:
+                audio_data = self.record_audio(record_seconds=5)
             if audio_data is None:
                 return None
             
             print("Processing your speech with Whisper...")
             
             # Transcribe with Whisper
-            result = self.model.transcribe(audio_data, language="en")
-            query = result["text"].strip()
+            query = self.model.transcribe(audio_data, self.greedy, self.initial_prompt)
             
             print(f"You said: {query}")
             return query if query else None
@@ -8,12 +8,101 @@ try:
 except ImportError:
     sys.path.append(os.path.dirname(os.path.abspath(__file__)))
     from song_finder import SongFinder
+from core.tasks import BackgroundTasks
+
+
+class VirtualResultList:
+    def __init__(self, parent, create_row, bind_row, width=570, height=360, row_height=60, row_gap=12):
+        """
+        Scrollable list that only draws the rows in view
+        A fixed pool of row widgets from create_row(parent) is reused, scrolling
+        just moves them and calls bind_row(row, item) with the item now shown
+        """
+        self.bind_row = bind_row
+        self.height = height
+        self.row_gap = row_gap
+        self.pitch = row_height + row_gap
+        self.items = []
+        self.top = 0
+
+        self.scrollbar = tk.Scrollbar(parent, orient="vertical", command=self.on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.viewport = tk.Frame(parent, bg="#191414", width=width, height=height)
+        self.viewport.pack(side="left", fill="both", expand=True)
+
+        # Enough rows to cover the viewport plus one partly scrolled in
+        self.rows = [create_row(self.viewport) for _ in range(height // self.pitch + 2)]
+        for widget in [self.viewport] + self.rows:
+            widget.bind("<MouseWheel>", self.on_mousewheel)
+            widget.bind("<Button-4>", lambda e: self.scroll_by(-self.pitch))
+            widget.bind("<Button-5>", lambda e: self.scroll_by(self.pitch))
+        self.refresh()
+
+    def content_height(self):
+        return max(len(self.items) * self.pitch - self.row_gap, 0)
+
+    def set_items(self, items):
+        self.items = items
+        self.top = 0
+        self.refresh()
+
+    def scroll_to(self, top):
+        self.top = min(max(top, 0), max(self.content_height() - self.height, 0))
+        self.refresh()
+
+    def scroll_by(self, pixels):
+        self.scroll_to(self.top + pixels)
+
+    def on_scrollbar(self, action, amount, units=None):
+        if action == "moveto":
+            self.scroll_to(float(amount) * self.content_height())
+        elif action == "scroll":
+            step = self.pitch if units == "units" else self.height
+            self.scroll_by(int(amount) * step)
+
+    def on_mousewheel(self, event):
+        self.scroll_by(-self.pitch if event.delta > 0 else self.pitch)
+
+    def refresh(self):
+        first = int(self.top // self.pitch)
+        for offset, row in enumerate(self.rows):
+            item_idx = first + offset
+            if item_idx >= len(self.items):
+                row.place_forget()
+                continue
+            self.bind_row(row, self.items[item_idx])
+            row.place(x=0, y=item_idx * self.pitch - self.top)
+
+        content_height = self.content_height()
+        if content_height <= self.height:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.top / content_height, (self.top + self.height) / content_height)
+
 
 class SongFinderUI:
-    def __init__(self, root):
+    def __init__(self, root, text_only=False, lazy_lyrics=False, build_workers=1, semantic=False,
+                 transcription_backend="whisper"):
         self.root = root
-        self.song_finder = SongFinder()
+        self.text_only = text_only
+        self.song_finder = SongFinder(enable_voice=not text_only, lazy_lyrics=lazy_lyrics,
+                                      build_workers=build_workers, semantic=semantic,
+                                      transcription_backend=transcription_backend)
+        # Searches and transcription run in worker threads, results come back through poll_tasks
+        self.tasks = BackgroundTasks()
+        self.search_delay_ms = 250
+        self.max_results = 500
+        self.pending_search = None
+        self.lexicon_poll_ms = 2000
         self.setup_ui()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.poll_tasks()
+        self.root.after(self.lexicon_poll_ms, self.poll_lexicons)
+        
+        # Warm up Whisper in the background so the window draws right away
+        if not text_only:
+            self.song_finder.warm_up_voice()
+            self.poll_voice_ready()
     
     def setup_ui(self):
         self.root.title("Song Spark Finder")
@@ -69,12 +158,23 @@ class SongFinderUI:
         self.search_entry.bind("<FocusIn>", on_entry_click)
         self.search_entry.bind("<FocusOut>", on_focus_out)
 
+        # TYPE-AHEAD DROPDOWN under the search bar, filled on every keystroke
+        self.suggestions = []
+        self.suggestion_list = tk.Listbox(self.root, font=("Arial", 11), bg="#282828", fg="white",
+                                          selectbackground="#E8C999", selectforeground="black",
+                                          borderwidth=0, highlightthickness=1, highlightbackground="#6D6D6D",
+                                          activestyle="none", takefocus=0)
+        self.suggestion_list.bind("<ButtonRelease-1>", self.on_suggestion_click)
+        # Late enough that a click on the dropdown lands first
+        self.search_entry.bind("<FocusOut>", lambda e: self.root.after(200, self.hide_suggestions), add="+")
+
         # Microphone icon
         mic_path = r"icon/microphone.png"
         mic_img = Image.open(mic_path).resize((26, 26), Image.LANCZOS)
         self.mic_icon = ImageTk.PhotoImage(mic_img)
-        self.mic_label = tk.Label(header, image=self.mic_icon, bg="#191414")
-        self.mic_label.pack(side="left", pady=10)
+        self.mic_label = tk.Label(header, image=self.mic_icon, bg="#191414", cursor="watch")
+        if not self.text_only:
+            self.mic_label.pack(side="left", pady=10)
 
         # SUGGESTION BOX HEADING
         suggestion_width = 570
@@ -109,24 +209,19 @@ class SongFinderUI:
                                         bg="#191414", fg="white")
         self.results_heading.place(x=center_x, y=header_height + border_height + suggestion_height + 55)
 
-        # SCROLLABLE RESULTS
+        # SCROLLABLE RESULTS, rows are recycled so long result lists stay cheap
         self.results_frame = tk.Frame(self.root, bg="#191414")
         self.results_frame.place(x=center_x, y=header_height + border_height + suggestion_height + 85, width=570, height=360)
+        self.results_list = VirtualResultList(self.results_frame, self.create_song_row, self.bind_song_row,
+                                              width=570, height=360, row_height=60, row_gap=12)
 
-        self.results_canvas = tk.Canvas(self.results_frame, bg="#191414", highlightthickness=0)
-        self.scrollbar = tk.Scrollbar(self.results_frame, orient="vertical", command=self.results_canvas.yview)
-        self.scrollbar.pack(side="right", fill="y")
-        self.results_canvas.pack(side="left", fill="both", expand=True)
-        self.results_canvas.configure(yscrollcommand=self.scrollbar.set)
-
-        self.inner_frame = tk.Frame(self.results_canvas, bg="#191414")
-        self.results_canvas.create_window((0,0), window=self.inner_frame, anchor="nw")
-        self.inner_frame.bind("<Configure>", lambda e: self.results_canvas.configure(scrollregion=self.results_canvas.bbox("all")))
-
-        self.mic_label.bind("<Button-1>", self.on_voice_search)
+        if not self.text_only:
+            self.mic_label.bind("<Button-1>", self.on_voice_search)
         self.search_entry.bind("<Return>", self.on_text_search)
-
-        self.song_canvases = []
+        self.search_entry.bind("<KeyRelease>", self.on_typing)
+        self.search_entry.bind("<Down>", lambda e: self.move_suggestion(1))
+        self.search_entry.bind("<Up>", lambda e: self.move_suggestion(-1))
+        self.search_entry.bind("<Escape>", lambda e: self.hide_suggestions())
 
     # Rounded rectangle helper
     def create_rounded_rect(self, canvas, x1, y1, x2, y2, r=18, **kwargs):
@@ -136,19 +231,71 @@ class SongFinderUI:
         ]
         return canvas.create_polygon(points, smooth=True, **kwargs)
 
-    # Voice search
+    # Voice model ready signal
+    def poll_voice_ready(self):
+        if not self.song_finder.voice_ready.is_set():
+            self.root.after(200, self.poll_voice_ready)
+        elif self.song_finder.voice_error is None:
+            self.mic_label.config(cursor="hand2")
+        else:
+            self.mic_label.config(cursor="X_cursor")
+
+    # Worker results are handed back to Tk here
+    def poll_tasks(self):
+        self.tasks.poll()
+        self.root.after(30, self.poll_tasks)
+
+    def on_close(self):
+        self.tasks.shutdown()
+        self.song_finder.save_search_state()
+        self.root.destroy()
+
+    # Lexicon files edited while the app runs are picked up without a restart
+    def poll_lexicons(self):
+        if not self.tasks.busy("reload"):
+            self.tasks.submit("reload", self.song_finder.reload_lexicons, on_result=self.on_lexicons_reloaded)
+        self.root.after(self.lexicon_poll_ms, self.poll_lexicons)
+
+    def on_lexicons_reloaded(self, changes):
+        if not (changes["added"] or changes["changed"] or changes["removed"]):
+            return
+        query = self.search_entry.get().strip()
+        if query and query != "Search for a song..." and not self.tasks.busy("voice"):
+            self.display_results(query)
+
+    # Voice search, partial transcripts update the results while the user sings
     def on_voice_search(self, event):
+        if self.tasks.busy("voice"):
+            return
+        self.hide_suggestions()
         self.search_entry.delete(0, tk.END)
-        self.search_entry.insert(0, "Listening... Speak now")
+        if self.song_finder.voice_ready.is_set():
+            self.search_entry.insert(0, "Listening... Speak now")
+        else:
+            self.search_entry.insert(0, "Loading voice model...")
         self.search_entry.config(fg="white")
-        self.root.update()
         
-        query = self.song_finder.listen_for_search()
-        if query:
-            self.search_entry.delete(0, tk.END)
-            self.search_entry.insert(0, query)
-            self.display_results(query)
-        else:
+        self.tasks.submit("voice", self.run_live_voice_search,
+                          on_progress=self.on_voice_partial, on_result=self.on_voice_done)
+
+    def run_live_voice_search(self, report):
+        if not self.song_finder.voice_ready.is_set():
+            self.song_finder.load_voice()
+            report(None, [], False)
+        query, results = self.song_finder.listen_for_live_search(on_partial=report, max_results=self.max_results)
+        return query
+
+    def on_voice_partial(self, query, results, final):
+        self.search_entry.delete(0, tk.END)
+        if query is None:
+            self.search_entry.insert(0, "Listening... Speak now")
+            return
+        self.search_entry.insert(0, query)
+        self.search_entry.config(fg="white")
+        self.show_results(query, results)
+
+    def on_voice_done(self, query):
+        if not query:
             self.search_entry.delete(0, tk.END)
             self.search_entry.insert(0, "Could not understand voice input")
             self.search_entry.config(fg="#ff4444")
@@ -156,20 +303,90 @@ class SongFinderUI:
 
     # Text search
     def on_text_search(self, event):
+        selection = self.suggestion_list.curselection()
+        if self.suggestions and selection:
+            self.pick_suggestion(selection[0])
+            return
+        self.hide_suggestions()
+        if self.pending_search is not None:
+            self.root.after_cancel(self.pending_search)
+            self.pending_search = None
         query = self.search_entry.get()
         if query and query != "Search for a song...":
             self.display_results(query)
 
+    # Search once typing pauses, newer queries make older ones stale
+    def on_typing(self, event):
+        if event.keysym in ("Return", "Up", "Down", "Escape"):
+            return
+        self.update_suggestions()
+        if self.pending_search is not None:
+            self.root.after_cancel(self.pending_search)
+        self.pending_search = self.root.after(self.search_delay_ms, self.on_typing_pause)
+
+    def on_typing_pause(self):
+        self.pending_search = None
+        query = self.search_entry.get().strip()
+        if query and query != "Search for a song...":
+            self.display_results(query)
+
+    # Type-ahead, the prefix index answers in microseconds so it runs on the Tk thread
+    def update_suggestions(self):
+        text = self.search_entry.get()
+        self.suggestions = self.song_finder.suggest(text) if text != "Search for a song..." else []
+        if not self.suggestions:
+            self.hide_suggestions()
+            return
+        self.suggestion_list.delete(0, tk.END)
+        for completion, kind in self.suggestions:
+            self.suggestion_list.insert(tk.END, f"{completion}  ·  {kind}")
+        self.suggestion_list.config(height=len(self.suggestions))
+        self.suggestion_list.place(x=15, y=50, width=280)
+        self.suggestion_list.lift()
+
+    def hide_suggestions(self):
+        self.suggestions = []
+        self.suggestion_list.place_forget()
+
+    def move_suggestion(self, step):
+        if not self.suggestions:
+            return "break"
+        selection = self.suggestion_list.curselection()
+        if selection:
+            index = max(0, min(selection[0] + step, len(self.suggestions) - 1))
+        else:
+            index = 0 if step > 0 else len(self.suggestions) - 1
+        self.suggestion_list.selection_clear(0, tk.END)
+        self.suggestion_list.selection_set(index)
+        self.suggestion_list.see(index)
+        return "break"
+
+    def on_suggestion_click(self, event):
+        if self.suggestions:
+            self.pick_suggestion(self.suggestion_list.nearest(event.y))
+
+    def pick_suggestion(self, index):
+        completion = self.suggestions[index][0]
+        self.hide_suggestions()
+        if self.pending_search is not None:
+            self.root.after_cancel(self.pending_search)
+            self.pending_search = None
+        self.search_entry.delete(0, tk.END)
+        self.search_entry.insert(0, completion)
+        self.search_entry.config(fg="white")
+        self.display_results(completion)
+
     # Display results
     def display_results(self, query):
-        for widget in self.inner_frame.winfo_children():
-            widget.destroy()
-        self.song_canvases = []
+        # Ranked so the best match lands in the "Match Found" box
+        self.tasks.submit("search", self.song_finder.search_ranked, query, self.max_results,
+                          on_result=lambda ranked: self.show_results(query, [song for score, song in ranked]))
 
-        results = self.song_finder.search_songs(query)
+    def show_results(self, query, results):
         print(f"Search for '{query}' returned {len(results)} results")
         
         if not results:
+            self.results_list.set_items([])
             self.show_no_results()
             return
 
@@ -196,27 +413,29 @@ class SongFinderUI:
 
     # Show search results
     def show_search_results(self, results):
-        song_container_height = 60
-        song_gap = 12
-
-        for song in results:
-            song_canvas = tk.Canvas(self.inner_frame, bg="#191414", highlightthickness=0, width=570, height=song_container_height)
-            song_canvas.pack(pady=(0, song_gap))
+        self.results_list.set_items(results)
 
-            rect_id = self.create_rounded_rect(song_canvas, 0, 0, 570, song_container_height, r=5, fill="#E8C999")
-            title_id = song_canvas.create_text(20, 20, text=song['Title'], font=("Arial", 14, "bold"), fill="black", anchor="w")
-            artist_id = song_canvas.create_text(20, 40, text=song['Artist'], font=("Arial", 12), fill="#2D2D2D", anchor="w")
+    # Result row, created once and rebound to whichever song scrolls into it
+    def create_song_row(self, parent):
+        song_container_height = 60
+        song_canvas = tk.Canvas(parent, bg="#191414", highlightthickness=0, width=570, height=song_container_height)
 
-            song_canvas.song_data = song
-            song_canvas.rect_id = rect_id
-            song_canvas.title_id = title_id
-            song_canvas.artist_id = artist_id
+        song_canvas.rect_id = self.create_rounded_rect(song_canvas, 0, 0, 570, song_container_height, r=5, fill="#E8C999")
+        song_canvas.title_id = song_canvas.create_text(20, 20, text="", font=("Arial", 14, "bold"), fill="black", anchor="w")
+        song_canvas.artist_id = song_canvas.create_text(20, 40, text="", font=("Arial", 12), fill="#2D2D2D", anchor="w")
+        song_canvas.song_data = None
 
-            song_canvas.bind("<Button-1>", lambda e, s=song: self.on_song_click(s))
-            song_canvas.bind("<Enter>", lambda e, c=song_canvas: self.on_enter(e, c))
-            song_canvas.bind("<Leave>", lambda e, c=song_canvas: self.on_leave(e, c))
+        song_canvas.bind("<Button-1>", lambda e, c=song_canvas: self.on_song_click(c.song_data))
+        song_canvas.bind("<Enter>", lambda e, c=song_canvas: self.on_enter(e, c))
+        song_canvas.bind("<Leave>", lambda e, c=song_canvas: self.on_leave(e, c))
+        return song_canvas
 
-            self.song_canvases.append(song_canvas)
+    def bind_song_row(self, song_canvas, song):
+        if song_canvas.song_data is song:
+            return
+        song_canvas.itemconfig(song_canvas.title_id, text=song['Title'])
+        song_canvas.itemconfig(song_canvas.artist_id, text=song['Artist'])
+        song_canvas.song_data = song
 
     # Hover effects for results
     def on_enter(self, event, canvas):
@@ -260,7 +479,7 @@ class SongFinderUI:
         container.pack(expand=True, fill="both")
 
         # Get lyrics safely
-        lyrics_text = song.get('Lyric') or song.get('lyrics') or "Lyrics not available"
+        lyrics_text = self.song_finder.get_lyrics(song) or "Lyrics not available"
 
         # Text widget with scrollbar
         text_widget = tk.Text(container, font=("Arial", 14), bg="#E8C999", fg="black", wrap="word")
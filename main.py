@@ -1,3 +1,4 @@
+import argparse
 import os
 import sys
 from interface import SongFinderUI
@@ -6,6 +7,33 @@ import tkinter as tk
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Song Spark Finder")
+    parser.add_argument("--text-only", action="store_true",
+                        help="start without voice search, whisper and pyaudio are never loaded")
+    parser.add_argument("--lazy-lyrics", action="store_true",
+                        help="stream large catalogs into the indexes and read lyrics from disk on demand")
+    parser.add_argument("--build-workers", type=int, default=1, metavar="N",
+                        help="index lexicon files on N processes when the cache is rebuilt, 0 for one per core")
+    parser.add_argument("--voice-backend", choices=["whisper", "faster-whisper"], default="whisper",
+                        help="transcription engine, faster-whisper runs int8 CTranslate2 models on CPU")
+    parser.add_argument("--semantic", action="store_true",
+                        help="also match lyrics by meaning when no title or lyric matches (needs numpy)")
+    parser.add_argument("--stats-file", metavar="PATH",
+                        help="write search and transcription timings to PATH on exit")
+    parser.add_argument("--profile", choices=["cprofile", "pyinstrument"],
+                        help="profile searches and transcription, written next to the stats file on exit")
+    args = parser.parse_args()
+
     root = tk.Tk()
-    app = SongFinderUI(root)
-    root.mainloop()
\ No newline at end of file
+    app = SongFinderUI(root, text_only=args.text_only, lazy_lyrics=args.lazy_lyrics,
+                       build_workers=args.build_workers or None, semantic=args.semantic,
+                       transcription_backend=args.voice_backend)
+    if args.profile:
+        app.song_finder.instrumentation.enable_profiling(args.profile)
+    root.mainloop()
+
+    if args.stats_file:
+        app.song_finder.instrumentation.dump(args.stats_file)
+    if args.profile:
+        base = os.path.splitext(args.stats_file or "song_finder")[0]
+        app.song_finder.instrumentation.dump_profile(base + (".html" if args.profile == "pyinstrument" else ".prof"))
\ No newline at end of file
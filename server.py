@@ -0,0 +1,282 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from song_finder import SongFinder
+
+MAX_BODY_BYTES = 8 * 1024 * 1024
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+# The SongFinder searches run against, one per worker process or one shared by the thread pool
+_finder = None
+
+
+def _init_worker(finder_options, profile=None):
+    global _finder
+    _finder = SongFinder(enable_voice=False, **finder_options)
+    if profile:
+        _finder.instrumentation.enable_profiling(profile)
+
+
+def _song_json(song, lyrics=False):
+    """A search result as JSON, lyrics are left out unless asked for"""
+    data = {key: value for key, value in song.items() if key != "Lyric"}
+    if lyrics:
+        data["Lyric"] = _finder.get_lyrics(song)
+    versions = _finder.versions(song)
+    if len(versions) > 1:
+        data["Versions"] = [version["Title"] for version in versions if version is not song]
+    return data
+
+
+def _search_batch(queries, ranked=False, limit=10, lyrics=False):
+    """JSON-ready results of each query, this is the CPU work the pool runs"""
+    results = []
+    for query in queries:
+        if ranked:
+            results.append([{"score": score, "song": _song_json(song, lyrics)}
+                            for score, song in _finder.search_ranked(query, limit)])
+        else:
+            results.append([_song_json(song, lyrics) for song in _finder.search_songs(query, limit)])
+    return results
+
+
+def _stats(profile=False):
+    stats = {
+        "songs": sum(song is not None for song in _finder.song_data["songs"]),
+        "query_cache": _finder.query_cache.stats(),
+        "instrumentation": _finder.instrumentation.stats(),
+        "pid": os.getpid()
+    }
+    if profile:
+        stats["profile"] = _finder.instrumentation.profile_report()
+    return stats
+
+
+class SearchService:
+    def __init__(self, workers=4, processes=False, batch_size=64, finder_options=None, profile=None):
+        """
+        Async front end to SongFinder searches, for embedding or behind the HTTP server
+        Indexes load once: in this process for a thread pool, or once per
+        worker with processes=True so searches use every core.
+        Batches are split into batch_size chunks that run on the pool concurrently.
+        profile ("cprofile" or "pyinstrument") profiles every search in every worker.
+        """
+        self.workers = workers
+        self.batch_size = batch_size
+        finder_options = finder_options or {}
+        if processes:
+            self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                initargs=(finder_options, profile))
+        else:
+            _init_worker(finder_options, profile)
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search-worker")
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def search(self, query, ranked=False, limit=10, lyrics=False):
+        results = await self._run(_search_batch, [query], ranked, limit, lyrics)
+        return results[0]
+
+    async def search_batch(self, queries, ranked=False, limit=10, lyrics=False):
+        chunks = [queries[start:start + self.batch_size] for start in range(0, len(queries), self.batch_size)]
+        chunk_results = await asyncio.gather(
+            *(self._run(_search_batch, chunk, ranked, limit, lyrics) for chunk in chunks))
+        return [results for chunk in chunk_results for results in chunk]
+
+    async def stats(self, profile=False):
+        """Stats of whichever worker answers, each process keeps its own"""
+        return await self._run(_stats, profile)
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class SearchServer:
+    def __init__(self, service):
+        """
+        Minimal HTTP/1.1 JSON API over a SearchService
+        GET  /health
+        GET  /stats?profile=0
+        GET  /search?q=...&limit=10&ranked=0&lyrics=0
+        POST /search/batch  {"queries": [...], "limit": 10, "ranked": false, "lyrics": false}
+        """
+        self.service = service
+        self.connections = {}
+
+    async def close_connections(self):
+        """Close idle keep-alive connections and wait for their handlers to return"""
+        for writer in list(self.connections.values()):
+            writer.close()
+        await asyncio.gather(*self.connections, return_exceptions=True)
+
+    async def handle_connection(self, reader, writer):
+        self.connections[asyncio.current_task()] = writer
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                keep_alive = await self.handle_request(request_line, reader, writer)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.connections.pop(asyncio.current_task(), None)
+            writer.close()
+
+    async def handle_request(self, request_line, reader, writer):
+        """Answer one request, returns whether the connection stays open"""
+        keep_alive = False
+        try:
+            try:
+                method, target, version = request_line.decode('latin-1').split()
+            except ValueError:
+                raise HttpError(400, "Malformed request line")
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                name, _, value = line.decode('latin-1').partition(":")
+                headers[name.strip().lower()] = value.strip()
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection == "keep-alive" or (version == "HTTP/1.1" and connection != "close")
+
+            length = headers.get("content-length") or "0"
+            if not (length.isascii() and length.isdigit()):
+                # Where the body ends is unknown, so is where the next request starts
+                keep_alive = False
+                raise HttpError(400, "Content-Length must be a non-negative integer")
+            length = int(length)
+            if length > MAX_BODY_BYTES:
+                keep_alive = False
+                raise HttpError(413, f"Request bodies are limited to {MAX_BODY_BYTES} bytes")
+            body = await reader.readexactly(length) if length else b""
+            status, payload = 200, await self.route(method, target, body)
+        except HttpError as e:
+            status, payload = e.status, {"error": str(e)}
+        except Exception as e:
+            print(f"Error handling {request_line!r}: {e}")
+            status, payload = 500, {"error": str(e)}
+
+        content = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                "Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(content)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + content)
+        return keep_alive
+
+    async def route(self, method, target, body):
+        url = urlsplit(target)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        if url.path == "/health":
+            return {"status": "ok"}
+        if url.path == "/stats":
+            return await self.service.stats(self.flag(params.get("profile", False)))
+        if url.path == "/search":
+            if method != "GET":
+                raise HttpError(405, "Use GET for /search")
+            query = params.get("q", "")
+            results = await self.service.search(query, **self.search_options(params))
+            return {"query": query, "results": results}
+        if url.path == "/search/batch":
+            if method != "POST":
+                raise HttpError(405, "Use POST for /search/batch")
+            try:
+                request = json.loads(body or b"{}")
+            except ValueError as e:
+                raise HttpError(400, f"Invalid JSON body: {e}")
+            queries = request.get("queries") if isinstance(request, dict) else None
+            if not isinstance(queries, list) or not all(isinstance(query, str) for query in queries):
+                raise HttpError(400, "Expected {\"queries\": [\"...\", ...]}")
+            results = await self.service.search_batch(queries, **self.search_options(request))
+            return {"results": results}
+        raise HttpError(404, f"No endpoint {url.path}")
+
+    @staticmethod
+    def flag(value):
+        return str(value).lower() in ("1", "true", "yes")
+
+    @classmethod
+    def search_options(cls, params):
+        """ranked/limit/lyrics from query parameters or a JSON body"""
+        flag = cls.flag
+        try:
+            limit = int(params.get("limit", 10))
+        except (TypeError, ValueError):
+            raise HttpError(400, "limit must be an integer")
+        if limit < 1:
+            raise HttpError(400, "limit must be positive")
+        return {"ranked": flag(params.get("ranked", False)), "limit": limit,
+                "lyrics": flag(params.get("lyrics", False))}
+
+
+async def serve(service, host="127.0.0.1", port=8765, unix_socket=None):
+    server = SearchServer(service)
+    if unix_socket:
+        listener = await asyncio.start_unix_server(server.handle_connection, path=unix_socket)
+        print(f"Serving song search on unix socket {unix_socket}")
+    else:
+        listener = await asyncio.start_server(server.handle_connection, host, port)
+        print(f"Serving song search on http://{host}:{port}")
+    # SIGTERM stops serving like Ctrl+C, so worker processes are shut down too
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signal_number, stop.set)
+        except NotImplementedError:
+            pass
+    async with listener:
+        await stop.wait()
+    await server.close_connections()
+    print("Search service stopped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Song Spark Finder headless search service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix-socket", metavar="PATH", help="listen on a unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="size of the search worker pool")
+    parser.add_argument("--processes", action="store_true",
+                        help="search in worker processes, each loading the indexes once, instead of threads")
+    parser.add_argument("--batch-size", type=int, default=64,
+                        help="queries per pool task when splitting a batch request")
+    parser.add_argument("--lazy-lyrics", action="store_true",
+                        help="stream large catalogs into the indexes and read lyrics from disk on demand")
+    parser.add_argument("--semantic", action="store_true",
+                        help="also match lyrics by meaning when no title or lyric matches (needs numpy)")
+    parser.add_argument("--profile", choices=["cprofile", "pyinstrument"],
+                        help="profile searches, the report is served at /stats?profile=1")
+    args = parser.parse_args()
+
+    service = SearchService(workers=args.workers, processes=args.processes, batch_size=args.batch_size,
+                            finder_options={"lazy_lyrics": args.lazy_lyrics, "semantic": args.semantic},
+                            profile=args.profile)
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.unix_socket))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
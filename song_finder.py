@@ -1,34 +1,353 @@
-import whisper
-import pyaudio
-import numpy as np
+import hashlib
+import heapq
 import json
-from difflib import get_close_matches
-import re
-from collections import defaultdict
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import time
 from core.lexicon import LexiconManager
+from core.inverted_index import InvertedIndex
+from core.fuzzy_index import FuzzyIndex
+from core.lexicon_cache import CACHE_VERSION, LexiconCache
+from core.ranking import BM25Ranker, top_scores
+from core.ngram_postings import CompactNgramIndex
+from core.phonetic_index import PhoneticIndex
+from core.prefix_index import PrefixIndex
+from core.instrumentation import Instrumentation
+from core.normalize import normalize_query, normalize_text
+from core.query_cache import QueryCache
+from core.song_record import SongRecord
+from core.transcription import lexicon_prompt, load_backend
+
+# A song sounding like over 1 / PHONETIC_WEIGHT of a misheard query outranks the best BM25 match
+PHONETIC_WEIGHT = 1.25
+# Cosine similarity counts a little less than a full BM25 match
+SEMANTIC_WEIGHT = 0.8
+
 
 class SongFinder:
-    def __init__(self, whisper_model_size="base"):
-        self.lexicon_manager = LexiconManager()
-        self.song_data = self.lexicon_manager.load_all_lexicons()
+    def __init__(self, whisper_model_size="base", use_cache=True, enable_voice=True, ngram_engine="python",
+                 query_cache_size=1024, lazy_lyrics=False, build_workers=1, lexicon_dir=None, semantic=False,
+                 semantic_dims=128, semantic_lsh_songs=200000, transcription_backend="whisper",
+                 compute_type=None, greedy_decoding=True, prompt_from_lexicon=True):
+        """
+        enable_voice=False is text-only mode, whisper and pyaudio are never imported
+        Otherwise they load on the first voice search or through warm_up_voice()
+        ngram_engine="numpy" scores stage 2 with the sparse NgramMatrix
+        lazy_lyrics=True streams the lexicons into the indexes and keeps only song
+        metadata resident, get_lyrics() reads a song's lyrics back from its file
+        build_workers > 1 (None for one per core) indexes lexicon files in parallel processes
+        lexicon_dir replaces the bundled core/lexicons folder
+        semantic=True adds an LSA stage for paraphrased lyrics, it needs NumPy and
+        switches to LSH candidates from semantic_lsh_songs songs on
+        transcription_backend="faster-whisper" transcribes with CTranslate2, int8
+        unless compute_type says otherwise. greedy_decoding=False restores Whisper's
+        temperature fallback and prompt_from_lexicon=False drops the initial_prompt
+        of artist names and titles
+        """
+        self.lexicon_manager = LexiconManager(lexicon_dir)
+        self.lazy_lyrics = lazy_lyrics
+        self.build_workers = build_workers
+        # Lazily loaded songs pickle differently, they get a cache of their own
+        self.cache_path = None
+        if lazy_lyrics:
+            self.cache_path = os.path.join(self.lexicon_manager.lexicon_dir, ".cache", "lexicons-lazy.bin")
+        self.lexicon_cache = LexiconCache(self.lexicon_manager.lexicon_dir, self.cache_path) if use_cache else None
+        self.ngram_engine = ngram_engine
+        
+        # Timings, counters and recent queries, see stats()
+        self.instrumentation = Instrumentation()
         
-        # Initialize Whisper model
-        self.whisper_model = whisper.load_model(whisper_model_size)
+        # Results of recent queries, dropped whenever the lexicons reload
+        self.query_cache = QueryCache(query_cache_size)
+        self.lexicon_manager.add_reload_listener(lambda song_data: self.query_cache.clear())
         
-        # Initialize PyAudio for voice recording
-        self.audio = pyaudio.PyAudio()
+        # Songs and search indexes, from the compiled cache when it is current
+        # Searches and reload_lexicons() take the lock, reloads may come from a watcher thread
+        self._index_lock = threading.RLock()
+        self._cache_dirty = False
+        self._load_search_state()
+        
+        # LSA vectors, loaded memory-mapped or built now and rebuilt lazily after reloads
+        self.semantic = semantic
+        self.semantic_dims = semantic_dims
+        self.semantic_lsh_songs = semantic_lsh_songs
+        self._semantic_index = None
+        if semantic:
+            self.get_semantic_index()
+        
+        # Transcription model and PyAudio are created lazily by load_voice()
+        # The model comes from a process-wide cache, every SongFinder shares it
+        self.enable_voice = enable_voice
+        self.whisper_model_size = whisper_model_size
+        self.transcription_backend = transcription_backend
+        self.compute_type = compute_type
+        self.greedy_decoding = greedy_decoding
+        self.prompt_from_lexicon = prompt_from_lexicon
+        self.transcriber = None
+        self._transcription_prompt = None
+        self.audio = None
+        self.voice_error = None
+        self.voice_ready = threading.Event()
+        self._voice_lock = threading.Lock()
         self.sample_rate = 16000
         self.chunk_size = 1024
         self.channels = 1
-        self.format = pyaudio.paInt16
+        self.format = None
+
+    def load_voice(self):
+        """Load the Whisper model and open PyAudio, once, returns True when usable"""
+        if not self.enable_voice:
+            return False
+        with self._voice_lock:
+            if self.voice_ready.is_set():
+                return self.voice_error is None
+            try:
+                import pyaudio
+                
+                self.load_transcriber()
+                self.audio = pyaudio.PyAudio()
+                self.format = pyaudio.paInt16
+            except Exception as e:
+                print(f"Error loading voice recognition: {e}")
+                self.voice_error = e
+            finally:
+                # Set even on failure so waiting callers stop waiting
+                self.voice_ready.set()
+            return self.voice_error is None
+
+    def _load_for_source(self, source):
+        """Load what listening needs: everything for the microphone, only the transcriber for a given source"""
+        if source is None or not self.enable_voice:
+            return self.load_voice()
+        try:
+            self.load_transcriber()
+            return True
+        except Exception as e:
+            print(f"Error loading the transcriber: {e}")
+            return False
+
+    def load_transcriber(self):
+        """The transcription backend alone, enough for transcribing files without a microphone"""
+        if self.transcriber is None:
+            self.transcriber = load_backend(self.transcription_backend, self.whisper_model_size,
+                                            self.compute_type)
+        return self.transcriber
+
+    def transcription_prompt(self):
+        """initial_prompt built from the current lexicons, None when disabled"""
+        if not self.prompt_from_lexicon:
+            return None
+        with self._index_lock:
+            if self._transcription_prompt is None:
+                self._transcription_prompt = lexicon_prompt(self.song_data["songs"])
+            return self._transcription_prompt or None
+
+    def warm_up_voice(self):
+        """Start loading voice recognition in a background thread"""
+        if not self.enable_voice or self.voice_ready.is_set():
+            return None
+        thread = threading.Thread(target=self.load_voice, name="voice-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def _load_search_state(self):
+        """Load songs and indexes from the cache, compiling it if stale"""
+        state = self.lexicon_cache.load() if self.lexicon_cache else None
+        if state is None:
+            state = self.compile_search_state()
+            if self.lexicon_cache:
+                self._save_cache(state)
+        
+        # Indexes stay in the cache until a search first needs them, see the properties below
+        self._search_state = state
+        self.song_data = state["song_data"]
+        self._ranker = None
+        self._ngram_matrix = None
+
+    @property
+    def ngram_index(self):
+        return self._search_state["ngram_index"]
+
+    @property
+    def inverted_index(self):
+        return self._search_state["inverted_index"]
+
+    @property
+    def fuzzy_index(self):
+        return self._search_state["fuzzy_index"]
+
+    @property
+    def prefix_index(self):
+        return self._search_state["prefix_index"]
+
+    @property
+    def phonetic_index(self):
+        return self._search_state["phonetic_index"]
+
+    @property
+    def ranker(self):
+        if self._ranker is None:
+            self._ranker = BM25Ranker(self.inverted_index)
+        return self._ranker
+
+    def compile_search_state(self):
+        """Parse the lexicons and build every search index from scratch"""
+        if self.build_workers != 1:
+            from core.parallel_build import build_search_state
+            state = build_search_state(self.lexicon_manager, self.build_workers, self.lazy_lyrics)
+            self.song_data = state["song_data"]
+            return state
+        if self.lazy_lyrics:
+            return self._stream_search_state()
+        self.song_data = self.lexicon_manager.load_all_lexicons()
+        songs = self.song_data["songs"]
+        normalized = self.song_data["normalized"]
+        return {
+            "song_data": self.song_data,
+            "ngram_index": self._build_ngram_index(),
+            "inverted_index": InvertedIndex(songs, normalized=normalized),
+            "fuzzy_index": FuzzyIndex(songs, normalized=normalized),
+            "prefix_index": PrefixIndex(songs, normalized=normalized),
+            "phonetic_index": PhoneticIndex(songs, normalized=normalized)
+        }
+
+    def _stream_search_state(self):
+        """Build every index while the lexicons stream past, lyrics are not kept"""
+        ngram_index = CompactNgramIndex()
+        inverted_index = InvertedIndex(store_lyrics=False)
+        fuzzy_index = FuzzyIndex()
+        prefix_index = PrefixIndex()
+        phonetic_index = PhoneticIndex()
+        
+        def index_song(song_idx, song, normalized):
+            inverted_index.add_song(song, normalized)
+            ngram_index.add_song(song, normalized)
+            fuzzy_index.add_song(song, normalized)
+            prefix_index.add_song(song, normalized)
+            phonetic_index.add_song(song, normalized)
+            # Pending n-gram postings cost far more per entry than frozen ones
+            ngram_index.flush()
         
-        # Build search index
-        self.ngram_index = self._build_ngram_index()
+        self.song_data = self.lexicon_manager.load_all_lexicons(lazy_lyrics=True, on_song=index_song)
+        ngram_index.freeze()
+        prefix_index.freeze()
+        return {
+            "song_data": self.song_data,
+            "ngram_index": ngram_index,
+            "inverted_index": inverted_index,
+            "fuzzy_index": fuzzy_index,
+            "prefix_index": prefix_index,
+            "phonetic_index": phonetic_index
+        }
+
+    def get_lyrics(self, song):
+        """Full lyrics of a search result, read from disk for lazily loaded songs"""
+        if isinstance(song, SongRecord):
+            return song.lyric_text() or song.get('lyrics')
+        return song.get('Lyric') or song.get('lyrics')
+
+    def versions(self, song):
+        """Every version of a song, the one whose lyrics are indexed first"""
+        original = getattr(song, "version_of", None) or song
+        return [original, *(getattr(original, "versions", None) or ())]
+
+    def reload_lexicons(self):
+        """
+        Apply added, changed and removed lexicon files to the loaded indexes
+        Only the songs of those files are removed and re-indexed, a removed song
+        keeps its index as an empty slot. Returns scan_changes() output.
+        """
+        with self._index_lock:
+            song_data = self.song_data
+            changes = self.lexicon_manager.scan_changes(song_data["file_states"])
+            stale = changes["changed"] + changes["removed"]
+            fresh = changes["added"] + changes["changed"]
+            if not stale and not fresh:
+                # Touched files only need their new mtimes
+                song_data["file_states"] = changes["states"]
+                return changes
+            
+            stale_ids = [song_idx for name in stale for song_idx in song_data["sources"].pop(name, ())]
+            # The lyrics of changed files are gone from disk, rebuild them from the index first
+            normalized = self.inverted_index.normalized_songs(
+                song_idx for song_idx in stale_ids if song_data["normalized"][song_idx] is None)
+            for song_idx in stale_ids:
+                self._remove_song(song_idx, song_data["normalized"][song_idx] or normalized[song_idx])
+            removed = len(stale_ids)
+            added = 0
+            for name in fresh:
+                file_path = os.path.join(self.lexicon_manager.lexicon_dir, name)
+                song_ids = song_data["sources"][name] = []
+                for song, normalized in self.lexicon_manager.iter_songs(file_path, self.lazy_lyrics):
+                    song_ids.append(self._add_song(song, normalized))
+                    added += 1
+            
+            song_data["file_states"] = changes["states"]
+            self.ngram_index.compact()
+            self.prefix_index.freeze()
+            self.ranker.refresh()
+            self._ngram_matrix = None
+            self._semantic_index = None
+            self._transcription_prompt = None
+            self._cache_dirty = True
+            print(f"Reloaded lexicons: {added} songs added, {removed} removed")
+            self.lexicon_manager.notify_reload(song_data)
+            return changes
+
+    def _add_song(self, song, normalized):
+        song_idx = len(self.song_data["songs"])
+        self.song_data["songs"].append(song)
+        self.song_data["normalized"].append(None if self.lazy_lyrics else normalized)
+        self.inverted_index.add_song(song, normalized)
+        self.ngram_index.add_song(song, normalized)
+        self.fuzzy_index.add_song(song, normalized)
+        self.prefix_index.add_song(song, normalized)
+        self.phonetic_index.add_song(song, normalized)
+        return song_idx
+
+    def _remove_song(self, song_idx, normalized):
+        song = self.song_data["songs"][song_idx]
+        self.inverted_index.remove_song(song_idx, normalized)
+        self.ngram_index.remove_song(song_idx, song, normalized)
+        self.fuzzy_index.remove_song(song_idx)
+        self.prefix_index.remove_song(song, normalized)
+        self.phonetic_index.remove_song(song_idx, song, normalized)
+        self.song_data["songs"][song_idx] = None
+        self.song_data["normalized"][song_idx] = None
+
+    def save_search_state(self):
+        """Write reloaded indexes back to the lexicon cache, if anything changed"""
+        if not self.lexicon_cache or not self._cache_dirty:
+            return
+        with self._index_lock:
+            state = {
+                "song_data": self.song_data,
+                "ngram_index": self.ngram_index,
+                "inverted_index": self.inverted_index,
+                "fuzzy_index": self.fuzzy_index,
+                "prefix_index": self.prefix_index,
+                "phonetic_index": self.phonetic_index
+            }
+            self._save_cache(state)
+            self._cache_dirty = False
+
+    def _save_cache(self, state):
+        """
+        Write state to the lexicon cache without song_data's normalized fields
+        Each state key is its own pickle, so they would no longer share their
+        strings with the inverted index, reload_lexicons() rebuilds them from it
+        """
+        song_data = dict(state["song_data"], normalized=[None] * len(state["song_data"]["songs"]))
+        self.lexicon_cache.save(dict(state, song_data=song_data), LexiconCache.manifest_of(song_data["file_states"]))
 
     def record_audio(self, record_seconds=5):
         """Record audio using PyAudio directly"""
+        if not self.load_voice():
+            return None
         try:
+            import numpy as np
+            
             stream = self.audio.open(
                 format=self.format,
                 channels=self.channels,
@@ -40,9 +359,10 @@ class SongFinder:
             print("Listening... (speak now)")
             frames = []
             
-            for _ in range(0, int(self.sample_rate / self.chunk_size * record_seconds)):
-                data = stream.read(self.chunk_size)
-                frames.append(data)
+            with self.instrumentation.timer("voice.record"):
+                for _ in range(0, int(self.sample_rate / self.chunk_size * record_seconds)):
+                    data = stream.read(self.chunk_size)
+                    frames.append(data)
             
             print("Recording finished")
             stream.stop_stream()
@@ -58,67 +378,136 @@ class SongFinder:
             print(f"Error recording audio: {e}")
             return None
 
+    def record_audio_streaming(self, source=None, max_seconds=10, on_chunk=None):
+        """Record until the singer stops, using energy-based endpointing"""
+        from core.audio_stream import MicrophoneSource, capture_utterance
+        
+        if source is None:
+            if not self.load_voice():
+                return None
+            try:
+                source = MicrophoneSource(self.audio, self.sample_rate, self.chunk_size,
+                                          self.channels, self.format)
+            except Exception as e:
+                print(f"Error opening microphone: {e}")
+                return None
+        
+        try:
+            print("Listening... (speak now)")
+            with self.instrumentation.timer("voice.record"):
+                audio_data = capture_utterance(source, self.sample_rate, max_seconds, on_chunk=on_chunk)
+            print("Recording finished")
+            return audio_data
+        
+        except Exception as e:
+            print(f"Error recording audio: {e}")
+            return None
+        finally:
+            source.close()
+
     def load_all_lexicons(self):
         """Load all lexicons through the manager"""
         return self.lexicon_manager.load_all_lexicons()
 
     def _build_ngram_index(self, n=3):
-        """Build an n-gram index for better fuzzy matching"""
-        index = defaultdict(list)
-        for song_idx, song in enumerate(self.song_data["songs"]):
-            # Index title, artist, and first line of lyrics
-            texts_to_index = [
-                song.get('Title', ''),
-                song.get('Artist', ''),
-                song.get('Lyric', '').split('\n')[0] if song.get('Lyric') else ''
-            ]
-            
-            for text in texts_to_index:
-                text = text.lower()
-                words = re.findall(r'\w+', text)
-                for i in range(len(words) - n + 1):
-                    ngram = ' '.join(words[i:i+n])
-                    index[ngram].append(song_idx)
-        return index
+        """Build a word n-gram index over full titles, artists and lyrics"""
+        return CompactNgramIndex(self.song_data["songs"], n=n, normalized=self.song_data.get("normalized"))
 
     def _ngram_search(self, query, n=3, threshold=0.6):
         """Search using n-gram similarity"""
-        query = query.lower()
-        query_words = re.findall(r'\w+', query)
-        query_ngrams = set()
-        
-        for i in range(len(query_words) - n + 1):
-            query_ngrams.add(' '.join(query_words[i:i+n]))
+        songs = self.song_data["songs"]
+        return [songs[song_idx] for (score, song_idx) in self._ngram_scores(query, n, threshold)]
+
+    def get_ngram_matrix(self):
+        """Sparse matrix form of ngram_index, built on first use and after reloads"""
+        if self._ngram_matrix is None:
+            from core.ngram_matrix import NgramMatrix
+            self._ngram_matrix = NgramMatrix(self.ngram_index, len(self.song_data["songs"]))
+        return self._ngram_matrix
+
+    def _semantic_key(self):
+        """Identifies the song layout semantic vectors were built for"""
+        layout = [LexiconCache.manifest_of(self.song_data["file_states"]),
+                  sorted(self.song_data["sources"].items()),
+                  len(self.song_data["songs"]), self.semantic_dims, CACHE_VERSION]
+        return hashlib.sha1(json.dumps(layout).encode('utf-8')).hexdigest()
+
+    def get_semantic_index(self):
+        """LSA vectors of the current songs, from the cache directory when they match"""
+        if self._semantic_index is None:
+            from core.semantic_index import SemanticIndex
+            key = self._semantic_key()
+            prefix = None
+            if self.lexicon_cache:
+                prefix = f"{os.path.splitext(self.lexicon_cache.cache_path)[0]}-lsa{self.semantic_dims}"
+            index = SemanticIndex.load(prefix, key) if prefix else None
+            if index is None:
+                started = time.perf_counter()
+                index = SemanticIndex.build(self.inverted_index, self.semantic_dims, key=key)
+                print(f"Built semantic index in {time.perf_counter() - started:.2f}s")
+                if prefix:
+                    index.save(prefix)
+            if len(self.song_data["songs"]) >= self.semantic_lsh_songs:
+                index.enable_lsh()
+            self._semantic_index = index
+        return self._semantic_index
+
+    def _semantic_search(self, query, k=20):
+        """Songs whose LSA vector is closest to the query's"""
+        songs = self.song_data["songs"]
+        return [songs[song_idx] for score, song_idx in self.get_semantic_index().search(query, k)
+                if songs[song_idx] is not None]
+
+    def ngram_search_batch(self, queries, threshold=0.6):
+        """Stage 2 scores for many queries at once, a list of (similarity, song) lists"""
+        with self._index_lock:
+            songs = self.song_data["songs"]
+            return [[(score, songs[song_idx]) for score, song_idx in scored]
+                    for scored in self.get_ngram_matrix().search_batch(queries, threshold)]
+
+    def _ngram_scores(self, query, n=3, threshold=0.6):
+        """(similarity, song_idx) pairs above threshold, best first, ties in corpus order"""
+        if n != self.ngram_index.n:
+            raise ValueError(f"The n-gram index was built for n={self.ngram_index.n}")
+        if self.ngram_engine == "numpy":
+            return self.get_ngram_matrix().search(query, threshold)
         
-        song_matches = defaultdict(int)
-        for ngram in query_ngrams:
-            for song_idx in self.ngram_index.get(ngram, []):
-                song_matches[song_idx] += 1
+        query_keys, query_size = self.ngram_index.query_keys(query)
+        song_matches = self.ngram_index.match_counts(query_keys)
         
         # Calculate similarity scores
         results = []
         for song_idx, count in song_matches.items():
-            similarity = count / max(len(query_ngrams), 1)
+            similarity = count / max(query_size, 1)
             if similarity >= threshold:
-                results.append((similarity, self.song_data["songs"][song_idx]))
+                results.append((similarity, song_idx))
         
-        return [song for (score, song) in sorted(results, reverse=True)]
+        return sorted(results, key=lambda item: (-item[0], item[1]))
 
-    def listen_for_search(self):
-        """Capture voice input using Whisper with direct PyAudio recording"""
+    def listen_for_search(self, streaming=True, source=None):
+        """
+        Capture voice input using Whisper with direct PyAudio recording
+        streaming=True stops as soon as the singer does, source replaces the mic
+        """
+        if not self._load_for_source(source):
+            print("Voice recognition is not available")
+            return None
+        
         print("Listening for your song search...")
         
         try:
             # Record audio
-            audio_data = self.record_audio(record_seconds=5)
+            if streaming:
+                audio_data = self.record_audio_streaming(source=source)
+            else:
+                audio_data = self.record_audio(record_seconds=5)
             if audio_data is None:
                 return None
             
             print("Processing your speech with Whisper...")
             
             # Transcribe with Whisper
-            result = self.whisper_model.transcribe(audio_data, language="en")
-            query = result["text"].strip()
+            query = self.transcribe(audio_data)
             
             print(f"You said: {query}")
             return query if query else None
@@ -127,56 +516,350 @@ class SongFinder:
             print(f"Unexpected error during voice recognition: {e}")
             return None
 
-    def search_songs(self, query):
-        """Multi-stage search with exact, n-gram, and fuzzy matching"""
+    def listen_for_live_search(self, on_partial=None, source=None, step_seconds=1.0,
+                               window_seconds=8.0, max_seconds=10, max_results=500):
+        """
+        Search while the user is still singing
+        Every step_seconds the newest window_seconds of speech are transcribed
+        and searched like typed text, on_partial(text, results, final) gets each
+        new transcript with its best max_results songs, best first.
+        The full recording is transcribed once more at the end to confirm.
+        Returns (query, results), query is None if nothing was understood
+        """
+        if not self._load_for_source(source):
+            print("Voice recognition is not available")
+            return None, []
+        
+        step_samples = int(step_seconds * self.sample_rate)
+        window_samples = int(window_seconds * self.sample_rate)
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="partial-transcribe")
+        pending = None
+        last_window_end = 0
+        last_text = None
+        
+        def transcribe_partial(window):
+            nonlocal last_text
+            text = self.transcribe(window, partial=True)
+            if text and text != last_text:
+                last_text = text
+                results = self.ranked_songs(text, max_results)
+                print(f"Partial: {text} ({len(results)} results)")
+                if on_partial is not None:
+                    on_partial(text, results, False)
+        
+        def on_chunk(ring, endpointer):
+            nonlocal pending, last_window_end
+            if endpointer.speech_start is None or endpointer.finished:
+                return
+            if ring.total_written - last_window_end < step_samples:
+                return
+            # Only one partial in flight, a slow model skips windows instead of lagging
+            if pending is not None and not pending.done():
+                return
+            start = max(endpointer.speech_start, ring.total_written - window_samples)
+            last_window_end = ring.total_written
+            pending = executor.submit(transcribe_partial, ring.since(start))
+        
+        print("Listening for your song search...")
+        try:
+            audio_data = self.record_audio_streaming(source=source, max_seconds=max_seconds,
+                                                     on_chunk=on_chunk)
+            if pending is not None:
+                pending.cancel()
+            executor.shutdown(wait=True)
+            if audio_data is None:
+                return None, []
+            
+            print("Processing your speech with Whisper...")
+            query = self.transcribe(audio_data)
+            print(f"You said: {query}")
+            if not query:
+                return None, []
+            
+            results = self.ranked_songs(query, max_results)
+            if on_partial is not None:
+                on_partial(query, results, True)
+            return query, results
+        
+        except Exception as e:
+            print(f"Unexpected error during voice recognition: {e}")
+            return None, []
+        finally:
+            executor.shutdown(wait=False)
+
+    def transcribe(self, audio_data, partial=False):
+        """Transcribe float32 16 kHz audio, partial windows always use fast greedy decoding"""
+        name = "transcribe.partial" if partial else "transcribe"
+        transcriber = self.load_transcriber()
+        prompt = self.transcription_prompt()
+        started = time.perf_counter()
+        if partial:
+            text = self.instrumentation.profiled(transcriber.transcribe, audio_data, True, prompt, False)
+        else:
+            text = self.instrumentation.profiled(transcriber.transcribe, audio_data, self.greedy_decoding, prompt)
+        elapsed = time.perf_counter() - started
+        
+        audio_seconds = len(audio_data) / self.sample_rate
+        self.instrumentation.record(name, elapsed)
+        self.instrumentation.record_event({"transcription": name, "text": text, "ms": elapsed * 1000,
+                                           "audio_seconds": audio_seconds,
+                                           "realtime_factor": elapsed / audio_seconds if audio_seconds else None})
+        return text
+
+    def transcribe_batch(self, clips, batch_size=8):
+        """
+        Transcripts of many float32 16 kHz clips from one model instance
+        Clips up to 30 seconds are padded to Whisper's window and decoded batch_size
+        at a time in one forward pass, longer ones go through transcribe()
+        """
+        transcriber = self.load_transcriber()
+        prompt = self.transcription_prompt()
+        transcripts = [None] * len(clips)
+        short = [clip_idx for clip_idx, clip in enumerate(clips) if len(clip) <= transcriber.max_batch_samples]
+        for start in range(0, len(short), batch_size):
+            batch = short[start:start + batch_size]
+            with self.instrumentation.timer("transcribe.batch"):
+                texts = self.instrumentation.profiled(transcriber.transcribe_batch,
+                                                      [clips[clip_idx] for clip_idx in batch], prompt)
+            for clip_idx, text in zip(batch, texts):
+                transcripts[clip_idx] = text
+        
+        for clip_idx, clip in enumerate(clips):
+            if transcripts[clip_idx] is None:
+                transcripts[clip_idx] = self.transcribe(clip)
+        return transcripts
+
+    def search_songs(self, query, limit=None):
+        """
+        Multi-stage search with exact, n-gram, phonetic, semantic (when enabled) and fuzzy matching
+        limit caps the number of songs returned, results are cached per normalized query
+        Versions of a song (remixes, live cuts) come back once, as the original
+        """
+        query = normalize_query(query or "")
         if not query:
             return []
+        return list(self._cached_search("search_songs", ("songs", query, limit), self._search_songs, query, limit))
+
+    def _cached_search(self, name, key, search, query, *args):
+        """
+        Serve a search from the query cache or run it, recording its timing,
+        the stage that answered and per-stage details in self.instrumentation
+        """
+        started = time.perf_counter()
+        results = self.query_cache.get(key)
+        trace = {}
+        if results is None:
+            with self._index_lock:
+                results = self.instrumentation.profiled(search, query, *args, trace)
+                self.query_cache.put(key, results)
+        elapsed = time.perf_counter() - started
         
-        query = query.lower()
-        results = []
+        stage = trace.get("answered_by", "cache")
+        self.instrumentation.record(name, elapsed)
+        self.instrumentation.count(f"{name}.answered_by.{stage}")
+        self.instrumentation.record_event({"search": name, "query": query, "answered_by": stage,
+                                           "results": len(results), "ms": elapsed * 1000,
+                                           "stages": trace.get("stages", {})})
+        return results
+
+    def _run_stage(self, trace, name, fn, *args):
+        """fn(*args) as one traced search stage"""
+        started = time.perf_counter()
+        results = fn(*args)
+        elapsed = time.perf_counter() - started
+        self.instrumentation.record(f"stage.{name}", elapsed)
+        trace.setdefault("stages", {})[name] = {"ms": elapsed * 1000, "results": len(results)}
+        if results:
+            trace["answered_by"] = name
+        return results
+
+    def exact_matches(self, query, limit=None, stats=None):
+        """Inverted index search, lazily loaded lyrics are checked against the file on disk"""
+        return self.inverted_index.search(query, limit, stats, self._unstored_text)
+
+    def _unstored_text(self, song_idx, field):
+        """Normalized text of a field the inverted index does not keep"""
+        song = self.song_data["songs"][song_idx]
+        text = song.lyric_text() if field == "Lyric" and isinstance(song, SongRecord) else song.get(field)
+        return normalize_text(text or "")
+
+    def _search_songs(self, query, limit=None, trace=None):
+        """
+        The uncached search stages for an already normalized query
+        trace, when given, collects per-stage timings and the answering stage
+        """
+        trace = {} if trace is None else trace
+        trace["answered_by"] = "none"
         
-        # Stage 1: Exact matches
-        for song in self.song_data["songs"]:
-            if (query in song.get("Title", "").lower() or 
-                query in song.get("Artist", "").lower() or 
-                query in song.get("Lyric", "").lower()):
-                results.append(song)
+        # Stage 1: Exact matches through the inverted index
+        songs = self.song_data["songs"]
+        index_stats = {}
+        results = self._run_stage(trace, "exact", self._exact_songs, query, limit, index_stats)
+        trace["stages"]["exact"]["candidates"] = index_stats.get("candidates")
         
         if results:
             return results
         
         # Stage 2: N-gram matching
-        ngram_results = self._ngram_search(query)
+        ngram_results = self._run_stage(trace, "ngram", self._ngram_search, query)
         if ngram_results:
-            return ngram_results
-        
-        # Stage 3: Fuzzy matching
-        all_terms = []
-        song_map = {}
-        for song in self.song_data["songs"]:
-            terms = [
-                song.get("Title", "").lower(),
-                song.get("Artist", "").lower(),
-                *song.get("Lyric", "").lower().split()[:10]
-            ]
-            for term in terms:
-                if term:  # Skip empty terms
-                    all_terms.append(term)
-                    song_map[term] = song
-        
-        close_matches = get_close_matches(query, all_terms, n=10, cutoff=0.3)
+            return self._collapse_songs(ngram_results, limit)
+        
+        # Stage 3: Sound-alike matching, for transcripts Whisper misheard
+        phonetic_results = self._run_stage(trace, "phonetic", self.phonetic_index.search, query)
+        if phonetic_results:
+            return self._collapse_songs([songs[song_idx] for score, song_idx in phonetic_results], limit)
+        
+        # Stage 4: Paraphrased lines, closest LSA vectors
+        if self.semantic:
+            semantic_results = self._run_stage(trace, "semantic", self._semantic_search, query)
+            if semantic_results:
+                return self._collapse_songs(semantic_results, limit)
+        
+        # Stage 5: Fuzzy matching against the precomputed vocabulary
+        fuzzy_results = self._run_stage(trace, "fuzzy", self._fuzzy_matches, query)
+        return self._collapse_songs([song for (score, song) in fuzzy_results], limit)
+
+    def _exact_songs(self, query, limit=None, stats=None):
+        """Songs containing query, each version group once, verifying more candidates until limit groups are found"""
+        songs = self.song_data["songs"]
+        fetch = limit
+        while True:
+            matches = self.exact_matches(query, fetch, stats)
+            results = self._collapse_songs([songs[song_idx] for song_idx in matches], limit)
+            if fetch is None or len(matches) < fetch or len(results) >= limit:
+                return results
+            fetch *= 4
+
+    @staticmethod
+    def _collapse_versions(scored, limit=None):
+        """
+        (score, song) pairs, best first, with each version group once
+        A group takes the rank of its best member and is shown as the original
+        song, versions() lists the rest
+        """
+        seen = set()
+        results = []
+        for score, song in scored:
+            original = getattr(song, "version_of", None) or song
+            if id(original) in seen:
+                continue
+            seen.add(id(original))
+            results.append((score, original))
+            if limit is not None and len(results) >= limit:
+                break
+        return results
+
+    def _collapse_songs(self, songs, limit=None):
+        """Songs, best first, with each version group once"""
+        return [song for _, song in self._collapse_versions(((None, song) for song in songs), limit)]
+
+    def _fuzzy_matches(self, query, n=10, cutoff=0.3):
+        """(ratio, song) pairs from the fuzzy index, one per Title/Artist"""
+        songs = self.song_data["songs"]
         seen_songs = set()
         results = []
-        for match in close_matches:
-            song = song_map[match]
+        for score, term, song_idx in self.fuzzy_index.lookup(query, n=n, cutoff=cutoff):
+            song = songs[song_idx]
             song_id = f"{song.get('Title', '')}_{song.get('Artist', '')}"
             if song_id not in seen_songs:
-                results.append(song)
+                results.append((score, song))
                 seen_songs.add(song_id)
-        
         return results
+
+    def search_ranked(self, query, k=10):
+        """
+        Top k (score, song) pairs, best first
+        BM25F over the inverted index with Title/Artist boosts. When the query
+        never occurs as typed, phonetic and semantic (when enabled) similarity
+        are blended in, so a misheard or paraphrased line of known words still
+        finds its song. Queries with no known word fall back to n-gram
+        similarity, phonetic similarity and then fuzzy ratio. Each version group
+        is ranked once, as its original.
+        """
+        query = normalize_query(query or "")
+        if not query:
+            return []
+        
+        return list(self._cached_search("search_ranked", ("ranked", query, k), self._search_ranked, query, k))
+
+    def _search_ranked(self, query, k, trace=None):
+        """Uncached ranked search for an already normalized query"""
+        trace = {} if trace is None else trace
+        trace["answered_by"] = "none"
+        songs = self.song_data["songs"]
+        scores = self._run_stage(trace, "bm25", self.ranker.score_all, query)
+        if scores:
+            if not self.exact_matches(query, 1):
+                scores = self._blend_scores(trace, query, scores, k)
+            # Best first without sorting every match, only until k version groups are found
+            heap = [(-score, song_idx) for song_idx, score in scores.items()]
+            heapq.heapify(heap)
+            best = (heapq.heappop(heap) for _ in range(len(heap)))
+            return self._collapse_versions(((-score, songs[song_idx]) for score, song_idx in best), k)
+        
+        ngram_scores = self._run_stage(trace, "ngram", self._ngram_scores, query)
+        if ngram_scores:
+            return self._collapse_versions(((score, songs[song_idx]) for score, song_idx in ngram_scores), k)
+        
+        phonetic_scores = self._run_stage(trace, "phonetic", self.phonetic_index.search, query)
+        if phonetic_scores:
+            return self._collapse_versions(((score, songs[song_idx]) for score, song_idx in phonetic_scores), k)
+        
+        return self._collapse_versions(self._run_stage(trace, "fuzzy", self._fuzzy_matches, query, k), k)
+
+    def _blend_scores(self, trace, query, scores, k):
+        """
+        BM25 scores scaled to the best one, plus each song's weighted phonetic
+        and, when enabled, semantic score
+        Every query word is known but the query never occurs as typed, as in a
+        misheard ("die no might") or paraphrased line. BM25 then ranks whatever
+        shares a word with it, while a song sounding like most of the query
+        overtakes them. Without such a song, LSA cosine similarity is added.
+        """
+        best = max(scores.values())
+        blended = {song_idx: score / best for song_idx, score in scores.items()}
+        stages = [("phonetic", PHONETIC_WEIGHT, self.phonetic_index.search)]
+        if self.semantic:
+            stages.append(("semantic", SEMANTIC_WEIGHT, self.get_semantic_index().search))
+        bonuses = {}
+        for name, weight, search in stages:
+            # A line that sounds like a song is not also searched by meaning
+            if bonuses:
+                break
+            for score, song_idx in self._run_stage(trace, name, search, query)[:k]:
+                blended[song_idx] = blended.get(song_idx, 0.0) + weight * score
+                bonuses.setdefault(song_idx, {})[name] = weight * score
+        # Credit the top song to whichever part of its score is largest
+        top = top_scores(blended, 1)[0][1]
+        parts = dict(bonuses.get(top, {}), bm25=blended[top] - sum(bonuses.get(top, {}).values()))
+        trace["answered_by"] = max(parts, key=parts.get)
+        return blended
+
+    def stats(self):
+        """Instrumentation and query cache statistics, JSON ready"""
+        stats = self.instrumentation.stats()
+        stats["query_cache"] = self.query_cache.stats()
+        return stats
+
+    def suggest(self, prefix, k=8):
+        """Type-ahead (text, kind) completions of a partly typed query, kind is title/artist/lyric"""
+        started = time.perf_counter()
+        # No _index_lock, the prefix index serves its last frozen snapshot while reloads run
+        suggestions = self.prefix_index.suggest(prefix, k)
+        self.instrumentation.record("suggest", time.perf_counter() - started)
+        return suggestions
+
+    def ranked_songs(self, query, k=10):
+        """The songs of search_ranked() without their scores, what typed and voice searches show"""
+        return [song for score, song in self.search_ranked(query, k)]
+
+    def search_page(self, query, offset=0, limit=50, max_results=500):
+        """One page of ranked results and the number of results, at most max_results"""
+        results = self.ranked_songs(query, max_results)
+        return results[offset:offset + limit], len(results)
     
     def __del__(self):
         """Clean up PyAudio resources"""
-        if hasattr(self, 'audio'):
+        if getattr(self, 'audio', None) is not None:
             self.audio.terminate()
\ No newline at end of file
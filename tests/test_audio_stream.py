@@ -0,0 +1,72 @@
+import threading
+import wave
+
+import numpy as np
+
+from core.audio_stream import EnergyEndpointer, MicrophoneSource, WavFileSource, capture_utterance
+
+RATE = 16000
+
+
+def write_wav(path, *parts):
+    """16-bit mono WAV of (seconds, amplitude) parts, a 220 Hz tone where amplitude > 0"""
+    pieces = []
+    for seconds, amplitude in parts:
+        t = np.arange(int(seconds * RATE)) / RATE
+        pieces.append(amplitude * np.sin(2 * np.pi * 220 * t))
+    samples = (np.concatenate(pieces) * 32767).astype(np.int16)
+    with wave.open(str(path), 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes(samples.tobytes())
+
+
+def test_utterance_is_cut_after_trailing_silence(tmp_path):
+    path = tmp_path / "sung.wav"
+    write_wav(path, (1.0, 0.0), (1.5, 0.3), (3.0, 0.0))
+    endpointer = EnergyEndpointer(RATE, silence_seconds=0.8)
+    audio = capture_utterance(WavFileSource(str(path), RATE, chunk_size=1024), RATE,
+                              endpointer=endpointer, pre_roll_seconds=0.3)
+
+    assert endpointer.reason == "endpoint"
+    assert abs(endpointer.speech_start - 1.0 * RATE) <= 1024
+    # Pre-roll, the speech and the 0.8 s of silence that ended it, not the rest of the file
+    assert abs(len(audio) - (0.3 + 1.5 + 0.8) * RATE) <= 3 * 1024
+
+
+def test_silence_only_returns_none(tmp_path):
+    path = tmp_path / "silent.wav"
+    write_wav(path, (6.0, 0.0))
+    endpointer = EnergyEndpointer(RATE, no_speech_seconds=5.0)
+    assert capture_utterance(WavFileSource(str(path), RATE), RATE, endpointer=endpointer) is None
+    assert endpointer.reason == "no_speech"
+
+
+class SilentStream:
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class SilentAudio:
+    def open(self, **kwargs):
+        return SilentStream()
+
+
+def test_microphone_close_stops_a_stalled_stream():
+    source = MicrophoneSource(SilentAudio(), poll_seconds=0.01, stall_seconds=60)
+    chunks = []
+    reader = threading.Thread(target=lambda: chunks.extend(source))
+    reader.start()
+    source.close()
+    reader.join(timeout=2)
+    assert not reader.is_alive()
+    assert chunks == []
+
+
+def test_microphone_stall_ends_iteration():
+    source = MicrophoneSource(SilentAudio(), poll_seconds=0.01, stall_seconds=0.05)
+    assert list(source) == []
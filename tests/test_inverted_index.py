@@ -0,0 +1,64 @@
+from core.inverted_index import InvertedIndex
+from core.normalize import SEARCH_FIELDS, normalize_query, normalize_text
+
+SONGS = [
+    {"Title": "Morning Light", "Artist": "The Examples",
+     "Lyric": "Wake up, the morning light\nis calling you home\nDon't stop now"},
+    {"Title": "Night Drive", "Artist": "Sample Band",
+     "Lyric": "Driving all night\nthe city lights are calling\nwake up wake up"},
+    {"Title": "Don't Stop", "Artist": "The Examples",
+     "Lyric": "Hey, you! Don't stop the music\nplay it all night long"},
+]
+
+
+def substring_scan(songs, query):
+    """The exact stage before the index: every normalized field scanned in turn"""
+    query = normalize_query(query)
+    return [song_idx for song_idx, song in enumerate(songs)
+            if any(query in normalize_text(song.get(field, "") or "") for field in SEARCH_FIELDS)]
+
+
+def test_search_matches_substring_scan():
+    index = InvertedIndex(SONGS)
+    queries = [
+        "wake up",                   # a line start
+        "light is calling",          # runs across a line break
+        "hey, you! don't",           # punctuation inside the phrase
+        "ight drive",                # cut off at both ends
+        "the music play",            # line break and cut-off words
+        "calling you home tonight",  # absent
+    ]
+    for query in queries:
+        assert index.search(query) == substring_scan(SONGS, query), query
+
+
+def test_absent_phrase_finds_nothing():
+    assert InvertedIndex(SONGS).search("calling you home tonight") == []
+
+
+def test_removed_song_is_not_found():
+    index = InvertedIndex(SONGS)
+    index.remove_song(0)
+    assert index.search("wake up") == [1]
+
+
+def test_unstored_lyrics_are_loaded_to_verify():
+    index = InvertedIndex(SONGS, store_lyrics=False)
+    loaded = []
+
+    def load_text(song_idx, field):
+        loaded.append(song_idx)
+        return normalize_text(SONGS[song_idx][field])
+
+    assert index.search("hey, you! don't", load_text=load_text) == [2]
+    assert loaded == [2]
+    assert index.search("night drive", load_text=load_text) == [1]
+
+
+def test_unstored_lyric_is_rebuilt_for_removal():
+    index = InvertedIndex(SONGS, store_lyrics=False)
+    lyric = index.normalized_songs([2])[2]["Lyric"]
+    assert lyric.tokens == ["hey", "you", "don", "t", "stop", "the", "music", "play", "it", "all", "night", "long"]
+    index.remove_song(2)
+    assert "hey" not in index.postings and 2 not in index.postings["night"]
+    assert index.search("night", load_text=lambda song_idx, field: normalize_text(SONGS[song_idx][field])) == [1]
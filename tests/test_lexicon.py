@@ -0,0 +1,60 @@
+import json
+import os
+
+from core.inverted_index import InvertedIndex
+from core.lexicon import LexiconManager
+
+CHORUS = ("we run through the city lights tonight and never look back at the fading sky "
+          "hold on to the feeling while the music plays and the night is young")
+SONGS = [
+    {"Title": "City Lights", "Artist": "Night Owls", "Lyric": CHORUS + " " + CHORUS},
+    {"Title": "City Lights (Live)", "Artist": "Night Owls",
+     "Lyric": CHORUS + " thank you all for singing with us " + CHORUS},
+    {"Title": "Other Song", "Artist": "Night Owls", "Lyric": "something else entirely for the record"},
+]
+
+
+def load(tmp_path):
+    (tmp_path / "night_owls.json").write_text(json.dumps(SONGS))
+    return LexiconManager(str(tmp_path)).load_all_lexicons()
+
+
+def test_live_cut_is_a_version_with_its_own_lyric(tmp_path):
+    songs = load(tmp_path)["songs"]
+    original, live, other = songs
+    assert live.version_of is original
+    assert other.version_of is None
+    # Stored as edits of the original's lyric, read back whole
+    assert live.lyric is None and live.lyric_delta is not None
+    assert live["Lyric"] == SONGS[1]["Lyric"]
+    assert live.lyric_text() == SONGS[1]["Lyric"]
+
+
+def test_line_unique_to_a_version_finds_that_version(tmp_path):
+    song_data = load(tmp_path)
+    index = InvertedIndex(song_data["songs"], normalized=song_data["normalized"])
+    assert index.search("thank you all for singing") == [1]
+    # Words around the live-only line never run together in any song
+    assert index.search("night is young thank") == [1]
+    assert index.search("tonight thank you") == []
+
+
+def test_scan_changes_sees_added_changed_and_removed_files(tmp_path):
+    manager = LexiconManager(str(tmp_path))
+    (tmp_path / "night_owls.json").write_text(json.dumps(SONGS))
+    (tmp_path / "gone.json").write_text(json.dumps(SONGS[2:]))
+    states = manager.load_all_lexicons()["file_states"]
+    assert manager.scan_changes(states) == {"added": [], "changed": [], "removed": [], "states": states}
+
+    (tmp_path / "night_owls.json").write_text(json.dumps(SONGS[:2]))
+    (tmp_path / "new.json").write_text(json.dumps(SONGS[2:]))
+    os.remove(tmp_path / "gone.json")
+    changes = manager.scan_changes(states)
+    assert (changes["added"], changes["changed"], changes["removed"]) == (["new.json"], ["night_owls.json"], ["gone.json"])
+    assert sorted(changes["states"]) == ["new.json", "night_owls.json"]
+
+    # A touch without an edit moves the mtime but not the hash
+    stat = os.stat(tmp_path / "new.json")
+    os.utime(tmp_path / "new.json", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    changes = manager.scan_changes(changes["states"])
+    assert (changes["added"], changes["changed"], changes["removed"]) == ([], [], [])
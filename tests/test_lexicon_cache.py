@@ -0,0 +1,44 @@
+import json
+import multiprocessing
+import os
+
+from core.lexicon_cache import LexiconCache
+
+
+def test_sections_load_on_first_access(tmp_path):
+    (tmp_path / "songs.json").write_text(json.dumps([{"Title": "One", "Lyric": "la la"}]))
+    cache = LexiconCache(str(tmp_path))
+    cache.save({"song_data": {"songs": ["one"]}, "inverted_index": {"la": [0]}})
+
+    state = cache.load()
+    assert list(state) == ["song_data", "inverted_index"]
+    assert state["song_data"] == {"songs": ["one"]}
+    assert list(state.loaded) == ["song_data"]
+    assert state["inverted_index"] == {"la": [0]}
+    # Every section read, the file is no longer mapped
+    assert state.mm is None
+
+
+def test_changed_lexicon_invalidates_cache(tmp_path):
+    lexicon = tmp_path / "songs.json"
+    lexicon.write_text(json.dumps([{"Title": "One"}]))
+    cache = LexiconCache(str(tmp_path))
+    cache.save({"song_data": {}})
+    lexicon.write_text(json.dumps([{"Title": "One"}, {"Title": "Two"}]))
+    assert cache.load() is None
+
+
+def save_songs(lexicon_dir):
+    LexiconCache(lexicon_dir).save({"song_data": {"songs": [f"song {i}" for i in range(200000)]}})
+
+
+def test_concurrent_saves_each_write_their_own_file(tmp_path, capfd):
+    (tmp_path / "songs.json").write_text(json.dumps([{"Title": "One"}]))
+    # Server workers compiling a cold cache at the same time
+    with multiprocessing.get_context("spawn").Pool(4) as pool:
+        pool.map(save_songs, [str(tmp_path)] * 8)
+    assert "Error" not in capfd.readouterr().out
+
+    cache = LexiconCache(str(tmp_path))
+    assert cache.load()["song_data"]["songs"][-1] == "song 199999"
+    assert os.listdir(os.path.dirname(cache.cache_path)) == [os.path.basename(cache.cache_path)]
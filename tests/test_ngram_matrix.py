@@ -0,0 +1,35 @@
+from core.ngram_matrix import NgramMatrix
+from core.ngram_postings import CompactNgramIndex
+
+SONGS = [
+    {"Title": "River Song", "Artist": "Blue Lake", "Lyric": "down by the river we sang all night long"},
+    {"Title": "Night Long", "Artist": "Blue Lake", "Lyric": "we sang all night long and then some"},
+    {"Title": "Quiet", "Artist": "Stillwater", "Lyric": "nothing here but quiet"},
+    {"Title": "Echo", "Artist": "Stillwater", "Lyric": "down by the river down by the river"},
+]
+QUERIES = ["we sang all night long", "down by the river", "nothing here at all", "no such words anywhere"]
+
+
+def python_scores(index, query, threshold):
+    """Stage 2 as SongFinder._ngram_scores computes it without NumPy"""
+    keys, size = index.query_keys(query)
+    results = [(count / max(size, 1), song_idx) for song_idx, count in index.match_counts(keys).items()
+               if count / max(size, 1) >= threshold]
+    return sorted(results, key=lambda item: (-item[0], item[1]))
+
+
+def test_batch_matches_python_scoring():
+    index = CompactNgramIndex(SONGS)
+    matrix = NgramMatrix(index, len(SONGS))
+    for threshold in (0.3, 0.6):
+        expected = [python_scores(index, query, threshold) for query in QUERIES]
+        assert matrix.search_batch(QUERIES, threshold, batch_size=3) == expected
+    assert matrix.search("no such words anywhere") == []
+
+
+def test_counts_are_sparse():
+    matrix = NgramMatrix(CompactNgramIndex(SONGS), len(SONGS))
+    query_ids, song_ids, counts, _ = matrix.score_counts(QUERIES)
+    # Only pairs sharing an n-gram, never a dense queries x songs block
+    assert len(counts) < len(QUERIES) * len(SONGS)
+    assert (counts > 0).all()
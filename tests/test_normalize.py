@@ -0,0 +1,21 @@
+from core.normalize import normalize_query, normalize_song, normalize_text
+
+
+def test_width_spacing_and_apostrophe_variants_normalize_alike():
+    expected = "don't stop me now"
+    for text in ("Don't Stop Me Now", "ＤＯＮ'Ｔ ＳＴＯＰ ＭＥ ＮＯＷ", "don't\u2005stop\u2005me\u3000now",
+                 "Don\u2019t stop  me\tnow", "don\u02bct sto\u200bp me now"):
+        assert normalize_text(text) == expected, text
+
+
+def test_query_trims_edge_punctuation_only():
+    assert normalize_query("...don't stop me now?") == "don't stop me now"
+    assert normalize_query(" (Don\u2019t stop me now!) ") == "don't stop me now"
+    assert normalize_query("?!") == ""
+
+
+def test_song_fields_are_tokenized_after_normalizing():
+    normalized = normalize_song({"Title": "Ｄｏｎ\u2019ｔ Stop", "Artist": None, "Lyric": "tonight\u2005I'm"})
+    assert normalized["Title"] == ("don't stop", ["don", "t", "stop"])
+    assert normalized["Artist"] == ("", [])
+    assert normalized["Lyric"].tokens == ["tonight", "i", "m"]
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from song_finder import SongFinder
+
+LEXICONS = {
+    "bts.json": [
+        {"Title": "Dynamite", "Artist": "BTS",
+         "Lyric": "cause I'm in the stars tonight so watch me bring the fire and set the night alight"},
+        {"Title": "Butter", "Artist": "BTS", "Lyric": "smooth like butter like a criminal undercover gon' pop like trouble"},
+    ],
+    "billie_eilish.json": [
+        {"Title": "No Time To Die", "Artist": "Billie Eilish",
+         "Lyric": "I should have known I'd leave alone no time to die it might be a lie"},
+        {"Title": "Bad Guy", "Artist": "Billie Eilish",
+         "Lyric": "white shirt now red my bloody nose sleeping you're on your tippy toes"},
+    ],
+    "queen.json": [
+        {"Title": "Don't Stop Me Now", "Artist": "Queen",
+         "Lyric": "tonight I'm gonna have myself a real good time I feel alive"},
+        {"Title": "Somebody To Love", "Artist": "Queen",
+         "Lyric": "can anybody find me somebody to love each morning I get up I die a little"},
+    ],
+}
+QUERIES = ["dynamite", "die no might", "smooth criminal", "somebody to love", "tonight",
+           "in the stars tonight so watch me", "can anybody find me somebody", "bad gai"]
+
+
+def build(lexicon_dir, build_workers, lazy_lyrics):
+    return SongFinder(enable_voice=False, use_cache=False, lexicon_dir=str(lexicon_dir),
+                      build_workers=build_workers, lazy_lyrics=lazy_lyrics)
+
+
+@pytest.mark.parametrize("lazy_lyrics", [False, True])
+def test_parallel_build_matches_the_serial_build(tmp_path, lazy_lyrics):
+    for name, songs in LEXICONS.items():
+        (tmp_path / name).write_text(json.dumps(songs))
+    serial = build(tmp_path, 1, lazy_lyrics)
+    parallel = build(tmp_path, 2, lazy_lyrics)
+
+    assert [song["Title"] for song in parallel.song_data["songs"]] == [
+        song["Title"] for song in serial.song_data["songs"]]
+    assert parallel.song_data["sources"] == serial.song_data["sources"]
+    assert parallel.inverted_index.postings == serial.inverted_index.postings
+    assert parallel.fuzzy_index.term_songs == serial.fuzzy_index.term_songs
+    for query in QUERIES:
+        assert parallel._ngram_scores(query, threshold=0.3) == serial._ngram_scores(query, threshold=0.3), query
+        assert parallel.fuzzy_index.lookup(query) == serial.fuzzy_index.lookup(query), query
+        assert parallel.phonetic_index.search(query) == serial.phonetic_index.search(query), query
+        assert parallel.search_songs(query) == serial.search_songs(query), query
+    # Each stage had something to compare
+    assert serial._ngram_scores("in the stars tonight so watch me", threshold=0.3)
+    assert serial.fuzzy_index.lookup("bad gai")
+    assert serial.phonetic_index.search("die no might")
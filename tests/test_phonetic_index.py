@@ -0,0 +1,45 @@
+from core.phonetic_index import PhoneticIndex, phonetic_code
+
+SONGS = [
+    {"Title": "Dynamite", "Artist": "BTS",
+     "Lyric": "shoes on get up in the morn cup of milk let's rock and roll"},
+    {"Title": "Dynamite (Remix)", "Artist": "BTS", "Lyric": "light it up like dynamite"},
+    {"Title": "Successful", "Artist": "Ariana Grande",
+     "Lyric": "it feels so good to be so young and have this fun and be successful"},
+    {"Title": "Fire", "Artist": "BTS", "Lyric": "burn it up, under the stars tonight we sing, tonight bring it home"},
+]
+FILLER = ("we walk along the river under a pale moon while the city sleeps and the trains go by "
+          "every window holds a story nobody reads and the wind keeps humming a quiet melody")
+
+
+def test_c_is_hard_after_s_and_soft_before_e_i_y():
+    assert phonetic_code("school") == phonetic_code("skool") == "SKL"
+    assert phonetic_code("schedule") == "SKTL"
+    assert phonetic_code("church") == "XRX"
+    assert phonetic_code("scene") == phonetic_code("seen") == "SN"
+    assert phonetic_code("crash") == "KRX"
+
+
+def test_short_query_matches_titles_sounding_the_same():
+    index = PhoneticIndex(SONGS)
+    assert index.search("dinamite") == [(1.0, 0)]
+
+
+def test_short_garbage_query_finds_nothing():
+    index = PhoneticIndex(SONGS)
+    # SKSF opens "successful" but is the whole of no title
+    assert index.search("xqzv") == []
+    assert index.search("zq") == []
+
+
+def test_misheard_line_is_found():
+    index = PhoneticIndex(SONGS)
+    assert index.search("shoes on get up in the mourn cup of milk")[0][1] == 0
+
+
+def test_long_lyric_needs_a_closer_match():
+    # Eight of the ten grams, across "stars tonight" and "tonight bring"
+    query = "stars tonight bring fire"
+    assert PhoneticIndex(SONGS).search(query) == [(0.8, 3)]
+    long_fire = dict(SONGS[3], Lyric=SONGS[3]["Lyric"] + " " + FILLER)
+    assert PhoneticIndex(SONGS[:3] + [long_fire]).search(query) == []
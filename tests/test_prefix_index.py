@@ -0,0 +1,75 @@
+from core.prefix_index import PrefixIndex
+
+SONGS = [
+    {"Title": "Dynamite", "Artist": "BTS", "Lyric": "cause I'm in the stars tonight"},
+    {"Title": "Dynamite (EDM Remix)", "Artist": "BTS", "Lyric": "cause I'm in the stars tonight"},
+    {"Title": "Dynasty", "Artist": "MIIA", "Lyric": "all I gave you is gone"},
+    {"Title": "Dance Monkey", "Artist": "Tones and I", "Lyric": "they say oh my god I see the way you shine"},
+    {"Title": "Dancing Queen", "Artist": "ABBA", "Lyric": "you can dance you can jive"},
+    {"Title": "Don't Start Now", "Artist": "Dua Lipa", "Lyric": "if you don't wanna see me"},
+    {"Title": "Levitating", "Artist": "Dua Lipa", "Lyric": "you want me I want you baby"},
+    {"Title": "Physical", "Artist": "Dua Lipa", "Lyric": "common love isn't for us"},
+    {"Title": "Drivers License", "Artist": "Olivia Rodrigo", "Lyric": "I got my driver's license last week"},
+    {"Title": "Dreams", "Artist": "Fleetwood Mac", "Lyric": "now here you go again"},
+    {"Title": "Daylight", "Artist": "Harry Styles", "Lyric": "if I could fly"},
+]
+DYNAMO = {"Title": "Dynamo", "Artist": "BTS", "Lyric": "cause I'm in the stars"}
+
+
+def texts(suggestions):
+    return [text for text, _ in suggestions]
+
+
+def brute_force(index, prefix, k):
+    prefix = index.normalize_prefix(prefix)
+    matches = [text for text in index.entries if text.startswith(prefix)]
+    return sorted(matches, key=lambda text: (-sum(index.entries[text]), text))[:k]
+
+
+def test_completions_come_heaviest_first_at_every_node():
+    index = PrefixIndex(SONGS, k=3)
+    # Three Dua Lipa songs outweigh any one title, equal weights keep sorted order
+    assert index.suggest("d") == [("dua lipa", "artist"), ("dance monkey", "title"),
+                                  ("dancing queen", "title")]
+    assert texts(index.suggest("dyna")) == ["dynamite", "dynamite edm remix", "dynasty"]
+    assert texts(index.suggest("dyna", k=1)) == ["dynamite"]
+    # Both BTS songs open on the same line
+    assert index.suggest("cause") == [("cause i m in the", "lyric")]
+    assert index.snapshot.top
+    prefixes = {text[:end] for text in index.entries for end in range(1, len(text) + 1)}
+    for prefix in prefixes:
+        assert texts(index.suggest(prefix)) == brute_force(index, prefix, 3), prefix
+
+
+def test_prefixes_are_normalized_like_the_completions():
+    index = PrefixIndex(SONGS)
+    expected = index.suggest("dyn")
+    assert expected
+    assert index.suggest("DYN") == expected
+    assert index.suggest("ｄｙｎ") == expected
+    assert index.suggest("Don’t st") == index.suggest("don't st") == [("don t start now", "title")]
+    # A trailing space keeps the typed word whole
+    assert texts(index.suggest("dynamite ")) == ["dynamite edm remix"]
+
+
+def test_empty_and_unknown_prefixes_suggest_nothing():
+    index = PrefixIndex(SONGS)
+    assert index.suggest("") == []
+    assert index.suggest("  ") == []
+    assert index.suggest("zzz") == []
+    assert PrefixIndex().suggest("d") == []
+
+
+def test_refrozen_index_matches_a_fresh_build():
+    index = PrefixIndex(SONGS, k=3)
+    before = index.suggest("dyna")
+    index.remove_song(SONGS[0])
+    index.add_song(DYNAMO)
+    # Readers keep the last frozen snapshot until freeze()
+    assert index.suggest("dyna") == before
+    index.freeze()
+    fresh = PrefixIndex(SONGS[1:] + [DYNAMO], k=3)
+    assert index.entries == fresh.entries
+    for prefix in ("d", "dyna", "dynamite", "cause", "bts"):
+        assert index.suggest(prefix) == fresh.suggest(prefix)
+    assert texts(index.suggest("dyna")) == ["dynamite edm remix", "dynamo", "dynasty"]
@@ -0,0 +1,26 @@
+from core.query_cache import QueryCache
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = QueryCache(max_size=2)
+    cache.put("a", [1])
+    cache.put("b", [2])
+    # Reading "a" makes "b" the oldest
+    assert cache.get("a") == [1]
+    cache.put("c", [3])
+    assert cache.get("b") is None
+    assert cache.get("a") == [1] and cache.get("c") == [3]
+    # Putting an existing key refreshes it too
+    cache.put("a", [4])
+    cache.put("d", [5])
+    assert list(cache.entries) == ["a", "d"]
+    assert cache.stats()["evictions"] == 2
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_clear_drops_every_entry():
+    cache = QueryCache()
+    cache.put("a", [1])
+    cache.clear()
+    assert len(cache) == 0 and cache.get("a") is None
+    assert cache.stats()["invalidations"] == 1
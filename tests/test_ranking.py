@@ -0,0 +1,39 @@
+from core.fuzzy_index import FuzzyIndex
+from core.inverted_index import InvertedIndex
+from core.ranking import BM25Ranker
+
+SONGS = [
+    {"Title": "Rainy Days", "Artist": "Cloud Choir",
+     "Lyric": "the sky is grey and the road is long\nwe walk on through the rain"},
+    {"Title": "Golden Road", "Artist": "Cloud Choir",
+     "Lyric": "the road is long the road is wide\nwe sing along the way"},
+    {"Title": "Paper Boats", "Artist": "Harbor Lights",
+     "Lyric": "paper boats on a river of rain\nthe water takes them away for days and days"},
+    {"Title": "Ember", "Artist": "Harbor Lights",
+     "Lyric": "the fire burns low the ember glows\nthe night is long"},
+]
+
+
+def ranked_titles(ranker, query):
+    return [SONGS[song_idx]["Title"] for _, song_idx in ranker.top_k(query)]
+
+
+def test_title_match_outranks_lyric_only_match():
+    ranker = BM25Ranker(InvertedIndex(SONGS))
+    # "days" is only in Rainy Days' title but twice in Paper Boats' lyric
+    assert ranked_titles(ranker, "days") == ["Rainy Days", "Paper Boats"]
+
+
+def test_rare_term_outranks_common_term():
+    ranker = BM25Ranker(InvertedIndex(SONGS))
+    # "long" is in three lyrics, "river" only in Paper Boats
+    titles = ranked_titles(ranker, "long river")
+    assert titles[0] == "Paper Boats"
+    assert ranker.idf("river") > ranker.idf("long")
+
+
+def test_fuzzy_lookup_ranking_is_stable():
+    index = FuzzyIndex(SONGS)
+    first = index.lookup("golden raod")
+    assert first == index.lookup("golden raod")
+    assert SONGS[first[0][2]]["Title"] == "Golden Road"
@@ -0,0 +1,55 @@
+import numpy as np
+
+from core.inverted_index import InvertedIndex
+from core.semantic_index import SemanticIndex
+
+SONGS = [
+    {"Title": "Ocean Eyes", "Artist": "Tide", "Lyric": "the ocean waves roll on the sea and the blue water sings"},
+    {"Title": "Deep Blue", "Artist": "Tide", "Lyric": "blue water of the sea the waves come home to the ocean"},
+    {"Title": "Harbor", "Artist": "Tide", "Lyric": "boats on the water the sea is calm the waves are slow"},
+    {"Title": "City Fire", "Artist": "Blaze", "Lyric": "the fire burns the city night and the flames rise high"},
+    {"Title": "Burning", "Artist": "Blaze", "Lyric": "flames in the night the fire will burn the city down"},
+    {"Title": "Ashes", "Artist": "Blaze", "Lyric": "smoke and fire the city burns all night in flames"},
+    {"Title": "Heartbeat", "Artist": "Pulse", "Lyric": "my heart beats for you my love my heart is yours"},
+    {"Title": "Lovesick", "Artist": "Pulse", "Lyric": "love you so my heart is sick with love for you"},
+]
+
+
+def build():
+    return SemanticIndex.build(InvertedIndex(SONGS), dims=3, key="test")
+
+
+def test_search_finds_songs_on_the_same_topic():
+    index = build()
+    # No song holds these words in this order, they share the topic
+    top = [song_idx for _, song_idx in index.search("waves on the blue ocean", k=3)]
+    assert sorted(top) == [0, 1, 2]
+    top = [song_idx for _, song_idx in index.search("flames burn", k=3)]
+    assert sorted(top) == [3, 4, 5]
+    assert index.search("zzz unknown words") == []
+
+
+def test_saved_index_loads_memory_mapped(tmp_path):
+    index = build()
+    prefix = str(tmp_path / "lsa")
+    index.save(prefix)
+
+    loaded = SemanticIndex.load(prefix, key="test")
+    assert isinstance(loaded.song_vectors, np.memmap)
+    assert loaded.search("my love", k=3) == index.search("my love", k=3)
+    # Vectors built for another song layout are not used
+    assert SemanticIndex.load(prefix, key="other") is None
+
+
+def test_lsh_candidates_give_the_full_scan_top_k():
+    index = build()
+    queries = ["waves on the blue ocean", "flames burn", "my heart", "the sea at night"]
+    full = [index.search(query, k=3) for query in queries]
+    index.enable_lsh(tables=2, bits=4)
+    for query, expected in zip(queries, full):
+        found = index.search(query, k=3)
+        assert [song_idx for _, song_idx in found] == [song_idx for _, song_idx in expected]
+        # float32 sums over fewer rows may round differently
+        assert np.allclose([score for score, _ in found], [score for score, _ in expected])
+    # Only some songs were scored
+    assert len(index._lsh_candidates(index.query_vector("flames burn"))) < len(SONGS)
@@ -0,0 +1,40 @@
+import asyncio
+
+from server import MAX_BODY_BYTES, SearchServer
+
+
+class Writer:
+    def __init__(self):
+        self.data = b""
+
+    def write(self, data):
+        self.data += data
+
+
+def respond(head, body=b""):
+    """Status line and keep-alive of SearchServer's answer to one raw request"""
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(head + body)
+        reader.feed_eof()
+        writer = Writer()
+        request_line = await reader.readline()
+        keep_alive = await SearchServer(None).handle_request(request_line, reader, writer)
+        return writer.data.split(b"\r\n", 1)[0].decode(), keep_alive
+
+    return asyncio.run(run())
+
+
+def test_health():
+    assert respond(b"GET /health HTTP/1.1\r\n\r\n") == ("HTTP/1.1 200 OK", True)
+
+
+def test_invalid_content_length_is_a_bad_request():
+    for length in (b"abc", b"-5", b"1.5", b"\xb2"):
+        head = b"POST /search/batch HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n"
+        assert respond(head, b"{}") == ("HTTP/1.1 400 Bad Request", False), length
+
+
+def test_oversized_body_is_refused():
+    head = f"POST /search/batch HTTP/1.1\r\nContent-Length: {MAX_BODY_BYTES + 1}\r\n\r\n".encode()
+    assert respond(head) == ("HTTP/1.1 413 Payload Too Large", False)
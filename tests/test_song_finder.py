@@ -0,0 +1,178 @@
+import json
+import os
+
+import pytest
+
+from song_finder import SongFinder
+
+BTS = [
+    {"Title": "Dynamite", "Artist": "BTS",
+     "Lyric": "cause I'm in the stars tonight so watch me bring the fire and set the night alight"},
+    {"Title": "Dynamite (EDM Remix)", "Artist": "BTS",
+     "Lyric": "cause I'm in the stars tonight so watch me bring the fire and set the night alight"},
+    {"Title": "Dynamite (Acoustic Remix)", "Artist": "BTS",
+     "Lyric": "cause I'm in the stars tonight so watch me bring the fire and set the night alight oh"},
+    {"Title": "Butter", "Artist": "BTS",
+     "Lyric": "smooth like butter like a criminal undercover gon' pop like trouble"},
+]
+BILLIE = [
+    {"Title": "No Time To Die", "Artist": "Billie Eilish",
+     "Lyric": "I should have known I'd leave alone no time to die it might be a lie"},
+    {"Title": "Bad Guy", "Artist": "Billie Eilish",
+     "Lyric": "white shirt now red my bloody nose sleeping you're on your tippy toes"},
+]
+
+
+def write_lexicon(lexicon_dir, name, songs):
+    (lexicon_dir / name).write_text(json.dumps(songs))
+
+
+@pytest.fixture
+def lexicon_dir(tmp_path):
+    write_lexicon(tmp_path, "bts.json", BTS)
+    write_lexicon(tmp_path, "billie_eilish.json", BILLIE)
+    return tmp_path
+
+
+def song_finder(lexicon_dir, **options):
+    return SongFinder(enable_voice=False, use_cache=False, lexicon_dir=str(lexicon_dir), **options)
+
+
+def titles(songs):
+    return [song["Title"] for song in songs]
+
+
+def rewrite_lexicon(lexicon_dir, name, songs):
+    """Write a lexicon file with a later mtime, as an edit seconds after loading would"""
+    write_lexicon(lexicon_dir, name, songs)
+    stat = os.stat(lexicon_dir / name)
+    os.utime(lexicon_dir / name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 5 * 10 ** 9))
+
+
+def index_views(finder):
+    """What every index holds, by song title so freed slots and song order do not matter"""
+    songs = finder.song_data["songs"]
+
+    def title(song_idx):
+        return songs[song_idx]["Title"]
+
+    fuzzy = finder.fuzzy_index
+    queries = ["dynamite", "die no might", "stars tonight", "smooth criminal", "lose yourself", "bad guy",
+               "in the stars tonight so watch me", "smooth like butter like a criminal",
+               "lose yourself in the music"]
+    return {
+        "postings": {token: sorted((title(song_idx), list(positions)) for song_idx, positions in postings.items())
+                     for token, postings in finder.inverted_index.postings.items()},
+        "ngram": {query: sorted((round(score, 6), title(song_idx))
+                                for score, song_idx in finder._ngram_scores(query, threshold=0.3))
+                  for query in queries},
+        "fuzzy": {term: sorted(title(song_idx) for song_idx in fuzzy.term_songs[term_id])
+                  for term, term_id in fuzzy.term_ids.items() if fuzzy.term_songs[term_id]},
+        "fuzzy_lookup": {query: sorted((round(score, 6), term) for score, term, _ in fuzzy.lookup(query))
+                         for query in queries},
+        "phonetic": {query: sorted((round(score, 6), title(song_idx))
+                                   for score, song_idx in finder.phonetic_index.search(query, threshold=0.3))
+                     for query in queries},
+        "prefix": {prefix: finder.suggest(prefix) for prefix in ("d", "dyn", "b", "l", "s", "c", "e")},
+        "search": {query: titles(finder.search_songs(query)) for query in queries},
+    }
+
+
+def test_misheard_line_of_known_words_ranks_by_sound(lexicon_dir):
+    finder = song_finder(lexicon_dir)
+    # Every word is known, BM25 alone puts "No Time To Die" first
+    assert titles(finder.ranked_songs("die no might"))[0] == "Dynamite"
+    assert titles(finder.ranked_songs("no time to die"))[0] == "No Time To Die"
+
+
+def test_semantic_stage_ranks_lines_never_typed_as_such(lexicon_dir):
+    finder = song_finder(lexicon_dir, semantic=True)
+    trace = {}
+    finder._search_ranked("the fire in the night sky", 10, trace)
+    assert "semantic" in trace["stages"]
+    # Found as typed, BM25 alone decides
+    trace = {}
+    finder._search_ranked("set the night alight", 10, trace)
+    assert list(trace["stages"]) == ["bm25"]
+
+
+def test_version_group_appears_once(lexicon_dir):
+    finder = song_finder(lexicon_dir)
+    for results in (finder.ranked_songs("dynamite"), finder.search_songs("dynamite"),
+                    finder.ranked_songs("stars tonight"), finder.search_songs("stars tonight", limit=1)):
+        assert titles(results) == ["Dynamite"]
+    assert titles(finder.versions(finder.ranked_songs("dynamite")[0])) == [
+        "Dynamite", "Dynamite (EDM Remix)", "Dynamite (Acoustic Remix)"]
+
+
+def test_suggestions_follow_a_reload(lexicon_dir):
+    finder = song_finder(lexicon_dir)
+    assert ("dynamite", "title") in finder.suggest("dyn")
+    write_lexicon(lexicon_dir, "bts.json", [{"Title": "Dynamo", "Artist": "BTS", "Lyric": "a new song"}])
+    finder.reload_lexicons()
+    assert finder.suggest("dyn") == [("dynamo", "title")]
+    assert finder.suggest("dynamite") == []
+
+
+@pytest.mark.parametrize("lazy_lyrics", [False, True])
+def test_reloaded_indexes_match_a_fresh_build(lexicon_dir, lazy_lyrics):
+    finder = song_finder(lexicon_dir, lazy_lyrics=lazy_lyrics)
+    changed = [dict(song) for song in BTS]
+    changed[3] = dict(changed[3], Lyric="smooth like butter, don't you know, a smooth criminal")
+    rewrite_lexicon(lexicon_dir, "bts.json", changed)
+    write_lexicon(lexicon_dir, "eminem.json", [
+        {"Title": "Lose Yourself", "Artist": "Eminem",
+         "Lyric": "you better lose yourself in the music the moment you own it"}])
+    os.remove(lexicon_dir / "billie_eilish.json")
+
+    changes = finder.reload_lexicons()
+    assert (changes["added"], changes["changed"], changes["removed"]) == (
+        ["eminem.json"], ["bts.json"], ["billie_eilish.json"])
+    fresh = song_finder(lexicon_dir, lazy_lyrics=lazy_lyrics)
+    reloaded, expected = index_views(finder), index_views(fresh)
+    for name in expected:
+        assert reloaded[name] == expected[name], name
+    assert expected["search"]["lose yourself"] == ["Lose Yourself"]
+    assert expected["search"]["bad guy"] == []
+
+
+def test_queries_normalizing_alike_share_a_cache_entry(lexicon_dir):
+    finder = song_finder(lexicon_dir)
+    first = finder.search_songs("Dynamite")
+    assert titles(first) == ["Dynamite"]
+    for query in ("dynamite", "  DYNAMITE ", "ＤＹＮＡＭＩＴＥ"):
+        assert finder.search_songs(query) == first
+    assert (finder.query_cache.hits, finder.query_cache.misses) == (3, 1)
+    assert len(finder.query_cache) == 1
+    finder.search_ranked("DYNAMITE")
+    finder.search_ranked("dynamite")
+    assert finder.query_cache.hits == 4 and len(finder.query_cache) == 2
+
+
+def test_reload_clears_the_query_cache(lexicon_dir):
+    finder = song_finder(lexicon_dir)
+    assert titles(finder.search_songs("butter")) == ["Butter"]
+    finder.search_ranked("butter")
+    invalidations = finder.query_cache.invalidations
+    rewrite_lexicon(lexicon_dir, "bts.json", BTS[:3])
+    finder.reload_lexicons()
+    assert len(finder.query_cache) == 0
+    assert finder.query_cache.invalidations == invalidations + 1
+    assert finder.search_songs("butter") == []
+    assert finder.search_ranked("butter") == []
+
+
+def test_unicode_variants_of_a_query_find_the_same_song(tmp_path):
+    write_lexicon(tmp_path, "queen.json", [
+        {"Title": "Don\u2019t Stop Me Now", "Artist": "Queen",
+         "Lyric": "tonight I'm gonna have myself a real good time I feel alive"},
+        {"Title": "Somebody To Love", "Artist": "Queen",
+         "Lyric": "can anybody find me somebody to love each morning I get up I die a little"},
+    ])
+    finder = song_finder(tmp_path)
+    # The title has a curly apostrophe and the lyric a straight one
+    for query in ("don't stop me now", "don\u2019t stop me now", "\uff24\uff2f\uff2e'\uff34 \uff33\uff34\uff2f\uff30",
+                  "don't\u2005stop\u2005me\u2005now", "I'm gonna have myself", "I\u2019m gonna have myself",
+                  "\uff29\u2019\uff4d gonna have myself", "I'm\u2005gonna\u2005have\u2005myself"):
+        assert titles(finder.search_songs(query)) == ["Don\u2019t Stop Me Now"], query
+        assert titles(finder.ranked_songs(query))[:1] == ["Don\u2019t Stop Me Now"], query
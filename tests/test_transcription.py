@@ -0,0 +1,88 @@
+import threading
+import time
+
+import pytest
+
+from core import transcription
+from core.transcription import lexicon_prompt, load_backend
+
+
+class StubBackend:
+    name = "stub"
+    loads = []
+
+    def __init__(self, model_size="base", compute_type=None):
+        # Slow enough that concurrent callers overlap while it loads
+        time.sleep(0.05)
+        self.loads.append((model_size, compute_type))
+
+
+@pytest.fixture
+def stub_backend(monkeypatch):
+    monkeypatch.setitem(transcription.BACKENDS, "stub", StubBackend)
+    monkeypatch.setattr(transcription, "_models", {})
+    monkeypatch.setattr(StubBackend, "loads", [])
+    return StubBackend
+
+
+def test_backend_loads_once_per_settings(stub_backend):
+    backends = []
+    threads = [threading.Thread(target=lambda: backends.append(load_backend("stub", "tiny")))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(backends) == 4 and all(backend is backends[0] for backend in backends)
+    assert load_backend("stub", "tiny") is backends[0]
+    assert load_backend("stub", "base") is not backends[0]
+    assert load_backend("stub", "tiny", "int8") is not backends[0]
+    assert stub_backend.loads == [("tiny", None), ("base", None), ("tiny", "int8")]
+
+
+def test_song_finders_share_one_loaded_backend(stub_backend, tmp_path):
+    from song_finder import SongFinder
+
+    (tmp_path / "bts.json").write_text('[{"Title": "Dynamite", "Artist": "BTS", "Lyric": "light it up"}]')
+    finders = [SongFinder(enable_voice=False, use_cache=False, lexicon_dir=str(tmp_path),
+                          transcription_backend="stub", whisper_model_size="tiny") for _ in range(2)]
+    assert finders[0].load_transcriber() is finders[1].load_transcriber()
+    assert stub_backend.loads == [("tiny", None)]
+    assert finders[0].transcription_prompt() == "BTS, Dynamite"
+
+
+def test_unknown_backend_is_rejected(stub_backend):
+    with pytest.raises(ValueError, match="Unknown transcription backend"):
+        load_backend("nope")
+
+
+def test_prompt_holds_lexicon_titles_and_artists_within_budget():
+    songs = [
+        {"Title": "Dynamite", "Artist": "BTS"},
+        {"Title": "Dynamite (EDM Remix)", "Artist": "BTS"},
+        {"Title": "Butter", "Artist": "bts"},
+        {"Title": "thank u, next", "Artist": "Ariana Grande"},
+        {"Title": "봄날", "Artist": "BTS (방탄소년단)"},
+        None,
+    ]
+    prompt = lexicon_prompt(songs)
+    parts = prompt.split(", ")
+    # Artists first, the most used spelling once, then titles by how many versions they have
+    assert parts[:2] == ["BTS", "Ariana Grande"]
+    assert parts[2:4] == ["Dynamite", "Butter"]
+    assert "thank u" in parts and "next" in parts
+    assert "봄날" not in prompt and "(" not in prompt
+    assert lexicon_prompt([]) == ""
+
+
+def test_prompt_is_capped_at_max_words():
+    songs = [{"Title": f"Song Number {i}", "Artist": f"Artist {i}"} for i in range(100)]
+    for max_words in (1, 10, 40, 120):
+        prompt = lexicon_prompt(songs, max_words=max_words)
+        assert len(prompt.split()) <= max_words
+    prompt = lexicon_prompt(songs, max_words=40)
+    artists = [part for part in prompt.split(", ") if part.startswith("Artist")]
+    # Each artist is two words, at most a quarter of the budget
+    assert 0 < len(artists) <= 40 // 4 // 2
+    assert len(prompt.split()) > 30
+    assert all(part.startswith(("Artist", "Song Number")) for part in prompt.split(", "))